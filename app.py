@@ -1,35 +1,268 @@
+import functools
+import io
+import logging
 import streamlit as st
+from streamlit import runtime
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
-import pandas as pd
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Tuple
 
 from storage import (
-    load_pokedex, load_state, save_state, name_for,
-    search_options, parse_number_from_option, get_evolutions
+    DATA_DIR, Pokedex, load_pokedex, name_for,
+    op_put, op_del, op_set, record_key,
+    search_options, parse_number_from_option, get_evolutions,
+    get_final_forms, get_evolution_chain,
 )
-from ui_components import pairing_tile, fusion_tile, graveyard_card, team_pokemon_card
+from sprite_atlas import SpriteAtlas, ensure_atlas
+from sprite_variants import ensure_in_background as ensure_sprite_variants
+from static_sprites import ensure_in_background as publish_sprites
+from fusion_index import get_fusion_index
+from fusion_sprites import fusion_keys, get_fusion_cache
+from fusion_synth import prerender_in_background
+from write_behind import get_writer
+from encounter_import import ImportPlan, apply_import, plan_import, read_encounters
+import queries
+import planner
+import profiling
+from snapshot import SnapshotError, compressions, read_snapshot, write_snapshot
+from live_sync import Change, get_hub
+from shared_state import Conflict, SharedRun, get_run
+from state_index import StateIndex, fusion_pairing_ids, recompute_used_flags as _recompute_used_flags
+from ui_components import (
+    pairing_tile, fusion_tile, graveyard_card, team_pokemon_card, sprite_atlas_style, windowed_grid,
+)
+
+try:  # private: how live sync reruns another session (see _rerun_session)
+    from streamlit.proto.ClientState_pb2 import ClientState
+except ImportError:
+    ClientState = None
+
+log = logging.getLogger("soullink")
 
 st.set_page_config(page_title="Soullink Fusion Tracker", page_icon="🧬", layout="wide")
+profiling.from_env()
 
-@st.cache_data
-def get_pokedex():
+@st.cache_resource
+def get_pokedex() -> Pokedex:
+    # Pokedex is immutable, so share one instance instead of unpickling a copy per rerun
     return load_pokedex()
 
+@st.cache_resource(ttl=60)
+def get_sprite_atlas(_pokedex: Pokedex) -> SpriteAtlas | None:
+    # Re-checks the sprites/ content hash at most once a minute
+    return ensure_atlas(_pokedex)
+
+@st.cache_resource(ttl=60)
+def refresh_sprite_variants(_pokedex: Pokedex):
+    # Renders variants for new or changed sprites (and newly cached fusions)
+    # in the background, at most once a minute
+    return ensure_sprite_variants(_pokedex)
+
+@st.cache_resource(ttl=60)
+def publish_static_sprites(_pokedex: Pokedex):
+    # Copies new or edited sprites to their content-hashed static URLs in
+    # the background, at most once a minute; until then they're inlined
+    return publish_sprites(_pokedex)
+
+def get_shared_run() -> SharedRun:
+    """The run state shared with every other session, with its index built."""
+    run = get_run()
+    if run.index is None:
+        with run.lock:
+            if run.index is None:
+                recompute_used_flags(run)  # builds the index; repairs flags once per load
+                keys = [k for f in run.state["fusions"] for k in fusion_keys(f)]
+                get_fusion_cache().prefetch(keys)
+                # Only fusions without a custom sprite need a synthesized one
+                index = get_fusion_index()
+                if index is not None:
+                    keys = [k for k in keys if not index.has_custom_sprite(*k)]
+                prerender_in_background(get_pokedex(), keys)
+    return run
+
 def get_state() -> Dict[str, Any]:
-    if "state" not in st.session_state:
-        st.session_state["state"] = load_state()
-    st.session_state["state"].setdefault("graveyard", [])
-    st.session_state["state"].setdefault("pairings", [])
-    st.session_state["state"].setdefault("fusions", [])
-    st.session_state["state"].setdefault("player1_team", [])
-    st.session_state["state"].setdefault("player2_team", [])
-    st.session_state["state"].setdefault("next_pair_id", 1)
-    st.session_state["state"].setdefault("next_fusion_id", 1)
-    return st.session_state["state"]
-
-def persist():
-    save_state(st.session_state["state"])
+    return get_shared_run().state
+
+def new_index(state: Dict[str, Any]) -> StateIndex:
+    dex = get_pokedex()
+    return StateIndex(state, name_of=lambda n: name_for(dex, n))
+
+def get_index() -> StateIndex:
+    return get_shared_run().index
+
+def query(fn, *args, **kwargs):
+    """Run one of ``queries``' filters on the shared state and index. The
+    first search builds the index, so hold the lock."""
+    run = get_shared_run()
+    with run.lock:
+        return fn(run.state, run.index, *args, **kwargs)
+
+def view(fn=None, *, shows: Iterable[str] = ()):
+    """``st.fragment`` that remembers the run version it last rendered, so
+    actions triggered from it can tell what the user was looking at. When
+    another session changes one of the collections in ``shows``, the view is
+    rerun in this session (see live sync below), or, where this Streamlit
+    can't do that, rerun every ``POLL_SECONDS``."""
+    if fn is None:
+        return functools.partial(view, shows=shows)
+    shows = frozenset(shows)
+
+    @functools.wraps(fn)
+    def tracked(*args):
+        seen_key = f"seen_version:{fn.__name__}:{':'.join(map(str, args))}"
+        version = get_shared_run().version
+        if shows:
+            watch_view(fn.__name__, shows)
+        outer = st.session_state.get("base_version")
+        st.session_state["base_version"] = st.session_state.get(seen_key, version)
+        profiled = profiling.begin(f"fragment {fn.__name__}")  # only outside a full run
+        try:
+            fn(*args)
+        finally:
+            st.session_state[seen_key] = version
+            st.session_state["base_version"] = outer
+            if profiled:
+                keep_profile()
+    poll = POLL_SECONDS if shows and runtime.exists() and not live_push()["ok"] else None
+    return st.fragment(tracked, run_every=poll)
+
+def action(reads=lambda *args: ()):
+    """Run an action against the shared state under its lock. If another
+    session changed a record in ``reads(*args)`` since this session's view
+    was rendered, the action is skipped and the user told to look again."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = get_shared_run()
+            base = st.session_state.get("base_version") or run.version
+            try:
+                with run.transaction(base, reads(*args), origin=session_id()):
+                    return fn(*args, **kwargs)
+            except Conflict as e:
+                st.toast(f"{', '.join(k for _, k in e.refs)} was just changed by the other player. Check it and try again.")
+        return wrapper
+    return deco
+
+def rerun_view():
+    """Rerun the fragment the caller is in, or the whole app when the fragment
+    is running as part of a full rerun (where a fragment rerun isn't allowed)."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
+
+def keep_profile():
+    """Finish this rerun's profile; Settings shows the last one."""
+    report = profiling.finish(session_id())
+    if report is not None:
+        st.session_state["profile_report"] = report
+
+def session_id() -> Optional[str]:
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def persist(*ops):
+    """Commit a change to the shared run and queue its save. With ops, only
+    those changes need writing; without, the whole state is written. Writes
+    are debounced."""
+    run = get_run()
+    changes = list(ops) if ops else None
+    run.commit(changes, origin=session_id())
+    get_writer().mark(run.state, changes, lock=run.lock)
 
+# ---------------- Live sync ----------------
+
+# How often views refresh themselves when changes can't be pushed to them
+POLL_SECONDS = 5
+
+@st.cache_resource
+def live_push() -> Dict[str, bool]:
+    """Whether other sessions can be told to rerun. That goes through
+    Streamlit internals, so it is checked once and switched off (views
+    poll instead) the first time they don't behave as expected."""
+    mgr = getattr(runtime.get_instance(), "_session_mgr", None) if runtime.exists() else None
+    ok = (
+        ClientState is not None and "fragment_id" in ClientState.DESCRIPTOR.fields_by_name
+        and hasattr(mgr, "get_active_session_info")
+    )
+    if not ok and runtime.exists():
+        _warn_no_push("no session manager or fragment reruns")
+    return {"ok": ok}
+
+def _warn_no_push(reason: str):
+    log.warning(
+        "Live sync can't rerun other sessions on Streamlit %s (%s); views refresh every %ss instead",
+        st.__version__, reason, POLL_SECONDS,
+    )
+
+def _push_failed(reason: str):
+    status = live_push()
+    if status["ok"]:
+        status["ok"] = False
+        _warn_no_push(reason)
+
+def _rerun_session(sid: str, fragment_ids: List[str]) -> bool:
+    """Ask Streamlit to rerun fragments of another session ("" reruns the
+    whole app), the way a rerun from its browser would. False if the session
+    is gone; AttributeError if this Streamlit can't be driven like this."""
+    info = runtime.get_instance()._session_mgr.get_active_session_info(sid)
+    if info is None:
+        return False
+    session = info.session
+    if not hasattr(session, "_client_state"):
+        raise AttributeError("AppSession._client_state")  # here, not on the event loop
+
+    def rerun():
+        for fid in fragment_ids:
+            client_state = ClientState()
+            client_state.CopyFrom(session._client_state)
+            client_state.fragment_id = fid
+            session.request_rerun(client_state)
+
+    session._event_loop.call_soon_threadsafe(rerun)
+    return True
+
+def _refresh_views(sid: str, views: Dict[str, Tuple[str, FrozenSet[str]]], change: Change) -> bool:
+    """Deliver another session's change: rerun the open views that show it."""
+    if change.collections is None:
+        fids = [""]
+    else:
+        fids = [fid for fid, shows in views.values() if shows & change.collections]
+    if not fids:
+        return True
+    try:
+        return _rerun_session(sid, fids)
+    except (AttributeError, TypeError) as e:
+        _push_failed(repr(e))
+        return False  # the session polls from its next full rerun
+
+def _fragment_id(ctx) -> Optional[str]:
+    """Id of the fragment being run (kept per thread in newer Streamlit)."""
+    fid = getattr(ctx, "current_fragment_id", None)
+    if fid is None:
+        try:
+            from streamlit.runtime.scriptrunner_utils.script_run_context import ThreadState
+        except ImportError:
+            return None
+        fid = ThreadState.get().fragment_id
+    return fid
+
+def watch_view(name: str, shows: FrozenSet[str]):
+    """Register the running fragment for refreshes when ``shows`` changes elsewhere."""
+    ctx = get_script_run_ctx()
+    fid = _fragment_id(ctx) if ctx is not None else None
+    if not fid or not runtime.exists() or not live_push()["ok"]:
+        return
+    views = st.session_state.setdefault("live_views", {})
+    sub = st.session_state.get("live_sync")
+    if sub is None or not sub.active:
+        st.session_state["live_sync"] = get_hub().subscribe(
+            get_run().key, functools.partial(_refresh_views, ctx.session_id, views), ctx.session_id,
+        )
+    views[name] = (fid, shows)
+
+@action()
 def add_pairing(p1_number: int, encounter: str, p2_number: int):
     state = get_state()
     pid = state["next_pair_id"]
@@ -39,53 +272,24 @@ def add_pairing(p1_number: int, encounter: str, p2_number: int):
         "player1": {"number": int(p1_number), "name": name_for(pokedex, p1_number), "encounter": encounter, "used": False},
         "player2": {"number": int(p2_number), "name": name_for(pokedex, p2_number), "encounter": encounter, "used": False},
     }
-    state["pairings"].append(pairing)
+    get_index().add("pairings", pairing)
     state["next_pair_id"] += 1
-    persist()
+    persist(op_put("pairings", pairing), op_set("next_pair_id", state["next_pair_id"]))
 
 def available_player_pokemon(player_idx: int) -> List[Dict[str, Any]]:
-    key = "player1" if player_idx == 0 else "player2"
-    return [
-        {"pairing_id": p["id"], "number": p[key]["number"], "name": p[key]["name"]}
-        for p in get_state()["pairings"]
-        if not p.get("dead") and not p[key]["used"]
-    ]
+    return queries.available_player_pokemon(get_state(), player_idx)
 
 def get_all_player_pokemon(player_idx: int) -> List[Dict[str, Any]]:
-    player_key = "player1" if player_idx == 0 else "player2"
-    all_pokemon = []
-    
-    # From pairings (unfused and available)
-    for p in get_state()["pairings"]:
-        if not p.get("dead") and not p[player_key]["used"]:
-            mon = p[player_key].copy()
-            mon["pairing_id"] = p["id"]
-            mon["source"] = "Paired"
-            mon["uid"] = f'{p["id"]}_{player_key}'
-            all_pokemon.append(mon)
-            
-    # From fusions
-    for f in get_state()["fusions"]:
-        fused_mon_data = f[player_key]
-        mon = {
-            "source": "Fusion",
-            "fusion_id": f["id"],
-            "uid": f'{f["id"]}_{player_key}',
-            "name": f"{fused_mon_data['a']['name']} / {fused_mon_data['b']['name']}",
-            "number_a": fused_mon_data['a']['number'],
-            "number_b": fused_mon_data['b']['number'],
-        }
-        all_pokemon.append(mon)
-        
-    return all_pokemon
+    return queries.player_pokemon(get_state(), player_idx)
 
+@action(reads=lambda a, b: [("pairings", a), ("pairings", b)])
 def create_fusion_from_player1(p1_pair_id_a: str, p1_pair_id_b: str):
-    state = get_state()
+    state, index = get_state(), get_index()
     if p1_pair_id_a == p1_pair_id_b:
         st.error("Choose two different pairings.")
         return
-    pa = next((p for p in state["pairings"] if p["id"] == p1_pair_id_a), None)
-    pb = next((p for p in state["pairings"] if p["id"] == p1_pair_id_b), None)
+    pa = index.pairing(p1_pair_id_a)
+    pb = index.pairing(p1_pair_id_b)
     if not pa or not pb:
         st.error("Pairing not found.")
         return
@@ -112,65 +316,70 @@ def create_fusion_from_player1(p1_pair_id_a: str, p1_pair_id_b: str):
             "b": {"pairing_id": pb["id"], "number": pb["player2"]["number"], "name": pb["player2"]["name"]},
         },
     }
-    for side in ("player1", "player2"):
-        pa[side]["used"] = True
-        pb[side]["used"] = True
-
-    state["fusions"].append(fusion)
+    index.add("fusions", fusion)
     state["next_fusion_id"] += 1
-    persist()
+    index.refresh_used(pa)
+    index.refresh_used(pb)
+    get_fusion_cache().prefetch(fusion_keys(fusion))
+    persist(
+        op_put("fusions", fusion), op_put("pairings", pa), op_put("pairings", pb),
+        op_set("next_fusion_id", state["next_fusion_id"]),
+    )
     st.success(f"Created fusion {fusion['id']}")
 
-def recompute_used_flags():
-    state = get_state()
-    for p in state["pairings"]:
-        dead = bool(p.get("dead"))
-        p["player1"]["used"] = dead
-        p["player2"]["used"] = dead
-    pair_by_id = {p["id"]: p for p in state["pairings"]}
-    for f in state["fusions"]:
-        for side in ("player1", "player2"):
-            for slot in ("a", "b"):
-                pid = f[side][slot]["pairing_id"]
-                if pid in pair_by_id:
-                    pair_by_id[pid][side]["used"] = True
-    persist()
+def recompute_used_flags(run: SharedRun):
+    """Integrity repair: rebuild the index and every used flag from scratch.
+    Actions keep both current incrementally, so this only runs on load and
+    from Settings."""
+    with run.lock:
+        run.index = new_index(run.state)
+        changed = _recompute_used_flags(run.state)
+        if changed:
+            persist(*[op_put("pairings", p) for p in changed])
+    return changed
+
+def _refresh_pairings(pids) -> list:
+    """Update used flags of the given pairings from the index; returns put ops for changes."""
+    index = get_index()
+    pairings = (index.pairing(pid) for pid in sorted(pids))
+    return [op_put("pairings", p) for p in pairings if p is not None and index.refresh_used(p)]
 
+@action(reads=lambda fid: [("fusions", fid)])
 def unfuse_fusion(fid: str):
-    state = get_state()
-    before = len(state["fusions"])
-    state["fusions"] = [f for f in state["fusions"] if f["id"] != fid]
-    if len(state["fusions"]) == before:
+    f = get_index().remove("fusions", fid)
+    if not f:
         st.error("Fusion not found.")
         return
-    recompute_used_flags()
-    persist()
+    persist(op_del("fusions", fid), *_refresh_pairings(fusion_pairing_ids(f)))
     st.success(f"Unfused {fid}")
 
+@action(reads=lambda pid: [("pairings", pid)])
 def send_pairing_to_graveyard(pid: str):
-    state = get_state()
-    p = next((x for x in state["pairings"] if x["id"] == pid), None)
+    index = get_index()
+    p = index.pairing(pid)
     if not p:
         st.error("Pairing not found.")
         return
     if p["player1"]["used"] or p["player2"]["used"]:
         st.error("Cannot send to graveyard. Pairing is in a fusion.")
         return
-    state["graveyard"].append({
+    grave = {
         "kind": "pairing",
         "id": pid,
         "player1": {"number": p["player1"]["number"]},
         "player2": {"number": p["player2"]["number"]},
         "created_at": datetime.utcnow().isoformat(),
-    })
-    state["pairings"] = [x for x in state["pairings"] if x["id"] != pid]
-    persist()
+    }
+    index.add("graveyard", grave)
+    index.remove("pairings", pid)
+    persist(op_put("graveyard", grave), op_del("pairings", pid))
     st.success(f"Sent pairing {pid} to graveyard.")
 
+@action(reads=lambda fid: [("fusions", fid)])
 def bury_fusion(fid: str):
     """Remove fusion and move both involved pairings to graveyard as 'pairing' entries."""
-    state = get_state()
-    f = next((x for x in state["fusions"] if x["id"] == fid), None)
+    index = get_index()
+    f = index.fusion(fid)
     if not f:
         st.error("Fusion not found.")
         return
@@ -181,53 +390,48 @@ def bury_fusion(fid: str):
 
     now = datetime.utcnow().isoformat()
     new_graves = []
-    keep_pairings = []
-    for p in state["pairings"]:
-        if p["id"] in pair_ids:
-            state["graveyard"].append({
+    ops = []
+    for p in [index.pairing(pid) for pid in dict.fromkeys(pair_ids)]:
+        if p is not None:
+            grave = {
                 "kind": "pairing",
                 "id": p["id"],
                 "player1": {"number": p["player1"]["number"]},
                 "player2": {"number": p["player2"]["number"]},
                 "created_at": now,
-            })
+            }
+            index.add("graveyard", grave)
+            index.remove("pairings", p["id"])
             new_graves.append(p["id"])
-        else:
-            keep_pairings.append(p)
-    state["pairings"] = keep_pairings
-    state["fusions"] = [x for x in state["fusions"] if x["id"] != fid]
+            ops += [op_put("graveyard", grave), op_del("pairings", p["id"])]
+    index.remove("fusions", fid)
 
-    recompute_used_flags()
-    persist()
+    persist(*ops, op_del("fusions", fid), *_refresh_pairings(fusion_pairing_ids(f)))
     if new_graves:
         st.success(f"send {fid} to graveyard: sent pairings {', '.join(new_graves)} to graveyard.")
     else:
         st.success(f"send {fid} to graveyard: fusion removed. No pairings found to bury.")
 
+@action(reads=lambda pid: [("pairings", pid)])
 def delete_pairing(pid: str):
-    state = get_state()
-    p = next((x for x in state["pairings"] if x["id"] == pid), None)
+    index = get_index()
+    p = index.pairing(pid)
     if not p:
         st.error("Pairing not found.")
         return
     if p["player1"]["used"] or p["player2"]["used"]:
         st.error("Cannot delete. Pairing is in a fusion. Unfuse or bury the fusion first.")
         return
-    state["pairings"] = [x for x in state["pairings"] if x["id"] != pid]
-    persist()
+    index.remove("pairings", pid)
+    persist(op_del("pairings", pid))
     st.success(f"Deleted pairing {pid}")
 
+@action(reads=lambda pid: [("graveyard", f"pairing:{pid}")])
 def delete_graveyard_pairing(pid: str):
-    state = get_state()
-    before = len(state["graveyard"])
-    state["graveyard"] = [
-        g for g in state["graveyard"]
-        if not (g.get("kind") == "pairing" and g.get("id") == pid)
-    ]
-    if len(state["graveyard"]) == before:
+    if get_index().remove("graveyard", f"pairing:{pid}") is None:
         st.error("Graveyard pairing not found.")
         return
-    persist()
+    persist(op_del("graveyard", f"pairing:{pid}"))
     st.success(f"Deleted graveyard pairing {pid}")
 
 # ---------------- Evolution helpers ----------------
@@ -236,20 +440,19 @@ def _update_fusions_for_pairing(pid: str, evolved_side: str, new_number: int, ne
     """Propagate evolved species into any fusion entries that reference this pairing.
     evolved_side is 'player1' or 'player2' and updates only the matching side in fusions.
     """
-    state = get_state()
-    for f in state["fusions"]:
-        for side in ("player1", "player2"):
-            for slot in ("a", "b"):
-                if f[side][slot]["pairing_id"] == pid:
-                    # Update the numbers/names only on the side that evolved
-                    if side == evolved_side:
-                        f[side][slot]["number"] = int(new_number)
-                        f[side][slot]["name"] = new_name
+    touched = get_index().fusions_for_pairing(pid, evolved_side)
+    for f in touched:
+        for slot in ("a", "b"):
+            if f[evolved_side][slot]["pairing_id"] == pid:
+                # Update the numbers/names only on the side that evolved
+                f[evolved_side][slot]["number"] = int(new_number)
+                f[evolved_side][slot]["name"] = new_name
+    return touched
 
+@action(reads=lambda pid, side, new_number: [("pairings", pid)])
 def evolve_pairing_mon(pid: str, side: str, new_number: int):
     """side: 'player1' or 'player2'."""
-    state = get_state()
-    p = next((x for x in state["pairings"] if x["id"] == pid), None)
+    p = get_index().pairing(pid)
     if not p:
         st.error("Pairing not found.")
         return
@@ -261,8 +464,13 @@ def evolve_pairing_mon(pid: str, side: str, new_number: int):
     p[side]["number"] = int(new_number)
     p[side]["name"] = name_for(pokedex, new_number)
 
-    _update_fusions_for_pairing(pid, side, int(new_number), p[side]["name"])
-    persist()
+    touched = _update_fusions_for_pairing(pid, side, int(new_number), p[side]["name"])
+    index = get_index()
+    index.touch("pairings", pid)
+    for f in touched:
+        index.touch("fusions", f["id"])
+    get_fusion_cache().prefetch(k for f in touched for k in fusion_keys(f))
+    persist(op_put("pairings", p), *[op_put("fusions", f) for f in touched])
     st.success(f"Evolved {pid} {side} to #{int(new_number):03d} {p[side]['name']}")
 
 def evolution_controls(pid: str, side: str, current_number: int, key_prefix: str = ""):
@@ -272,31 +480,43 @@ def evolution_controls(pid: str, side: str, current_number: int, key_prefix: str
         st.caption("No evolutions available")
         return
 
-    if len(evos) == 1:
+    # Final forms more than one step away, offered as a shortcut
+    direct = {n for n, _ in evos}
+    finals = [(n, nm) for n, nm in get_final_forms(pokedex, int(current_number)) if n not in direct]
+    chain = " → ".join(f"#{n:03d} {nm}" for n, nm in get_evolution_chain(pokedex, int(current_number)))
+
+    if len(evos) == 1 and len(finals) <= 1:
         n, nm = evos[0]
-        if st.button(f"Evolve {side[-1]} → #{n:03d}", key=f"{key_prefix}evolve_one_{pid}_{side}"):
+        if st.button(f"Evolve {side[-1]} → #{n:03d}", key=f"{key_prefix}evolve_one_{pid}_{side}", help=chain):
             evolve_pairing_mon(pid, side, n)
-            st.rerun()
+            rerun_view()
+        if finals:
+            fn, _ = finals[0]
+            if st.button(f"Final {side[-1]} → #{fn:03d}", key=f"{key_prefix}evolve_final_{pid}_{side}", help=chain):
+                evolve_pairing_mon(pid, side, fn)
+                rerun_view()
         return
 
     # Multiple evolutions: choose then confirm
-    labels = [f"{n:03d} - {nm}" for n, nm in evos]
+    choices = evos + finals
+    labels = [f"{n:03d} - {nm}" for n, nm in evos] + [f"{n:03d} - {nm} (final)" for n, nm in finals]
     sel = st.selectbox(
         f"Evolve {side[-1]}",
         labels,
         key=f"{key_prefix}evo_sel_{pid}_{side}",
         index=None,
         placeholder="Choose evolution",
+        help=chain,
     )
     if st.button("Confirm evolve", key=f"{key_prefix}evo_confirm_{pid}_{side}", disabled=sel is None):
         idx = labels.index(sel)
-        n, _ = evos[idx]
+        n, _ = choices[idx]
         evolve_pairing_mon(pid, side, n)
-        st.rerun()
+        rerun_view()
 
 def reset_state_confirm():
     if st.button("Reset all state", type="secondary"):
-        st.session_state["state"] = {
+        fresh = {
             "pairings": [],
             "fusions": [],
             "graveyard": [],
@@ -307,22 +527,233 @@ def reset_state_confirm():
             "players": ["Player 1", "Player 2"],
             "version": 1,
         }
-        persist()
+        replace_run(fresh)
         st.success("State cleared.")
 
+def replace_run(state: Dict[str, Any]):
+    """Swap the whole run for ``state`` (reset, restore) and save it."""
+    get_run().replace(state, origin=session_id())
+    run = get_shared_run()
+    get_writer().mark(run.state, None, lock=run.lock)
+
+def _counts(state: Dict[str, Any]) -> str:
+    return (
+        f"{len(state['pairings'])} pairings, {len(state['fusions'])} fusions, "
+        f"{len(state['graveyard'])} in the graveyard"
+    )
+
+def snapshot_ui():
+    st.subheader("Backup and restore")
+    compression = st.radio("Compression", compressions(), horizontal=True) if len(compressions()) > 1 else "gzip"
+
+    def build() -> bytes:
+        run = get_shared_run()
+        buf = io.BytesIO()
+        with run.lock:
+            write_snapshot(run.state, buf, compression)
+        return buf.getvalue()
+
+    ext = {"gzip": "gz", "zstd": "zst"}[compression]
+    download = dict(
+        label="Download run snapshot",
+        file_name=f"soullink-{datetime.utcnow():%Y%m%d-%H%M}.jsonl.{ext}",
+        mime="application/octet-stream",
+    )
+    try:
+        st.download_button(data=build, **download)  # built only when clicked
+    except StreamlitAPIException:
+        st.download_button(data=build(), **download)
+
+    upload = st.file_uploader(
+        "Restore from snapshot", type=["gz", "zst", "jsonl"],
+        key=f"snapshot_file_{st.session_state.get('snapshot_round', 0)}",
+    )
+    if upload is None:
+        return
+    try:
+        restored = read_snapshot(upload)
+    except SnapshotError as e:
+        st.error(f"Couldn't read {upload.name}: {e}")
+        return
+    st.warning(f"Restoring replaces the current run ({_counts(get_state())}) with the snapshot ({_counts(restored)}).")
+    if st.button("Replace the run with this snapshot", type="primary"):
+        replace_run(restored)
+        st.session_state["snapshot_round"] = st.session_state.get("snapshot_round", 0) + 1
+        st.rerun()
+
+def profiling_ui():
+    st.subheader("Profiling")
+    on = st.toggle(
+        "Profile reruns", value=profiling.enabled(),
+        help="Times the Pokedex lookups, saves, sprite encoding and tile rendering. "
+             "Applies to every open session; adds a little overhead while on.",
+    )
+    if on != profiling.enabled():
+        (profiling.enable if on else profiling.disable)()
+    if not on:
+        return
+    trace = st.toggle("Write a trace to data/profile.jsonl", value=profiling.trace_path() is not None)
+    if trace != (profiling.trace_path() is not None):
+        profiling.set_trace(DATA_DIR / "profile.jsonl" if trace else None)
+
+    report = st.session_state.get("profile_report")
+    if report is None:
+        st.caption("Nothing recorded yet: switch tabs or click something.")
+    else:
+        st.caption(f"Last rerun ({report['label']}): {report['ms']:.1f} ms")
+        if report["calls"]:
+            st.dataframe(report["calls"], hide_index=True)
+        if report["caches"]:
+            st.dataframe(report["caches"], hide_index=True)
+    with st.expander("Since profiling was switched on (all sessions, saves included)"):
+        rows = profiling.totals()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        if st.button("Reset counters"):
+            profiling.reset()
+
+@action()
+def import_encounters(df) -> ImportPlan:
+    """Validate an encounter list against the current state and, if every
+    row is fine, add it all in one change."""
+    state = get_state()
+    plan = plan_import(df, pokedex, state)
+    if plan.ok:
+        persist(*apply_import(plan, state, get_index()))
+        get_fusion_cache().prefetch(k for f in plan.fusions for k in fusion_keys(f))
+    return plan
+
+def import_ui():
+    st.subheader("Import encounters")
+    done = st.session_state.pop("import_done", None)
+    if done:
+        st.success(done)
+    upload = st.file_uploader(
+        "Encounter list (CSV or JSON)", type=["csv", "json"],
+        key=f"import_file_{st.session_state.get('import_round', 0)}",
+        help="One row per encounter: p1, p2 (species number or name), encounter; "
+             "optional status (alive/dead) and fusion (rows sharing a tag are fused).",
+    )
+    if upload is None:
+        return
+    try:
+        df = read_encounters(upload.getvalue(), upload.name)
+    except Exception as e:
+        st.error(f"Couldn't read {upload.name}: {e}")
+        return
+    plan = plan_import(df, pokedex, get_state())
+    if plan.errors:
+        st.error(f"{len(plan.errors)} problem(s) found; nothing will be imported until they're fixed.")
+        st.dataframe([e._asdict() for e in plan.errors[:500]], hide_index=True)
+        return
+    if not plan.ok:
+        st.info("The file has no encounters.")
+        return
+    st.caption(
+        f"{len(plan.pairings)} pairing(s), {len(plan.graveyard)} straight to the graveyard, "
+        f"{len(plan.fusions)} fusion(s)."
+    )
+    if st.button(f"Import {plan.rows} encounter(s)", type="primary"):
+        result = import_encounters(df)
+        if result is not None and result.ok:
+            st.session_state["import_done"] = f"Imported {result.rows} encounter(s)."
+            st.session_state["import_round"] = st.session_state.get("import_round", 0) + 1
+            rerun_view()
+
 # ---------------- Team UI ----------------
 
-def team_management_ui(player_idx: int, pokedex_df: pd.DataFrame):
+@action(reads=lambda player_idx, mon: [(f"player{player_idx + 1}_team", mon["uid"])])
+def add_to_team(player_idx: int, selected_pokemon: Dict[str, Any]):
+    """Add a mon to a player's team, and its soul-linked partner to the other team."""
+    state, index = get_state(), get_index()
+    team_key = f"player{player_idx + 1}_team"
+    if len(state[team_key]) >= 6 or index.team_slot(team_key, selected_pokemon["uid"]) is not None:
+        return
+    source = selected_pokemon.get("source")
+
+    # --- Logic for adding a FUSION to the team ---
+    if source == "Fusion":
+        fusion_id = selected_pokemon.get('fusion_id')
+        fusion = index.fusion(fusion_id)
+        if fusion:
+            index.add(team_key, selected_pokemon) # Add to current player's team
+
+            # Construct and add the other player's fusion
+            other_player_idx = 1 - player_idx
+            other_team_key = f"player{other_player_idx + 1}_team"
+            other_player_key = "player1" if other_player_idx == 0 else "player2"
+
+            other_fused_data = fusion[other_player_key]
+            other_fusion_mon = {
+                "source": "Fusion",
+                "fusion_id": fusion["id"],
+                "uid": f'{fusion["id"]}_{other_player_key}',
+                "name": f"{other_fused_data['a']['name']} / {other_fused_data['b']['name']}",
+                "number_a": other_fused_data['a']['number'],
+                "number_b": other_fused_data['b']['number'],
+            }
+
+            ops = [op_put(team_key, selected_pokemon)]
+            if len(state[other_team_key]) < 6 and index.team_slot(other_team_key, other_fusion_mon['uid']) is None:
+                index.add(other_team_key, other_fusion_mon)
+                ops.append(op_put(other_team_key, other_fusion_mon))
+
+            persist(*ops)
+        else:
+            st.error("Could not find the associated fusion.")
+
+    # --- Logic for adding a PAIRED mon to the team (existing logic) ---
+    else: 
+        pairing_id = selected_pokemon.get('pairing_id')
+        pairing = index.pairing(pairing_id)
+        if pairing:
+            index.add(team_key, selected_pokemon)
+
+            other_player_idx = 1 - player_idx
+            other_team_key = f"player{other_player_idx + 1}_team"
+            other_player_key = "player1" if other_player_idx == 0 else "player2"
+            other_pokemon = pairing[other_player_key].copy()
+            other_pokemon["pairing_id"] = pairing["id"]
+            other_pokemon["source"] = "Paired"
+            other_pokemon["uid"] = f'{pairing["id"]}_{other_player_key}'
+
+            ops = [op_put(team_key, selected_pokemon)]
+            if len(state[other_team_key]) < 6 and index.team_slot(other_team_key, other_pokemon['uid']) is None:
+                index.add(other_team_key, other_pokemon)
+                ops.append(op_put(other_team_key, other_pokemon))
+            persist(*ops)
+        else:
+            st.error("Could not find the associated pairing.")
+
+@action(reads=lambda player_idx, uid: [(f"player{player_idx + 1}_team", uid)])
+def remove_from_team(player_idx: int, uid_to_remove: str):
+    """Remove a mon from a player's team, and its partner from the other team."""
+    index = get_index()
+    team_key = f"player{player_idx + 1}_team"
+    index.remove(team_key, uid_to_remove)
+
+    other_player_idx = 1 - player_idx
+    other_team_key = f"player{other_player_idx + 1}_team"
+    current_player_key = uid_to_remove.split('_')[-1]
+    other_player_key = 'player2' if current_player_key == 'player1' else 'player1'
+
+    id_part = uid_to_remove.split('_')[0]
+    paired_uid_to_remove = f"{id_part}_{other_player_key}"
+    index.remove(other_team_key, paired_uid_to_remove)
+
+    persist(op_del(team_key, uid_to_remove), op_del(other_team_key, paired_uid_to_remove))
+
+
+def team_management_ui(player_idx: int, pokedex_df: Pokedex):
     player_name = f"Player {player_idx + 1}"
     team_key = f"player{player_idx + 1}_team"
-    state = get_state()
+    state, index = get_state(), get_index()
     
     st.subheader(f"{player_name}'s Team")
 
     # --- Selection ---
     available_mons = get_all_player_pokemon(player_idx)
-    team_uids = {mon['uid'] for mon in state[team_key]}
-    selectable_mons = [m for m in available_mons if m['uid'] not in team_uids]
+    selectable_mons = [m for m in available_mons if index.team_slot(team_key, m['uid']) is None]
     
     # Create display labels for the selectbox
     options = {}
@@ -345,62 +776,8 @@ def team_management_ui(player_idx: int, pokedex_df: pd.DataFrame):
         )
 
         if st.button(f"Add to {player_name}'s Team", key=f"team_add_p{player_idx}", disabled=not selected_label):
-            selected_pokemon = options[selected_label]
-            source = selected_pokemon.get("source")
-
-            # --- Logic for adding a FUSION to the team ---
-            if source == "Fusion":
-                fusion_id = selected_pokemon.get('fusion_id')
-                fusion = next((f for f in get_state()['fusions'] if f['id'] == fusion_id), None)
-                if fusion:
-                    state[team_key].append(selected_pokemon) # Add to current player's team
-
-                    # Construct and add the other player's fusion
-                    other_player_idx = 1 - player_idx
-                    other_team_key = f"player{other_player_idx + 1}_team"
-                    other_player_key = "player1" if other_player_idx == 0 else "player2"
-                    
-                    other_fused_data = fusion[other_player_key]
-                    other_fusion_mon = {
-                        "source": "Fusion",
-                        "fusion_id": fusion["id"],
-                        "uid": f'{fusion["id"]}_{other_player_key}',
-                        "name": f"{other_fused_data['a']['name']} / {other_fused_data['b']['name']}",
-                        "number_a": other_fused_data['a']['number'],
-                        "number_b": other_fused_data['b']['number'],
-                    }
-                    
-                    other_team_uids = {mon['uid'] for mon in state[other_team_key]}
-                    if len(state[other_team_key]) < 6 and other_fusion_mon['uid'] not in other_team_uids:
-                        state[other_team_key].append(other_fusion_mon)
-                    
-                    persist()
-                    st.rerun()
-                else:
-                    st.error("Could not find the associated fusion.")
-            
-            # --- Logic for adding a PAIRED mon to the team (existing logic) ---
-            else: 
-                pairing_id = selected_pokemon.get('pairing_id')
-                pairing = next((p for p in get_state()['pairings'] if p['id'] == pairing_id), None)
-                if pairing:
-                    state[team_key].append(selected_pokemon)
-
-                    other_player_idx = 1 - player_idx
-                    other_team_key = f"player{other_player_idx + 1}_team"
-                    other_player_key = "player1" if other_player_idx == 0 else "player2"
-                    other_pokemon = pairing[other_player_key].copy()
-                    other_pokemon["pairing_id"] = pairing["id"]
-                    other_pokemon["source"] = "Paired"
-                    other_pokemon["uid"] = f'{pairing["id"]}_{other_player_key}'
-                    
-                    other_team_uids = {mon['uid'] for mon in state[other_team_key]}
-                    if len(state[other_team_key]) < 6 and other_pokemon['uid'] not in other_team_uids:
-                        state[other_team_key].append(other_pokemon)
-                    persist()
-                    st.rerun()
-                else:
-                    st.error("Could not find the associated pairing.")
+            add_to_team(player_idx, options[selected_label])
+            rerun_view()
 
     st.divider()
 
@@ -432,32 +809,38 @@ def team_management_ui(player_idx: int, pokedex_df: pd.DataFrame):
 
                         # --- Remove Button (handles both types) ---
                         if st.button("Remove", key=f"remove_p{player_idx}_{pokemon['uid']}"):
-                            uid_to_remove = pokemon.get('uid')
-                            state[team_key] = [p for p in state[team_key] if p.get('uid') != uid_to_remove]
-
-                            other_player_idx = 1 - player_idx
-                            other_team_key = f"player{other_player_idx + 1}_team"
-                            current_player_key = uid_to_remove.split('_')[-1]
-                            other_player_key = 'player2' if current_player_key == 'player1' else 'player1'
-                            
-                            id_part = uid_to_remove.split('_')[0]
-                            paired_uid_to_remove = f"{id_part}_{other_player_key}"
-                            state[other_team_key] = [p for p in state[other_team_key] if p.get('uid') != paired_uid_to_remove]
-
-                            persist()
-                            st.rerun()
+                            remove_from_team(player_idx, pokemon.get('uid'))
+                            rerun_view()
 
 
 # ---------------- App ----------------
 
+profiling.begin("full rerun", restart=True)
 pokedex = get_pokedex()
-state = get_state()
-recompute_used_flags()
+get_sprite_atlas(pokedex)
+refresh_sprite_variants(pokedex)
+publish_static_sprites(pokedex)
+sprite_atlas_style()
+get_state()
 
-st.title("Pokémon Infinite Fusion Soullink Tracker")
-tabs = st.tabs(["Pairings", "Fusions", "Team", "Graveyard", "Settings"])
+@view
+def pairing_tile_view(pid: str):
+    """A pairing tile and its evolve controls. Evolving reruns only this tile."""
+    p = get_index().pairing(pid)
+    if p is None:
+        return
+    pairing_tile(pokedex, p)
+
+    # evolve controls for Player 1 and Player 2
+    evo_cols = st.columns(2)
+    with evo_cols[0]:
+        evolution_controls(p["id"], "player1", p["player1"]["number"])
+    with evo_cols[1]:
+        evolution_controls(p["id"], "player2", p["player2"]["number"])
 
-with tabs[0]:
+@view(shows=("pairings",))
+def pairings_view():
+    state = get_state()
     st.subheader("Add a new pairing")
     col_add = st.columns(2)
     options = search_options(pokedex)
@@ -475,7 +858,7 @@ with tabs[0]:
             st.error("Failed to parse Pokémon number from selection.")
         else:
             add_pairing(p1_num, encounter.strip(), p2_num)
-            st.rerun()
+            rerun_view()
 
     st.divider()
     
@@ -485,50 +868,63 @@ with tabs[0]:
     else:
         show_only_unfused = st.checkbox("Show only unfused", value=False)
         search_q = st.text_input("Search pairings", key="pairings_search", placeholder="ID, name, number, or encounter")
-        pairs = [p for p in state["pairings"] if not p.get("dead")]
-        if show_only_unfused:
-            pairs = [p for p in pairs if not (p["player1"]["used"] or p["player2"]["used"])]
-        if search_q:
-            q = search_q.strip().lower()
-            def _pmatch(p):
-                fields = [
-                    p.get("id",""),
-                    p["player1"].get("name",""), p["player2"].get("name",""),
-                    f"{int(p['player1']['number']):03d}", f"{int(p['player2']['number']):03d}",
-                    str(p["player1"].get("encounter","")), str(p["player2"].get("encounter",""))
-                ]
-                return any(q in str(x).lower() for x in fields)
-            pairs = [p for p in pairs if _pmatch(p)]
-
-        for i in range(0, len(pairs), 6):
-            cols = st.columns(6)
-            for j in range(6):
-                k = i + j
-                if k >= len(pairs):
-                    continue
-                p = pairs[k]
-                with cols[j]:
-                    pairing_tile(pokedex, p)
-
-                    # evolve controls for Player 1 and Player 2
-                    evo_cols = st.columns(2)
-                    with evo_cols[0]:
-                        evolution_controls(p["id"], "player1", p["player1"]["number"])
-                    with evo_cols[1]:
-                        evolution_controls(p["id"], "player2", p["player2"]["number"])
-
-                    disabled = p["player1"]["used"] or p["player2"]["used"]
-                    btns = st.columns(2)
-                    with btns[0]:
-                        if st.button(f"Send {p['id']} to graveyard", key=f"grave_{p['id']}", disabled=disabled):
-                            send_pairing_to_graveyard(p['id'])
-                            st.rerun()
-                    with btns[1]:
-                        if st.button(f"Delete {p['id']}", key=f"del_{p['id']}", disabled=disabled):
-                            delete_pairing(p['id'])
-                            st.rerun()
-
-with tabs[1]:
+        pairs = query(queries.filter_pairings, search_q, only_unfused=show_only_unfused)
+
+        def _pairing_cell(p):
+            pairing_tile_view(p["id"])
+            disabled = p["player1"]["used"] or p["player2"]["used"]
+            btns = st.columns(2)
+            with btns[0]:
+                if st.button(f"Send {p['id']} to graveyard", key=f"grave_{p['id']}", disabled=disabled):
+                    send_pairing_to_graveyard(p['id'])
+                    rerun_view()
+            with btns[1]:
+                if st.button(f"Delete {p['id']}", key=f"del_{p['id']}", disabled=disabled):
+                    delete_pairing(p['id'])
+                    rerun_view()
+
+        windowed_grid(pairs, _pairing_cell, key="pairings_grid", species=lambda p: p["player1"]["name"])
+
+def fusion_planner_ui():
+    scorers = planner.scorers_for(pokedex, get_fusion_index())
+    cols = st.columns(len(scorers) + 2)
+    weights = {}
+    for col, name in zip(cols, scorers):
+        with col:
+            weights[name] = st.slider(planner.SCORER_LABELS.get(name, name), 0.0, 3.0, 1.0, 0.5, key=f"planner_w_{name}")
+    with cols[-2]:
+        k = st.number_input("Suggestions", 1, 100, 10, key="planner_k")
+    with cols[-1]:
+        combine = st.radio(
+            "Rank by", list(planner.COMBINE), key="planner_combine",
+            format_func={"min": "Weaker player", "mean": "Average"}.get,
+        )
+
+    cands = query(planner.candidates)
+    plans = planner.rank(cands, scorers, k=int(k), weights=weights, combine=combine)
+    if not plans:
+        st.info("Need at least two unfused pairings.")
+        return
+    st.dataframe([
+        {
+            "Head": p["head"], "Body": p["body"],
+            "Player 1": f'{p["player1"]["head_name"]} / {p["player1"]["body_name"]}',
+            "Player 2": f'{p["player2"]["head_name"]} / {p["player2"]["body_name"]}',
+            "Score": round(p["score"], 3), "Swapped": round(p["reverse_score"], 3),
+        }
+        for p in plans
+    ], hide_index=True)
+    choice = st.selectbox(
+        "Fuse", range(len(plans)), key="planner_pick",
+        format_func=lambda i: f'{plans[i]["head"]} (head) + {plans[i]["body"]} (body)',
+    )
+    if st.button("Create suggested fusion", disabled=choice is None):
+        create_fusion_from_player1(plans[choice]["head"], plans[choice]["body"])
+        rerun_view()
+
+@view(shows=("fusions", "pairings"))
+def fusions_view():
+    state = get_state()
     st.subheader("Create a fusion")
     avail_p1 = [
         (item["pairing_id"], f"{item['pairing_id']} — #{int(item['number']):03d} {item['name']}")
@@ -547,7 +943,10 @@ with tabs[1]:
         id_a = label_to_pairing_id(sel_a)
         id_b = label_to_pairing_id(sel_b)
         create_fusion_from_player1(id_a, id_b)
-        st.rerun()
+        rerun_view()
+
+    if st.toggle("Suggest fusions", key="planner_on", help="Rank every fusion of two unfused pairings for both players"):
+        fusion_planner_ui()
 
     st.divider()
     
@@ -555,41 +954,25 @@ with tabs[1]:
     if not state["fusions"]:
         st.info("No fusions yet.")
     else:
-        items = list(state["fusions"])
         search_f = st.text_input("Search fusions", key="fusions_search", placeholder="ID or Pokémon names")
-        if search_f:
-            qf = search_f.strip().lower()
-            def _fmatch(f):
-                names = [
-                    f["id"],
-                    f["player1"]["a"]["name"], f["player1"]["b"]["name"],
-                    f["player2"]["a"]["name"], f["player2"]["b"]["name"],
-                    f"{int(f['player1']['a']['number']):03d}", f"{int(f['player1']['b']['number']):03d}",
-                    f"{int(f['player2']['a']['number']):03d}", f"{int(f['player2']['b']['number']):03d}",
-                ]
-                return any(qf in str(x).lower() for x in names)
-            items = [f for f in items if _fmatch(f)]
-
-        for i in range(0, len(items), 6):
-            row = st.columns(6)
-            for j in range(6):
-                idx = i + j
-                if idx >= len(items):
-                    continue
-                f = items[idx]
-                with row[j]:
-                    fusion_tile(pokedex, f)
-                    btns = st.columns(2)
-                    with btns[0]:
-                        if st.button(f"Unfuse {f['id']}", key=f"unfuse_{f['id']}"):
-                            unfuse_fusion(f['id'])
-                            st.rerun()
-                    with btns[1]:
-                        if st.button(f"Send {f['id']} to graveyard", key=f"bury_{f['id']}"):
-                            bury_fusion(f['id'])
-                            st.rerun()
-
-with tabs[2]:
+        items = query(queries.filter_fusions, search_f)
+
+        def _fusion_cell(f):
+            fusion_tile(pokedex, f)
+            btns = st.columns(2)
+            with btns[0]:
+                if st.button(f"Unfuse {f['id']}", key=f"unfuse_{f['id']}"):
+                    unfuse_fusion(f['id'])
+                    rerun_view()
+            with btns[1]:
+                if st.button(f"Send {f['id']} to graveyard", key=f"bury_{f['id']}"):
+                    bury_fusion(f['id'])
+                    rerun_view()
+
+        windowed_grid(items, _fusion_cell, key="fusions_grid", species=lambda f: f["player1"]["a"]["name"])
+
+@view(shows=("player1_team", "player2_team", "fusions", "pairings"))
+def team_view():
     st.subheader("Current Team")
     main_cols = st.columns(2)
     with main_cols[0]:
@@ -597,40 +980,74 @@ with tabs[2]:
     with main_cols[1]:
         team_management_ui(1, pokedex)
 
-with tabs[3]:
+@view(shows=("graveyard",))
+def graveyard_view():
+    state = get_state()
     st.subheader("Graveyard")
     if not state.get("graveyard"):
         st.info("Graveyard is empty.")
     else:
-        grave_items = list(reversed(state["graveyard"]))
         search_g = st.text_input("Search graveyard", key="grave_search", placeholder="ID, name, or number")
-        if search_g:
-            qg = search_g.strip().lower()
-            def _gmatch(g):
-                if g.get("kind") == "pairing":
-                    n1 = int(g["player1"]["number"]); n2 = int(g["player2"]["number"])
-                    fields = [g.get("id",""), f"{n1:03d}", f"{n2:03d}"]
-                    fields += [name_for(pokedex, n1), name_for(pokedex, n2)]
-                    return any(qg in str(x).lower() for x in fields)
-                return False
-            grave_items = [g for g in grave_items if _gmatch(g)]
-
-        for i in range(0, len(grave_items), 6):
-            cols = st.columns(6)
-            for j in range(6):
-                k = i + j
-                if k >= len(grave_items):
-                    continue
-                g = grave_items[k]
-                with cols[j]:
-                    graveyard_card(pokedex, g)
-                    if g.get("kind") == "pairing":
-                        if st.button(f"Delete {g['id']}", key=f"del_grave_{g['id']}"):
-                            delete_graveyard_pairing(g['id'])
-                            st.rerun()
-
-with tabs[4]:
+        grave_items = query(queries.filter_graveyard, search_g)
+
+        def _grave_cell(g):
+            graveyard_card(pokedex, g)
+            if g.get("kind") == "pairing":
+                if st.button(f"Delete {g['id']}", key=f"del_grave_{g['id']}"):
+                    delete_graveyard_pairing(g['id'])
+                    rerun_view()
+
+        def _grave_species(g):
+            if g.get("kind") == "pairing":
+                return name_for(pokedex, int(g["player1"]["number"]))
+            return ""
+
+        windowed_grid(grave_items, _grave_cell, key="grave_grid", species=_grave_species, default_sort="Newest")
+
+@view
+def settings_view():
     st.subheader("Settings")
     reset_state_confirm()
+    if st.button("Repair fusion flags", help="Recompute every pairing's Fused/Unfused status from the fusions list"):
+        fixed = recompute_used_flags(get_shared_run())
+        st.success(f"Repaired {len(fixed)} pairing(s)." if fixed else "All flags were already consistent.")
+    st.divider()
+    import_ui()
+    st.divider()
+    snapshot_ui()
+    st.divider()
+    profiling_ui()
+    st.divider()
     st.caption("State file: data/state.json")
+    w = get_writer().stats
+    st.caption(
+        f"Saves: {w['writes']} written, {w['clean']} skipped (no changes), "
+        f"{w['coalesced']} coalesced into pending writes"
+    )
+
 
+def lazy_tabs(names: List[str]):
+    """Tabs that only run the open one. Streamlit versions whose tabs can't
+    track the open tab render them all, as before."""
+    try:
+        return st.tabs(names, key="active_tab", on_change="rerun")
+    except TypeError:
+        return st.tabs(names)
+
+st.title("Pokémon Infinite Fusion Soullink Tracker")
+VIEWS = {
+    "Pairings": pairings_view,
+    "Fusions": fusions_view,
+    "Team": team_view,
+    "Graveyard": graveyard_view,
+    "Settings": settings_view,
+}
+# A full run re-registers the views it renders for live sync
+st.session_state.get("live_views", {}).clear()
+try:
+    for tab, render in zip(lazy_tabs(list(VIEWS)), VIEWS.values()):
+        if getattr(tab, "open", None) is not False:
+            with tab:
+                render()
+finally:
+    keep_profile()
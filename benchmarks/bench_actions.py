@@ -0,0 +1,162 @@
+"""In-memory cost of the app's actions, list scans vs ``StateIndex``.
+
+For runs of 100 / 1k / 10k pairings, performs create fusion, evolve,
+unfuse, team add/remove and delete pairing the way app.py used to (scan
+the lists, rebuild them on delete) and the way it does now (id-keyed
+indexes), and reports the median per-action time. Saving is excluded; see
+bench_storage.py for that.
+
+    python benchmarks/bench_actions.py [sizes...]
+"""
+import copy
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storage  # noqa: E402
+from state_index import StateIndex, fusion_pairing_ids, recompute_used_flags  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+ROUNDS = 50
+ACTIONS = ("create_fusion", "evolve", "unfuse", "team_add_remove", "delete_pairing")
+
+
+def _fusion(pa, pb, fid):
+    fusion = {"id": fid, "created_at": "2024-01-03T00:00:00"}
+    for side in ("player1", "player2"):
+        fusion[side] = {
+            "a": {"pairing_id": pa["id"], "number": pa[side]["number"], "name": pa[side]["name"]},
+            "b": {"pairing_id": pb["id"], "number": pb[side]["number"], "name": pb[side]["name"]},
+        }
+    return fusion
+
+
+def _slot(p, side):
+    return dict(p[side], pairing_id=p["id"], source="Paired", uid=f'{p["id"]}_{side}')
+
+
+class Scan:
+    """The list-scanning versions of the actions."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def create_fusion(self, pid_a, pid_b, fid):
+        state = self.state
+        pa = next((p for p in state["pairings"] if p["id"] == pid_a), None)
+        pb = next((p for p in state["pairings"] if p["id"] == pid_b), None)
+        state["fusions"].append(_fusion(pa, pb, fid))
+        for p in (pa, pb):
+            p["player1"]["used"] = p["player2"]["used"] = True
+        recompute_used_flags(state)
+
+    def evolve(self, pid, side, number):
+        state = self.state
+        p = next((x for x in state["pairings"] if x["id"] == pid), None)
+        p[side]["number"] = number
+        for f in state["fusions"]:
+            for slot in ("a", "b"):
+                if f[side][slot]["pairing_id"] == pid:
+                    f[side][slot]["number"] = number
+
+    def unfuse(self, fid):
+        state = self.state
+        next((x for x in state["fusions"] if x["id"] == fid), None)
+        state["fusions"] = [x for x in state["fusions"] if x["id"] != fid]
+        recompute_used_flags(state)
+
+    def team_add_remove(self, pid):
+        state = self.state
+        p = next((x for x in state["pairings"] if x["id"] == pid), None)
+        slot = _slot(p, "player1")
+        if slot["uid"] not in {m["uid"] for m in state["player1_team"]}:
+            state["player1_team"].append(slot)
+        state["player1_team"] = [m for m in state["player1_team"] if m.get("uid") != slot["uid"]]
+
+    def delete_pairing(self, pid):
+        state = self.state
+        next((x for x in state["pairings"] if x["id"] == pid), None)
+        state["pairings"] = [x for x in state["pairings"] if x["id"] != pid]
+
+
+class Indexed:
+    """The ``StateIndex`` versions of the actions."""
+
+    def __init__(self, state):
+        self.index = StateIndex(state)
+
+    def create_fusion(self, pid_a, pid_b, fid):
+        index = self.index
+        pa, pb = index.pairing(pid_a), index.pairing(pid_b)
+        index.add("fusions", _fusion(pa, pb, fid))
+        index.refresh_used(pa)
+        index.refresh_used(pb)
+
+    def evolve(self, pid, side, number):
+        index = self.index
+        index.pairing(pid)[side]["number"] = number
+        for f in index.fusions_for_pairing(pid, side):
+            for slot in ("a", "b"):
+                if f[side][slot]["pairing_id"] == pid:
+                    f[side][slot]["number"] = number
+
+    def unfuse(self, fid):
+        index = self.index
+        f = index.remove("fusions", fid)
+        for pid in fusion_pairing_ids(f):
+            p = index.pairing(pid)
+            if p is not None:
+                index.refresh_used(p)
+
+    def team_add_remove(self, pid):
+        index = self.index
+        slot = _slot(index.pairing(pid), "player1")
+        if index.team_slot("player1_team", slot["uid"]) is None:
+            index.add("player1_team", slot)
+        index.remove("player1_team", slot["uid"])
+
+    def delete_pairing(self, pid):
+        self.index.remove("pairings", pid)
+
+
+def bench(impl_cls, base, seed=0) -> dict:
+    state = copy.deepcopy(base)
+    impl = impl_cls(state)
+    rng = random.Random(seed)
+    free = [p["id"] for p in state["pairings"] if not p["player1"]["used"] and not p["player2"]["used"]]
+    rng.shuffle(free)
+    timings = {name: [] for name in ACTIONS}
+
+    def timed(name, fn, *args):
+        t = time.perf_counter()
+        fn(*args)
+        timings[name].append(time.perf_counter() - t)
+
+    for i in range(min(ROUNDS, len(free) // 3)):
+        pid_a, pid_b, pid_c = free.pop(), free.pop(), free.pop()
+        fid = f"FB{i:04d}"
+        timed("create_fusion", impl.create_fusion, pid_a, pid_b, fid)
+        timed("evolve", impl.evolve, pid_a, "player1", 2)
+        timed("unfuse", impl.unfuse, fid)
+        timed("team_add_remove", impl.team_add_remove, pid_b)
+        timed("delete_pairing", impl.delete_pairing, pid_c)
+    return {name: statistics.median(v) * 1e6 for name, v in timings.items()}
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000]
+    dex = storage.load_pokedex()
+    print(f"{'pairings':>8} {'impl':<8} " + " ".join(f"{c:>16}" for c in ACTIONS) + "   (us)")
+    for size in sizes:
+        base = synthetic_state(size, dex=dex)
+        for name, impl in (("scan", Scan), ("indexed", Indexed)):
+            r = bench(impl, base)
+            print(f"{size:>8} {name:<8} " + " ".join(f"{r[c]:>16.1f}" for c in ACTIONS))
+
+
+if __name__ == "__main__":
+    main()
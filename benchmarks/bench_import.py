@@ -0,0 +1,99 @@
+"""Bulk encounter import vs adding pairings one at a time.
+
+Builds an encounter CSV (species given half by number, half by name, a
+tenth of the rows dead, some fused in pairs) and times each stage of
+``encounter_import`` on it: parsing, validation and the species join,
+applying the records to a synthetic run through ``StateIndex``, and the
+single save. For comparison, the first ``BASELINE_ROWS`` rows are also
+added the way ``add_pairing`` does it, one record and one full JSON save
+per row. Everything happens in a temporary directory:
+
+    python benchmarks/bench_import.py [rows]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storage  # noqa: E402
+from encounter_import import apply_import, plan_import, read_encounters  # noqa: E402
+from state_index import StateIndex, recompute_used_flags  # noqa: E402
+from storage import name_for, op_put, op_set  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+BASELINE_ROWS = 500
+
+
+def encounter_csv(rows: int, dex, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    nums = list(dex.numbers)
+    lines = ["Player 1,Player 2,Route,Status,Fusion"]
+    for i in range(rows):
+        a, b = rng.choice(nums), rng.choice(nums)
+        p1 = dex.name(a) if i % 2 else f"{a:03d}"
+        status = "dead" if i % 10 == 9 else ""
+        tag = f"f{i // 2}" if i % 10 < 4 else ""  # rows 0-3 of every ten fuse in pairs
+        lines.append(f"{p1},{b},Route {i % 40 + 1},{status},{tag}")
+    return "\n".join(lines) + "\n"
+
+
+def _ms(t: float) -> str:
+    return f"{(time.perf_counter() - t) * 1000:>9.1f} ms"
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    dex = storage.load_pokedex()
+    data = encounter_csv(rows, dex)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = Path(tmp)
+        storage.STATE_PATH = Path(tmp) / "state.json"
+        storage.STATE_BACKEND = "json"
+        base = synthetic_state(300, dex=dex)
+
+        state = dict(base, pairings=list(base["pairings"]), graveyard=list(base["graveyard"]),
+                     fusions=list(base["fusions"]))
+        index = StateIndex(state)
+        print(f"importing {rows} encounters into a 300-pairing run")
+        t0 = t = time.perf_counter()
+        df = read_encounters(data, "bench.csv")
+        print(f"  parse CSV              {_ms(t)}")
+        t = time.perf_counter()
+        plan = plan_import(df, dex, state)
+        print(f"  validate + resolve     {_ms(t)}  ({len(plan.errors)} errors)")
+        t = time.perf_counter()
+        ops = apply_import(plan, state, index)
+        print(f"  apply                  {_ms(t)}  ({len(ops)} ops)")
+        t = time.perf_counter()
+        storage.save_changes(state, ops)
+        print(f"  save once              {_ms(t)}")
+        print(f"  total                  {_ms(t0)}")
+        print(f"  used flags consistent: {not recompute_used_flags(state)}")
+
+        state = dict(base, pairings=list(base["pairings"]))
+        index = StateIndex(state)
+        n = min(rows, BASELINE_ROWS)
+        t = time.perf_counter()
+        for _, r in df.head(n).iterrows():
+            p1 = int(r["Player 1"]) if r["Player 1"].isdigit() else next(
+                k for k, nm in zip(dex.numbers, dex.names) if nm == r["Player 1"])
+            p2 = int(r["Player 2"])
+            pid = state["next_pair_id"]
+            pairing = {
+                "id": f"P{pid:04d}", "created_at": "",
+                "player1": {"number": p1, "name": name_for(dex, p1), "encounter": r["Route"], "used": False},
+                "player2": {"number": p2, "name": name_for(dex, p2), "encounter": r["Route"], "used": False},
+            }
+            index.add("pairings", pairing)
+            state["next_pair_id"] += 1
+            storage.save_changes(state, [op_put("pairings", pairing), op_set("next_pair_id", state["next_pair_id"])])
+        per_row = (time.perf_counter() - t) / n
+        print(f"one at a time, first {n} rows: {per_row * 1000:.2f} ms/row, "
+              f"~{per_row * rows:.1f} s for {rows} rows (saves only get slower as the file grows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Import-time budget for the storage core.
+
+Imports each core module in a fresh interpreter under ``python -X
+importtime`` and checks two things: the module's cumulative import time is
+within its budget, and importing it didn't pull in a heavy package
+(pandas, numpy, Streamlit, Pillow). Scripts and tools that only load or
+save a run, or look up names, shouldn't pay for those; pandas is imported
+when something asks for ``Pokedex.frame`` or imports ``encounter_import``.
+
+Each module is measured ``--runs`` times after one warm-up run (which
+writes the bytecode cache) and the median compared. Exits with status 1
+if a budget is exceeded or a heavy package is imported:
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --scale 2   # double every budget
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# module -> budget in ms (cumulative import time, interpreter start-up excluded)
+BUDGETS_MS: Dict[str, float] = {
+    "storage": 25,
+    "state_index": 30,
+    "search_index": 10,
+    "queries": 30,
+    "journal": 30,
+    "sqlite_store": 35,
+    "snapshot": 30,
+    "write_behind": 30,
+    "live_sync": 60,  # watchdog
+    "shared_state": 80,
+}
+HEAVY = ("pandas", "numpy", "streamlit", "PIL")
+
+
+def import_profile(module: str) -> Tuple[float, List[str]]:
+    """Cumulative import time of ``module`` in ms, and every module imported."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure imports from the bytecode cache
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stderr
+    total, imported = 0.0, []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        try:
+            us = int(cumulative)
+        except ValueError:
+            continue  # header line
+        imported.append(name)
+        if name == module:
+            total = us / 1000
+    return total, imported
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("modules", nargs="*", default=list(BUDGETS_MS))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow machines)")
+    args = ap.parse_args(argv)
+
+    failures = []
+    for module in args.modules:
+        import_profile(module)  # warm-up
+        times, imported = [], []
+        for _ in range(args.runs):
+            ms, imported = import_profile(module)
+            times.append(ms)
+        median = statistics.median(times)
+        budget = BUDGETS_MS.get(module, 50) * args.scale
+        heavy = sorted({name.split(".")[0] for name in imported} & set(HEAVY))
+        status = "ok"
+        if median > budget:
+            status = "OVER BUDGET"
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+        if status != "ok":
+            failures.append(module)
+        print(f"{module:<14} {median:7.1f} ms  (budget {budget:5.0f} ms)  {status}")
+    if failures:
+        print(f"{len(failures)} module(s) failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
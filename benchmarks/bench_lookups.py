@@ -0,0 +1,55 @@
+"""Micro-benchmark: per-lookup cost of sprite_for / name_for / get_evolutions.
+
+Compares the old DataFrame mask scan (``df.loc[df["number"] == n]``) against
+the indexed Pokedex. Run from the repo root:
+
+    python benchmarks/bench_lookups.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from storage import load_pokedex, sprite_for, name_for, get_evolutions  # noqa: E402
+
+
+def _mask_sprite_for(df, number):
+    row = df.loc[df["number"] == int(number)]
+    if row.empty:
+        return ""
+    return str(row.iloc[0].get("sprite", "")).strip()
+
+
+def _mask_name_for(df, number):
+    row = df.loc[df["number"] == int(number)]
+    if row.empty:
+        return ""
+    return str(row.iloc[0]["name"])
+
+
+def _per_call_us(fn, numbers, repeat: int = 5) -> float:
+    def run():
+        for n in numbers:
+            fn(n)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(numbers) * 1e6
+
+
+def main():
+    dex = load_pokedex()
+    df = dex.frame
+    numbers = list(dex.numbers)
+    rows = [
+        ("sprite_for (mask)", _per_call_us(lambda n: _mask_sprite_for(df, n), numbers)),
+        ("sprite_for (index)", _per_call_us(lambda n: sprite_for(dex, n), numbers)),
+        ("name_for (mask)", _per_call_us(lambda n: _mask_name_for(df, n), numbers)),
+        ("name_for (index)", _per_call_us(lambda n: name_for(dex, n), numbers)),
+        ("get_evolutions (index)", _per_call_us(lambda n: get_evolutions(dex, n), numbers)),
+    ]
+    for label, us in rows:
+        print(f"{label:<24} {us:10.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Fusion planner: time to rank every fusion of the unfused pairings.
+
+Builds synthetic runs with ``n`` unfused pairings of random species and
+times ``candidates`` (reading them out of the state) and ``rank`` (top 10
+over all n * (n - 1) ordered pairs) with the scorers the real app would
+use: evolution stage, plus custom sprites from a random sprite index and
+stats from a synthetic CSV, since the shipped data has neither. Run from
+the repo root:
+
+    python benchmarks/bench_planner.py [n ...]
+"""
+import csv
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import planner  # noqa: E402
+from fusion_index import FusionIndex  # noqa: E402
+from storage import load_pokedex  # noqa: E402
+
+RUNS = 7
+
+
+def make_state(dex, n: int, rng: random.Random):
+    pairings = []
+    for i in range(n):
+        a, b = rng.choice(dex.numbers), rng.choice(dex.numbers)
+        pairings.append({
+            "id": f"P{i + 1:04d}",
+            "player1": {"number": a, "name": dex.name(a), "used": False},
+            "player2": {"number": b, "name": dex.name(b), "used": False},
+        })
+    return {"pairings": pairings}
+
+
+def median_ms(fn) -> float:
+    times = []
+    for _ in range(RUNS):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 250, 500, 1000]
+    rng = random.Random(0)
+    dex = load_pokedex()
+    size = max(dex.numbers)
+    index = FusionIndex.from_pairs(size, ((rng.randint(1, size), rng.randint(1, size)) for _ in range(100_000)))
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_csv = Path(tmp) / "stats.csv"
+        with stats_csv.open("w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["number", "name", "hp", "attack", "defense", "sp_attack", "sp_defense", "speed"])
+            for n in dex.numbers:
+                w.writerow([n, dex.name(n)] + [rng.randint(20, 150) for _ in range(6)])
+        scorers = planner.scorers_for(dex, index, csv_path=stats_csv)
+
+    print(f"scorers: {', '.join(scorers)}")
+    for n in sizes:
+        state = make_state(dex, n, rng)
+        cands = planner.candidates(state, None)
+        read = median_ms(lambda: planner.candidates(state, None))
+        ranked = median_ms(lambda: planner.rank(cands, scorers, k=10))
+        print(f"{n:>5} pairings ({n * (n - 1):>8} pairs)  candidates {read:6.2f} ms  rank {ranked:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Cold-start cost of ``load_pokedex``: CSV parse vs the compiled Pokedex.
+
+Every measurement is a fresh interpreter, so nothing is warm but the OS
+file cache. ``csv`` parses the CSV and resolves every sprite path (what
+every start-up did before the compiled copy existed), ``build`` is a start
+with a stale compiled copy (parse, then write the new one) and
+``compiled`` a start with a current one. Run from the repo root:
+
+    python benchmarks/bench_pokedex_load.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = r"""
+import sys, time
+sys.path.insert(0, {root!r})
+import storage
+mode = {mode!r}
+if mode == "build":
+    storage._compiled_path(storage.POKEDEX_CSV).unlink(missing_ok=True)
+t = time.perf_counter()
+storage.load_pokedex(compiled=mode != "csv")
+print((time.perf_counter() - t) * 1000)
+"""
+
+
+def cold_ms(mode: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=str(ROOT), mode=mode)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    cold_ms("build")  # make sure a current compiled copy exists
+    for mode in ("csv", "build", "compiled"):
+        times = [cold_ms(mode) for _ in range(runs)]
+        print(f"{mode:<9} median {statistics.median(times):7.1f} ms   min {min(times):7.1f} ms   ({runs} runs)")
+    cold_ms("build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Rerun latency: full app reruns vs fragment reruns.
+
+Renders the app headlessly with Streamlit's AppTest against a synthetic
+state (default 300 pairings) and reports the median wall time of
+
+- a full rerun with each tab open (what ``st.rerun()`` costs),
+- a rerun of the Pairings tab fragment (search, paging, add pairing,
+  send/delete),
+- a rerun of one pairing tile fragment (evolving).
+
+AppTest has no public way to rerun a single fragment, so the fragment runs
+are requested the way the browser does, with the fragment's id in the rerun
+request. Background sprite prefetching and synthesis are switched off so
+they don't compete for the CPU. The real ``data/state.json`` is never
+touched. Run from the repo root:
+
+    python benchmarks/bench_rerun_latency.py [pairings]
+"""
+import functools
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import streamlit.testing.v1.local_script_runner as local_runner  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import fusion_sprites  # noqa: E402
+import fusion_synth  # noqa: E402
+import storage  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+TABS = ("Pairings", "Fusions", "Team", "Graveyard", "Settings")
+ROUNDS = 7
+
+
+def _timed(at, tab: str) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        at.session_state["active_tab"] = tab
+        t = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return statistics.median(times) * 1000
+
+
+def _fragment_ids(at, name: str):
+    """Ids of the registered fragments wrapping the function called ``name``."""
+    ids = []
+    for fid, frag in at._fragment_storage._fragments.items():
+        for cell in getattr(frag, "__closure__", None) or ():
+            try:
+                fn = cell.cell_contents
+            except ValueError:
+                continue
+            if getattr(fn, "__name__", None) == name:
+                ids.append(fid)
+    return ids
+
+
+def _timed_fragment(at, fid: str) -> float:
+    orig = local_runner.RerunData
+    local_runner.RerunData = functools.partial(orig, fragment_id_queue=[fid])
+    try:
+        return _timed(at, "Pairings")
+    finally:
+        local_runner.RerunData = orig
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    fusion_synth.prerender_in_background = lambda *a, **k: None
+    fusion_sprites.FusionSpriteCache.prefetch = lambda *a, **k: None
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = Path(tmp)
+        storage.STATE_PATH = Path(tmp) / "state.json"
+        storage.STATE_BACKEND = "json"
+        storage.STATE_PATH.write_text(json.dumps(synthetic_state(n)), encoding="utf-8")
+        at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120).run()
+        print(f"{n} pairings, median of {ROUNDS} (ms)")
+        for tab in TABS:
+            print(f"full rerun, {tab:<10} open  {_timed(at, tab):>8.1f}")
+        at.session_state["active_tab"] = "Pairings"
+        at.run()
+        for name, label in (("pairings_view", "Pairings tab"), ("pairing_tile_view", "one pairing tile")):
+            ids = _fragment_ids(at, name)
+            if ids:
+                print(f"fragment rerun, {label:<17} {_timed_fragment(at, ids[0]):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Bytes of markdown/image payload sent per rerun, inline vs static sprites.
+
+Renders the app headlessly with Streamlit's AppTest against a synthetic
+state (default 200 pairings) and sums the size of every markdown body, which
+is where ``clickable_sprite`` puts its ``<img>`` tags. The real
+``data/state.json`` is never touched. Run from the repo root:
+
+    python benchmarks/bench_rerun_payload.py [pairings]
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from streamlit import config  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import storage  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+
+def rerun_bytes(static: bool) -> int:
+    config.set_option("server.enableStaticServing", static)
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120).run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return sum(len(m.value.encode("utf-8")) for m in at.markdown)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = Path(tmp)
+        storage.STATE_PATH = Path(tmp) / "state.json"
+        storage.STATE_PATH.write_text(
+            json.dumps(synthetic_state(n, fusion_share=0, grave_share=0)), encoding="utf-8"
+        )
+        inline = rerun_bytes(static=False)
+        static = rerun_bytes(static=True)
+    print(f"{n} pairings")
+    print(f"inline data URIs   {inline:>12,} bytes/rerun")
+    print(f"static URLs/atlas  {static:>12,} bytes/rerun")
+
+
+if __name__ == "__main__":
+    main()
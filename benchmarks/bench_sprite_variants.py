@@ -0,0 +1,68 @@
+"""Sprite variants: build time and bytes sent per sprite.
+
+Makes ``count`` fusion-sized sprites out of the base sprites in a
+temporary directory, shaped like the custom fusion sprites the app caches
+from the CDN (96 px pixel art drawn as 3x3 blocks, 288 px). Then builds
+their variants with one worker and with the default process pool,
+rebuilds once more to show the disk cache, and compares the average bytes
+of the original and of the variant served at each display width. Run
+from the repo root:
+
+    python benchmarks/bench_sprite_variants.py [count]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import sprite_variants  # noqa: E402
+from sprite_variants import VARIANT_WIDTHS, SpriteVariants, build_variants  # noqa: E402
+from storage import load_pokedex  # noqa: E402
+
+FUSION_SIZE = 288
+
+
+def make_sources(folder: Path, count: int):
+    from PIL import Image
+
+    dex = load_pokedex()
+    sprites = [s for s in dex.sprites if s][:count]
+    paths = []
+    for i, s in enumerate(sprites):
+        with Image.open(s) as im:
+            art = im.convert("RGBA").resize((FUSION_SIZE // 3, FUSION_SIZE // 3), Image.NEAREST)
+        big = art.resize((FUSION_SIZE, FUSION_SIZE), Image.NEAREST)
+        p = folder / f"{i + 1}.{len(sprites) - i}.png"
+        big.save(p, format="PNG", optimize=True)
+        paths.append(p)
+    return paths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "src").mkdir()
+        sources = make_sources(tmp / "src", count)
+        for workers, label in ((1, "1 worker"), (None, "process pool")):
+            sprite_variants.VARIANTS_DIR = tmp / f"variants-{workers}"
+            sprite_variants.VARIANTS_MANIFEST = sprite_variants.VARIANTS_DIR / "manifest.json"
+            t = time.perf_counter()
+            manifest = build_variants(sources, max_workers=workers)
+            print(f"build {len(sources)} sprites, {label:<13} {(time.perf_counter() - t) * 1000:8.0f} ms")
+        t = time.perf_counter()
+        build_variants(sources)
+        print(f"rebuild, nothing changed          {(time.perf_counter() - t) * 1000:8.0f} ms")
+
+        variants = SpriteVariants(manifest["widths"], manifest["sprites"])
+        original = sum(p.stat().st_size for p in sources) / len(sources)
+        print(f"original {FUSION_SIZE} px: {original / 1024:6.1f} KiB per sprite")
+        for w in VARIANT_WIDTHS:
+            size = sum((variants.variant(str(p), w) or p).stat().st_size for p in sources) / len(sources)
+            print(f"  drawn at {w:>3} px: {size / 1024:6.1f} KiB ({size / original:4.0%})")
+
+
+if __name__ == "__main__":
+    main()
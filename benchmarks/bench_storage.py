@@ -0,0 +1,110 @@
+"""Per-action save latency for each storage backend.
+
+For runs of 100 / 1k / 10k pairings, replays the change batches that the
+app's actions produce (add pairing, create fusion, evolve, bury fusion)
+against the json, journal and sqlite backends in a temporary directory, and
+reports the median latency of ``save_changes`` plus one ``load_state``.
+
+    python benchmarks/bench_storage.py [sizes...]
+"""
+import copy
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import journal  # noqa: E402
+import sqlite_store  # noqa: E402
+import storage  # noqa: E402
+from storage import op_del, op_put, op_set  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+BACKENDS = ("json", "journal", "sqlite")
+ROUNDS = 20
+
+
+def _actions(state, i):
+    """Mutate ``state`` like the app's actions and yield (name, ops) per action."""
+    pid = state["next_pair_id"]
+    pairing = {
+        "id": f"P{pid:04d}", "created_at": "2024-01-03T00:00:00",
+        "player1": {"number": 1, "name": "Bulbasaur", "encounter": f"Bench {i}", "used": False},
+        "player2": {"number": 4, "name": "Charmander", "encounter": f"Bench {i}", "used": False},
+    }
+    state["pairings"].append(pairing)
+    state["next_pair_id"] += 1
+    yield "add_pairing", [op_put("pairings", pairing), op_set("next_pair_id", state["next_pair_id"])]
+
+    pa, pb = state["pairings"][-1], state["pairings"][-2]
+    fid = state["next_fusion_id"]
+    fusion = {"id": f"F{fid:04d}", "created_at": "2024-01-03T00:00:00"}
+    for side in ("player1", "player2"):
+        fusion[side] = {
+            "a": {"pairing_id": pa["id"], "number": pa[side]["number"], "name": pa[side]["name"]},
+            "b": {"pairing_id": pb["id"], "number": pb[side]["number"], "name": pb[side]["name"]},
+        }
+        pa[side]["used"] = pb[side]["used"] = True
+    state["fusions"].append(fusion)
+    state["next_fusion_id"] += 1
+    yield "create_fusion", [op_put("fusions", fusion), op_put("pairings", pa), op_put("pairings", pb),
+                            op_set("next_fusion_id", state["next_fusion_id"])]
+
+    pa["player1"]["number"], pa["player1"]["name"] = 2, "Ivysaur"
+    fusion["player1"]["a"]["number"], fusion["player1"]["a"]["name"] = 2, "Ivysaur"
+    yield "evolve", [op_put("pairings", pa), op_put("fusions", fusion)]
+
+    ops = []
+    for p in (pa, pb):
+        grave = {"kind": "pairing", "id": p["id"], "player1": {"number": p["player1"]["number"]},
+                 "player2": {"number": p["player2"]["number"]}, "created_at": "2024-01-03T00:00:00"}
+        state["graveyard"].append(grave)
+        ops += [op_put("graveyard", grave), op_del("pairings", p["id"])]
+    state["pairings"] = [p for p in state["pairings"] if p["id"] not in (pa["id"], pb["id"])]
+    state["fusions"] = [f for f in state["fusions"] if f["id"] != fusion["id"]]
+    yield "bury_fusion", ops + [op_del("fusions", fusion["id"])]
+
+
+def bench(size: int, backend: str, base) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = Path(tmp)
+        storage.STATE_PATH = Path(tmp) / "state.json"
+        storage.STATE_BACKEND = backend
+        journal._journals.clear()
+        sqlite_store._stores.clear()
+        state = copy.deepcopy(base)
+        storage.save_state(state)
+        timings = {}
+        for i in range(ROUNDS):
+            for name, ops in _actions(state, i):
+                t = time.perf_counter()
+                storage.save_changes(state, ops)
+                timings.setdefault(name, []).append(time.perf_counter() - t)
+        t = time.perf_counter()
+        loaded = storage.load_state()
+        load_s = time.perf_counter() - t
+        assert len(loaded["pairings"]) == len(state["pairings"])
+        for s in sqlite_store._stores.values():
+            s.close()
+        sqlite_store._stores.clear()
+    out = {name: statistics.median(v) * 1000 for name, v in timings.items()}
+    out["load_state"] = load_s * 1000
+    return out
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000]
+    dex = storage.load_pokedex()
+    cols = ["add_pairing", "create_fusion", "evolve", "bury_fusion", "load_state"]
+    print(f"{'pairings':>8} {'backend':<8} " + " ".join(f"{c:>13}" for c in cols) + "   (ms)")
+    for size in sizes:
+        base = synthetic_state(size, dex=dex)
+        for backend in BACKENDS:
+            r = bench(size, backend, base)
+            print(f"{size:>8} {backend:<8} " + " ".join(f"{r[c]:>13.2f}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Headless benchmark suite with a stored baseline.
+
+Times the code every rerun goes through on synthetic runs (see
+``synthetic.py``) of several sizes: loading the Pokedex (compiled and from
+the CSV), loading and saving the run (JSON backend, in a temporary
+directory), the per-species lookups, ``recompute_used_flags``, building
+the ``StateIndex``, the team candidates (``queries.player_pokemon``) and
+the tab search filters.
+
+Each case is run a few times and its median kept. Results are printed and
+can be written as JSON; with a baseline (by default
+``benchmarks/baseline.json``) every case is compared against it and the
+suite exits with status 1 if one got slower than its threshold allows.
+A case only counts as a regression if it is both ``--threshold`` times
+slower and ``--min-delta-ms`` slower, so sub-millisecond cases don't fail
+on noise:
+
+    python benchmarks/suite.py                       # 100, 1000, 10000 pairings
+    python benchmarks/suite.py --sizes 100 1000 --out results.json
+    python benchmarks/suite.py --threshold 0.5 --threshold-for save_state=1.0
+    python benchmarks/suite.py --save-baseline       # record a new baseline
+
+Baselines are machine-specific; record one on the machine you compare on.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import queries  # noqa: E402
+import storage  # noqa: E402
+from state_index import StateIndex, recompute_used_flags  # noqa: E402
+from storage import get_evolutions, name_for, sprite_for  # noqa: E402
+from synthetic import synthetic_state  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MIN_DELTA_MS = 2.0
+# Searches a player might type: a name fragment, a number, an encounter
+SEARCHES = ("chu", "25", "route 1")
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Run ``fn`` ``repeat`` times (calling ``setup`` untimed before each) and
+    summarize in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return {"median_ms": round(statistics.median(times), 4), "min_ms": round(min(times), 4), "runs": repeat}
+
+
+def _repeat_for(size: int) -> int:
+    return 15 if size <= 1000 else 5
+
+
+def run_suite(sizes=DEFAULT_SIZES) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    results["load_pokedex"] = measure(storage.load_pokedex, repeat=5)
+    results["load_pokedex_csv"] = measure(lambda: storage.load_pokedex(compiled=False), repeat=5)
+    dex = storage.load_pokedex()
+    numbers = list(dex.numbers)
+
+    def lookups(fn):
+        def run():
+            for n in numbers:
+                fn(dex, n)
+        return run
+
+    # Per full pass over the Pokedex
+    results["sprite_for"] = measure(lookups(sprite_for), repeat=15)
+    results["name_for"] = measure(lookups(name_for), repeat=15)
+    results["get_evolutions"] = measure(lookups(get_evolutions), repeat=15)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = Path(tmp)
+        storage.STATE_PATH = Path(tmp) / "state.json"
+        storage.STATE_BACKEND = "json"
+        for size in sizes:
+            repeat = _repeat_for(size)
+            state = synthetic_state(size, dex=dex)
+
+            def case(name: str, fn, setup=None):
+                results[f"{name}[{size}]"] = measure(fn, repeat, setup)
+
+            case("save_state", lambda: storage.save_state(state))
+            case("load_state", storage.load_state)
+            case("recompute_used_flags", lambda: recompute_used_flags(state))
+            case("state_index", lambda: StateIndex(state, name_of=dex.name))
+            case("player_pokemon", lambda: (queries.player_pokemon(state, 0), queries.player_pokemon(state, 1)))
+            case("available_player_pokemon", lambda: queries.available_player_pokemon(state, 0))
+
+            # First search after a change builds the search index; later ones reuse it
+            index = StateIndex(state, name_of=dex.name)
+
+            def fresh_index():
+                index.rebuild(state)
+
+            def search_all():
+                for q in SEARCHES:
+                    queries.filter_pairings(state, index, q)
+                    queries.filter_fusions(state, index, q)
+                    queries.filter_graveyard(state, index, q)
+
+            case("search_cold", search_all, setup=fresh_index)
+            case("search_warm", search_all)
+            case("filter_unfused", lambda: queries.filter_pairings(state, index, only_unfused=True))
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float,
+            min_delta_ms: float, per_case: Dict[str, float]) -> List[Dict[str, Any]]:
+    """One row per case in both runs; ``regressed`` marks the failures.
+    ``per_case`` overrides the threshold by case name (without the size)."""
+    rows = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limit = per_case.get(name.split("[")[0], threshold)
+        ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        delta = cur["median_ms"] - base["median_ms"]
+        rows.append({
+            "case": name,
+            "baseline_ms": base["median_ms"],
+            "median_ms": cur["median_ms"],
+            "ratio": round(ratio, 3),
+            "threshold": limit,
+            "regressed": ratio > 1 + limit and delta > min_delta_ms,
+        })
+    return rows
+
+
+def _parse_thresholds(items: List[str]) -> Dict[str, float]:
+    out = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if not value:
+            raise SystemExit(f"--threshold-for expects CASE=RATIO, got {item!r}")
+        out[name] = float(value)
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="pairings per synthetic run")
+    ap.add_argument("--out", type=Path, help="write the results as JSON here")
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="allowed slowdown as a fraction (0.5: 50%% slower)")
+    ap.add_argument("--threshold-for", action="append", default=[], metavar="CASE=RATIO",
+                    help="per-case threshold, e.g. save_state=1.0")
+    ap.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                    help="ignore slowdowns smaller than this")
+    ap.add_argument("--save-baseline", action="store_true", help="write the results to --baseline instead of comparing")
+    args = ap.parse_args(argv)
+    per_case = _parse_thresholds(args.threshold_for)
+
+    results = run_suite(args.sizes)
+    report: Dict[str, Any] = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+        },
+        "results": results,
+    }
+
+    rows = []
+    if not args.save_baseline and args.baseline.is_file():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+        rows = compare(results, baseline, args.threshold, args.min_delta_ms, per_case)
+        report["comparison"] = {"baseline": str(args.baseline), "cases": rows}
+    by_case = {r["case"]: r for r in rows}
+
+    for name, r in results.items():
+        line = f"{name:<34} {r['median_ms']:>10.3f} ms"
+        cmp = by_case.get(name)
+        if cmp:
+            line += f"   x{cmp['ratio']:<6.2f} vs {cmp['baseline_ms']:.3f} ms"
+            if cmp["regressed"]:
+                line += "   REGRESSION"
+        print(line)
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    regressions = [r["case"] for r in rows if r["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
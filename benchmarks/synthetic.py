@@ -0,0 +1,80 @@
+"""Synthetic run states built from the real Pokedex, for benchmarks."""
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import storage  # noqa: E402
+
+
+def synthetic_state(
+    pairings: int,
+    fusion_share: float = 0.2,
+    grave_share: float = 0.1,
+    seed: int = 0,
+    dex=None,
+) -> Dict[str, Any]:
+    """A run with ``pairings`` live pairings, roughly ``fusion_share`` of them
+    fused in pairs, ``grave_share`` as many graveyard entries, and full teams.
+    """
+    rng = random.Random(seed)
+    dex = dex or storage.load_pokedex()
+    nums = list(dex.numbers)
+    state: Dict[str, Any] = {
+        "pairings": [], "fusions": [], "graveyard": [],
+        "player1_team": [], "player2_team": [],
+        "next_pair_id": 1, "next_fusion_id": 1,
+    }
+
+    def mon(n: int, enc: str) -> Dict[str, Any]:
+        return {"number": n, "name": dex.name(n), "encounter": enc, "used": False}
+
+    total = pairings + int(pairings * grave_share)
+    for i in range(1, total + 1):
+        enc = f"Route {rng.randint(1, 40)}"
+        state["pairings"].append({
+            "id": f"P{i:04d}",
+            "created_at": "2024-01-01T00:00:00",
+            "player1": mon(rng.choice(nums), enc),
+            "player2": mon(rng.choice(nums), enc),
+        })
+    state["next_pair_id"] = total + 1
+
+    # Move the tail to the graveyard
+    for p in state["pairings"][pairings:]:
+        state["graveyard"].append({
+            "kind": "pairing", "id": p["id"],
+            "player1": {"number": p["player1"]["number"]},
+            "player2": {"number": p["player2"]["number"]},
+            "created_at": "2024-01-02T00:00:00",
+        })
+    del state["pairings"][pairings:]
+
+    live = state["pairings"]
+    for k in range(0, int(len(live) * fusion_share) // 2 * 2, 2):
+        pa, pb = live[k], live[k + 1]
+        fid = state["next_fusion_id"]
+        fusion = {"id": f"F{fid:04d}", "created_at": "2024-01-01T00:00:00"}
+        for side in ("player1", "player2"):
+            fusion[side] = {
+                "a": {"pairing_id": pa["id"], "number": pa[side]["number"], "name": pa[side]["name"]},
+                "b": {"pairing_id": pb["id"], "number": pb[side]["number"], "name": pb[side]["name"]},
+            }
+            pa[side]["used"] = pb[side]["used"] = True
+        state["fusions"].append(fusion)
+        state["next_fusion_id"] += 1
+
+    # Evolve a few species in place, the way evolve_pairing_mon does
+    for p in rng.sample(live, min(len(live), max(1, pairings // 10))):
+        evos = dex.evolutions.evolutions(p["player1"]["number"])
+        if evos and not p["player1"]["used"]:
+            n, name = evos[0]
+            p["player1"]["number"], p["player1"]["name"] = n, name
+
+    for p in live[-3:]:
+        for side, team in (("player1", "player1_team"), ("player2", "player2_team")):
+            slot = dict(p[side], pairing_id=p["id"], source="Paired", uid=f'{p["id"]}_{side}')
+            state[team].append(slot)
+    return state
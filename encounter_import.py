@@ -0,0 +1,203 @@
+"""Bulk import of encounter lists (CSV or JSON) as pairings.
+
+Each row is one encounter: Player 1's species, Player 2's species, the
+encounter name and, optionally, a status and a fusion tag. Species may be
+given by Pokedex number (``25``, ``#025``, ``025 - Pikachu``) or by name
+(case-insensitive). Both species columns are resolved against the Pokedex
+in one vectorized join, every row is validated before anything is applied,
+and the whole list becomes one batch of change ops, so it is saved once.
+
+Recognised columns (headers are case-insensitive; spaces and dashes count
+as underscores):
+
+- Player 1 species: ``p1``, ``player1``, ``player_1``, ``p1_species``, ``player1_species``
+- Player 2 species: the same with 2
+- encounter: ``encounter``, ``route``, ``location``, ``area``
+- status (optional): empty or ``alive``; ``dead``, ``fainted``, ``grave``
+  or ``graveyard`` sends the pairing straight to the graveyard
+- fusion (optional): a free-form tag; the two rows sharing a tag are fused
+  (the first row's Pokémon become the fusion's ``a`` side)
+"""
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import pandas as pd
+
+from storage import Pokedex, op_put, op_set
+
+P1_COLUMNS = ("p1", "player1", "player_1", "p1_species", "player1_species")
+P2_COLUMNS = ("p2", "player2", "player_2", "p2_species", "player2_species")
+ENCOUNTER_COLUMNS = ("encounter", "route", "location", "area")
+STATUS_COLUMNS = ("status",)
+FUSION_COLUMNS = ("fusion", "fused_with", "fusion_tag")
+
+ALIVE = {"", "alive", "live"}
+DEAD = {"dead", "fainted", "grave", "graveyard"}
+
+class RowError(NamedTuple):
+    row: int  # 1-based, counting encounters (not the header)
+    message: str
+
+class ImportPlan:
+    """What importing a list would add, or why it can't be imported."""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.errors: List[RowError] = []
+        self.pairings: List[Dict[str, Any]] = []
+        self.graveyard: List[Dict[str, Any]] = []
+        self.fusions: List[Dict[str, Any]] = []
+        self.next_pair_id = 0
+        self.next_fusion_id = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.rows > 0
+
+    def ops(self) -> List[Dict[str, Any]]:
+        """The change ops saving this import in one batch."""
+        return (
+            [op_put("pairings", p) for p in self.pairings]
+            + [op_put("graveyard", g) for g in self.graveyard]
+            + [op_put("fusions", f) for f in self.fusions]
+            + [op_set("next_pair_id", self.next_pair_id), op_set("next_fusion_id", self.next_fusion_id)]
+        )
+
+def read_encounters(data: Union[bytes, str], filename: str = "") -> pd.DataFrame:
+    """Parse an uploaded encounter list. JSON is a list of objects (or
+    ``{"encounters": [...]}``); anything else is read as CSV. All values are
+    kept as text."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or data.lstrip().startswith(("[", "{")):
+        rows = json.loads(data)
+        if isinstance(rows, dict):
+            rows = rows.get("encounters", [])
+        df = pd.DataFrame(rows)
+    else:
+        df = pd.read_csv(io.StringIO(data), dtype=str, keep_default_na=False, skipinitialspace=True)
+    return df.astype(object).where(df.notna(), "").astype(str)
+
+def _column(df: pd.DataFrame, names) -> Optional[str]:
+    by_key = {str(c).strip().lower().replace(" ", "_").replace("-", "_"): c for c in df.columns}
+    return next((by_key[n] for n in names if n in by_key), None)
+
+def resolve_species(values: pd.Series, pokedex: Pokedex) -> pd.Series:
+    """Pokedex numbers for species given by number or name; NaN where unknown."""
+    raw = values.astype(str).str.strip()
+    numbers = pd.to_numeric(raw.str.extract(r"^#?(\d+)\b", expand=False), errors="coerce")
+    names = pd.Series(pokedex.numbers, index=[n.lower() for n in pokedex.names], dtype="float64")
+    by_name = raw.str.lower().map(names[~names.index.duplicated()])
+    resolved = numbers.fillna(by_name)
+    return resolved.where(resolved.isin(pokedex.numbers))
+
+def plan_import(df: pd.DataFrame, pokedex: Pokedex, state: Dict[str, Any]) -> ImportPlan:
+    """Validate ``df`` and build the records it would add to ``state``.
+    Nothing is changed; if any row has an error the plan adds nothing."""
+    plan = ImportPlan(len(df))
+    if len(df) == 0:  # nothing to import, whatever the columns
+        return plan
+    cols = {
+        "p1": _column(df, P1_COLUMNS),
+        "p2": _column(df, P2_COLUMNS),
+        "encounter": _column(df, ENCOUNTER_COLUMNS),
+    }
+    missing = [k for k, c in cols.items() if c is None]
+    if missing:
+        plan.errors.append(RowError(0, f"Missing column(s): {', '.join(missing)}"))
+        return plan
+
+    df = df.reset_index(drop=True)
+    p1 = resolve_species(df[cols["p1"]], pokedex)
+    p2 = resolve_species(df[cols["p2"]], pokedex)
+    encounter = df[cols["encounter"]].str.strip()
+    status_col = _column(df, STATUS_COLUMNS)
+    status = df[status_col].str.strip().str.lower() if status_col else pd.Series("", index=df.index)
+    fusion_col = _column(df, FUSION_COLUMNS)
+    tag = df[fusion_col].str.strip() if fusion_col else pd.Series("", index=df.index)
+    dead = status.isin(DEAD)
+
+    def unknown(player: int, col: str):
+        def message(i) -> str:
+            value = df.at[i, col].strip()
+            return f"Unknown Player {player} species {value!r}" if value else f"Player {player} species is empty"
+        return message
+
+    problems = [
+        (p1.isna(), unknown(1, cols["p1"])),
+        (p2.isna(), unknown(2, cols["p2"])),
+        (encounter == "", lambda i: "Encounter is empty"),
+        (~status.isin(ALIVE | DEAD), lambda i: f"Unknown status {status[i]!r}"),
+        ((tag != "") & dead, lambda i: "A pairing in the graveyard can't be fused"),
+    ]
+    group_sizes = tag[tag != ""].map(tag[tag != ""].value_counts())
+    problems.append((
+        group_sizes.reindex(df.index, fill_value=2) != 2,
+        lambda i: f"Fusion tag {tag[i]!r} must be on exactly two rows, not {group_sizes[i]}",
+    ))
+    for mask, message in problems:
+        plan.errors += [RowError(int(i) + 1, message(i)) for i in df.index[mask]]
+    if plan.errors:
+        plan.errors.sort()
+        return plan
+
+    names = dict(zip(pokedex.numbers, pokedex.names))
+    now = datetime.utcnow().isoformat()
+    first_id = state["next_pair_id"]
+    ids = [f"P{n:04d}" for n in range(first_id, first_id + len(df))]
+    plan.next_pair_id = first_id + len(df)
+    by_tag: Dict[str, List[Dict[str, Any]]] = {}
+    for pid, n1, n2, enc, is_dead, t in zip(ids, p1.astype(int), p2.astype(int), encounter, dead, tag):
+        if is_dead:
+            plan.graveyard.append({
+                "kind": "pairing",
+                "id": pid,
+                "player1": {"number": int(n1)},
+                "player2": {"number": int(n2)},
+                "created_at": now,
+            })
+            continue
+        pairing = {
+            "id": pid,
+            "created_at": now,
+            "player1": {"number": int(n1), "name": names[n1], "encounter": enc, "used": bool(t)},
+            "player2": {"number": int(n2), "name": names[n2], "encounter": enc, "used": bool(t)},
+        }
+        plan.pairings.append(pairing)
+        if t:
+            by_tag.setdefault(t, []).append(pairing)
+
+    fid = state["next_fusion_id"]
+    for pa, pb in by_tag.values():
+        plan.fusions.append({
+            "id": f"F{fid:04d}",
+            "created_at": now,
+            "player1": {
+                "a": {"pairing_id": pa["id"], "number": pa["player1"]["number"], "name": pa["player1"]["name"]},
+                "b": {"pairing_id": pb["id"], "number": pb["player1"]["number"], "name": pb["player1"]["name"]},
+            },
+            "player2": {
+                "a": {"pairing_id": pa["id"], "number": pa["player2"]["number"], "name": pa["player2"]["name"]},
+                "b": {"pairing_id": pb["id"], "number": pb["player2"]["number"], "name": pb["player2"]["name"]},
+            },
+        })
+        fid += 1
+    plan.next_fusion_id = fid
+    return plan
+
+def apply_import(plan: ImportPlan, state: Dict[str, Any], index=None) -> List[Dict[str, Any]]:
+    """Add a valid plan's records to ``state`` (through ``index`` if given,
+    keeping it current) and return the ops to save."""
+    if not plan.ok:
+        raise ValueError("Import has errors; nothing was applied")
+    for coll, records in (("pairings", plan.pairings), ("graveyard", plan.graveyard), ("fusions", plan.fusions)):
+        if index is not None:
+            for rec in records:
+                index.add(coll, rec)
+        else:
+            state.setdefault(coll, []).extend(records)
+    state["next_pair_id"] = plan.next_pair_id
+    state["next_fusion_id"] = plan.next_fusion_id
+    return plan.ops()
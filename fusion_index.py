@@ -0,0 +1,219 @@
+"""Which head/body fusions have a custom sprite, as a bitset.
+
+One bit per ``(head, body)`` pair of dex numbers 1..n: row ``head - 1``,
+column ``body - 1``, rows padded to whole bytes (565 species: 565 rows of
+71 bytes, about 40 KB). The manifest file is the header ``MAGIC`` and n as
+a big-endian uint16, followed by the rows.
+
+``has_custom_sprite`` is a byte lookup; the array queries (every body with
+a custom sprite for a head, many pairs at once) work on a NumPy view of the
+same bytes. Without a manifest ``get_fusion_index`` returns None and the app
+asks the CDN as before.
+
+The manifest is built offline from anything that names the custom sprites,
+``<head>.<body>.png`` with an optional letter for alternates: a directory
+(searched recursively, e.g. the game's CustomBattlers folder or
+static/fusions/) or a text file with one name, path or URL per line:
+
+    python fusion_index.py path/to/CustomBattlers [more sources] [--merge]
+"""
+import argparse
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from storage import BASE_DIR
+
+FUSION_INDEX_PATH = BASE_DIR / "data" / "custom_sprites.bits"
+MAGIC = b"SLFIX\x01"
+_HEADER = struct.Struct(">H")
+# Seconds between checks for a rebuilt manifest
+RELOAD_INTERVAL = 30.0
+
+# 12.34.png, 12.34a.png; not triple fusions (1.2.3.png) or other files
+_NAME = re.compile(r"^(\d+)\.(\d+)[a-z]*(?:\.png)?$", re.IGNORECASE)
+
+Key = Tuple[int, int]
+
+class FusionIndex:
+    """Read-only bitset of the fusions with a custom sprite."""
+
+    __slots__ = ("size", "row_bytes", "_raw", "_bits")
+
+    def __init__(self, size: int, raw: bytes):
+        self.size = int(size)
+        self.row_bytes = (self.size + 7) // 8
+        if len(raw) != self.size * self.row_bytes:
+            raise ValueError(f"expected {self.size * self.row_bytes} bytes of bits, got {len(raw)}")
+        self._raw = bytes(raw)
+        self._bits = np.frombuffer(self._raw, dtype=np.uint8).reshape(self.size, self.row_bytes)
+
+    @classmethod
+    def from_pairs(cls, size: int, pairs: Iterable[Key]) -> "FusionIndex":
+        """Index of ``pairs``; pairs outside 1..size are ignored."""
+        grid = np.zeros((size, size), dtype=bool)
+        for head, body in pairs:
+            if 1 <= head <= size and 1 <= body <= size:
+                grid[head - 1, body - 1] = True
+        return cls(size, np.packbits(grid, axis=1).tobytes())
+
+    def __len__(self) -> int:
+        """Number of fusions with a custom sprite."""
+        return int(np.unpackbits(self._bits).sum())
+
+    def has_custom_sprite(self, head: int, body: int) -> bool:
+        h, b = int(head) - 1, int(body) - 1
+        if not (0 <= h < self.size and 0 <= b < self.size):
+            return False
+        return bool(self._raw[h * self.row_bytes + (b >> 3)] & (0x80 >> (b & 7)))
+
+    def has_custom_sprites(self, heads, bodies) -> np.ndarray:
+        """``has_custom_sprite`` for arrays of heads and bodies (broadcast)."""
+        h = np.asarray(heads, dtype=np.int64) - 1
+        b = np.asarray(bodies, dtype=np.int64) - 1
+        h, b = np.broadcast_arrays(h, b)
+        ok = (h >= 0) & (h < self.size) & (b >= 0) & (b < self.size)
+        hc, bc = np.where(ok, h, 0), np.where(ok, b, 0)
+        bits = (self._bits[hc, bc >> 3] >> (7 - (bc & 7)).astype(np.uint8)) & 1
+        return ok & bits.astype(bool)
+
+    def bodies_for(self, head: int) -> np.ndarray:
+        """Dex numbers of every body with a custom sprite under ``head``."""
+        h = int(head) - 1
+        if not 0 <= h < self.size:
+            return np.empty(0, dtype=np.int64)
+        row = np.unpackbits(self._bits[h])[: self.size]
+        return np.flatnonzero(row) + 1
+
+    def heads_for(self, body: int) -> np.ndarray:
+        """Dex numbers of every head with a custom sprite over ``body``."""
+        b = int(body) - 1
+        if not 0 <= b < self.size:
+            return np.empty(0, dtype=np.int64)
+        column = (self._bits[:, b >> 3] >> (7 - (b & 7))) & 1
+        return np.flatnonzero(column) + 1
+
+    def pairs(self) -> Iterator[Key]:
+        grid = np.unpackbits(self._bits, axis=1)[:, : self.size]
+        for h, b in zip(*np.nonzero(grid)):
+            yield int(h) + 1, int(b) + 1
+
+    # ----- file -----
+
+    def to_bytes(self) -> bytes:
+        return MAGIC + _HEADER.pack(self.size) + self._raw
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FusionIndex":
+        start = len(MAGIC) + _HEADER.size
+        if not data.startswith(MAGIC) or len(data) < start:
+            raise ValueError("not a fusion sprite index")
+        (size,) = _HEADER.unpack(data[len(MAGIC):start])
+        return cls(size, data[start:])
+
+
+def read_index(path: Optional[Path] = None) -> Optional[FusionIndex]:
+    """The manifest at ``path`` (default ``FUSION_INDEX_PATH``), or None if
+    it's missing or unreadable."""
+    try:
+        return FusionIndex.from_bytes(Path(path or FUSION_INDEX_PATH).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+def write_index(index: FusionIndex, path: Optional[Path] = None) -> None:
+    path = Path(path or FUSION_INDEX_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_bytes(index.to_bytes())
+    os.replace(tmp, path)
+
+# ---------- Building (offline) ----------
+
+def parse_name(name: str) -> Optional[Key]:
+    """``(head, body)`` for a custom sprite file name, path or URL."""
+    m = _NAME.match(name.strip().rsplit("/", 1)[-1])
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+def scan_sources(sources: Iterable[Path]) -> Iterator[Key]:
+    """Every ``(head, body)`` named by the directories and list files."""
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            names: Iterable[str] = (p.name for p in source.rglob("*.png"))
+        else:
+            with source.open("r", encoding="utf-8") as f:
+                names = [line for line in f if line.strip()]
+        for name in names:
+            key = parse_name(name)
+            if key is not None:
+                yield key
+
+def build_index(sources: Iterable[Path], size: int, merge: Optional[FusionIndex] = None) -> FusionIndex:
+    pairs = list(scan_sources(sources))
+    if merge is not None:
+        pairs.extend(merge.pairs())
+    return FusionIndex.from_pairs(size, pairs)
+
+# ---------- Process-wide index ----------
+
+_index: Optional[FusionIndex] = None
+_index_mtime: Optional[int] = None
+_checked_at = float("-inf")
+_index_lock = threading.Lock()
+
+def get_fusion_index() -> Optional[FusionIndex]:
+    """The manifest in use, or None without one. A rebuilt manifest is
+    picked up within ``RELOAD_INTERVAL`` seconds."""
+    global _index, _index_mtime, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < RELOAD_INTERVAL:
+        return _index
+    with _index_lock:
+        if now - _checked_at < RELOAD_INTERVAL:
+            return _index
+        try:
+            mtime = FUSION_INDEX_PATH.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != _index_mtime:
+            _index = read_index() if mtime is not None else None
+            _index_mtime = mtime
+        _checked_at = now
+    return _index
+
+def sprite_known_missing(head: int, body: int) -> bool:
+    """True when the manifest says the fusion has no custom sprite."""
+    index = get_fusion_index()
+    return index is not None and not index.has_custom_sprite(head, body)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Build the custom fusion sprite index.")
+    ap.add_argument("sources", nargs="+", type=Path, help="directories of sprites or text files of names")
+    ap.add_argument("--out", type=Path, default=None, help=f"default: {FUSION_INDEX_PATH}")
+    ap.add_argument("--size", type=int, default=None, help="number of species (default: the Pokédex)")
+    ap.add_argument("--merge", action="store_true", help="keep the fusions already in --out")
+    args = ap.parse_args(argv)
+    out = args.out or FUSION_INDEX_PATH
+
+    size = args.size
+    if size is None:
+        from storage import load_pokedex
+        size = max(load_pokedex().numbers)
+    merge = read_index(out) if args.merge else None
+    if merge is not None and merge.size != size:
+        print(f"{out} is for {merge.size} species, not {size}", file=sys.stderr)
+        return 1
+    index = build_index(args.sources, size, merge)
+    write_index(index, out)
+    print(f"{len(index)} custom sprites for {size} species -> {out} ({out.stat().st_size} bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
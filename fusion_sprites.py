@@ -0,0 +1,223 @@
+"""Local on-disk cache of custom fusion sprites fetched from the CDN.
+
+Sprites are stored as static/fusions/<head>.<body>.png so Streamlit's static
+serving can hand them to the browser directly. Fetches run on a small thread
+pool and skip fusions the sprite index (fusion_index) lists as having no
+custom sprite; the least recently used files are evicted once the cache
+grows past its byte budget.
+"""
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fusion_index import sprite_known_missing
+from storage import BASE_DIR
+
+FUSION_CACHE_DIR = BASE_DIR / "static" / "fusions"
+FUSION_CACHE_URL_PREFIX = "app/static/fusions"
+FUSION_CDN_URL = "https://ifd-spaces.sfo2.cdn.digitaloceanspaces.com/custom/{head}.{body}.png"
+
+# Byte budget for the cache directory; override with FUSION_CACHE_MAX_BYTES
+DEFAULT_MAX_BYTES = int(os.environ.get("FUSION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Seconds before a failed fetch (404, timeout) is retried
+MISS_TTL = 15 * 60
+
+PLACEHOLDER_URI = (
+    "data:image/svg+xml;utf8,"
+    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 96 96'>"
+    "<rect x='4' y='4' width='88' height='88' rx='12' fill='%23eee' stroke='%23bbb' stroke-dasharray='6 4'/>"
+    "<text x='48' y='60' font-size='40' text-anchor='middle' fill='%23999'>?</text></svg>"
+)
+
+Key = Tuple[int, int]
+Fetcher = Callable[[int, int], Optional[bytes]]
+
+def url_fetcher(template: str = FUSION_CDN_URL, timeout: float = 10.0) -> Fetcher:
+    """Fetcher that GETs ``template.format(head=..., body=...)``.
+
+    Returns None when the sprite doesn't exist (HTTP 404) and raises on
+    other failures.
+    """
+    def fetch(head: int, body: int) -> Optional[bytes]:
+        url = template.format(head=int(head), body=int(body))
+        req = urllib.request.Request(url, headers={"User-Agent": "soullink-tracker"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code in (403, 404):
+                return None
+            raise
+    return fetch
+
+class FusionSpriteCache:
+    """Size-bounded LRU cache of fusion sprites keyed by ``(head, body)``."""
+
+    def __init__(
+        self,
+        cache_dir: Path = FUSION_CACHE_DIR,
+        fetcher: Optional[Fetcher] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        workers: int = 4,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.fetcher = fetcher or url_fetcher()
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Key, int]" = OrderedDict()  # key -> size, oldest first
+        self._bytes = 0
+        self._misses: Dict[Key, float] = {}  # key -> time of failed fetch
+        self._inflight: Dict[Key, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fusion-sprites")
+        self.stats = {"hits": 0, "misses": 0, "fetched": 0, "failed": 0, "evicted": 0}
+        self._scan()
+
+    # ----- index -----
+
+    @staticmethod
+    def _filename(key: Key) -> str:
+        return f"{key[0]}.{key[1]}.png"
+
+    def path_for(self, head: int, body: int) -> Path:
+        return self.cache_dir / self._filename((int(head), int(body)))
+
+    def _scan(self) -> None:
+        """Rebuild the LRU index from the cache directory, oldest mtime first."""
+        if not self.cache_dir.is_dir():
+            return
+        found = []
+        for p in self.cache_dir.glob("*.png"):
+            parts = p.stem.split(".")
+            try:
+                key = (int(parts[0]), int(parts[1]))
+                st = p.stat()
+            except (ValueError, IndexError, OSError):
+                continue
+            found.append((st.st_mtime, key, st.st_size))
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._entries[key] = size
+                self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        victims = []
+        with self._lock:
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                key, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.stats["evicted"] += 1
+                victims.append(key)
+        for key in victims:
+            try:
+                (self.cache_dir / self._filename(key)).unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __contains__(self, key) -> bool:
+        return (int(key[0]), int(key[1])) in self._entries
+
+    # ----- lookups -----
+
+    def get(self, head: int, body: int) -> Optional[Path]:
+        """Cached file for the fusion, or None. Counts as a use for LRU."""
+        key = (int(head), int(body))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.cache_dir / self._filename(key)
+            self.stats["misses"] += 1
+        return None
+
+    def is_missing(self, head: int, body: int) -> bool:
+        """True if the sprite index lists no custom sprite for the fusion, or
+        the last fetch found none and hasn't expired yet."""
+        if sprite_known_missing(head, body):
+            return True
+        failed_at = self._misses.get((int(head), int(body)))
+        return failed_at is not None and time.time() - failed_at < MISS_TTL
+
+    # ----- fetching -----
+
+    def _store(self, key: Key, data: bytes) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self.cache_dir / self._filename(key)
+        tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+        self._evict()
+
+    def _fetch(self, key: Key) -> bool:
+        try:
+            data = self.fetcher(*key)
+        except Exception:
+            data = None
+        try:
+            if data:
+                self._store(key, data)
+                self._misses.pop(key, None)
+                self.stats["fetched"] += 1
+                return True
+            self._misses[key] = time.time()
+            self.stats["failed"] += 1
+            return False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def prefetch(self, keys: Iterable[Key]) -> Dict[Key, Future]:
+        """Queue fetches for keys that aren't cached, in flight or known missing."""
+        queued: Dict[Key, Future] = {}
+        for head, body in keys:
+            key = (int(head), int(body))
+            if key in self._entries or self.is_missing(*key):
+                continue
+            with self._lock:
+                fut = self._inflight.get(key)
+                if fut is None:
+                    fut = self._pool.submit(self._fetch, key)
+                    self._inflight[key] = fut
+            queued[key] = fut
+        return queued
+
+    def fetch_now(self, head: int, body: int) -> Optional[Path]:
+        """Fetch synchronously (joining any in-flight fetch) and return the file."""
+        futs = self.prefetch([(head, body)])
+        for fut in futs.values():
+            fut.result()
+        return self.get(head, body)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+_cache: Optional[FusionSpriteCache] = None
+_cache_lock = threading.Lock()
+
+def get_fusion_cache() -> FusionSpriteCache:
+    """Process-wide cache shared by every session."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FusionSpriteCache()
+        return _cache
+
+def fusion_keys(fusion: Dict) -> Tuple[Key, Key]:
+    """The two ``(head, body)`` keys shown for a fusion record."""
+    return tuple(
+        (int(fusion[side]["a"]["number"]), int(fusion[side]["b"]["number"]))
+        for side in ("player1", "player2")
+    )
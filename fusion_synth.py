@@ -0,0 +1,200 @@
+"""Approximate fusion sprites built locally from the two base sprites.
+
+Used when the CDN has no custom sprite for a fusion. The head species
+provides the top of its silhouette, recoloured with the body species'
+palette, and is laid over the body sprite. Results are memoized under
+static/fusion_synth/<head>.<body>.<hash>.png, where the hash covers both
+base sprites and the algorithm version, so each pair is rendered once.
+
+Rendering never happens during a page render: ``rendered`` returns the
+memo file if it's there and otherwise queues the pair for the background
+renderer (``prerender_in_background``). Its first batch in a process
+deletes memo files left by an older ``SYNTH_VERSION`` or older base
+sprites.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from storage import BASE_DIR, Pokedex
+
+SYNTH_DIR = BASE_DIR / "static" / "fusion_synth"
+SYNTH_URL_PREFIX = "app/static/fusion_synth"
+SYNTH_VERSION = "1"
+
+# Share of the head sprite's silhouette (from the top) used as the head
+HEAD_FRACTION = 0.45
+
+Key = Tuple[int, int]
+
+@lru_cache(maxsize=2048)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _sprite_digest(path: str) -> str:
+    st = os.stat(path)
+    return _file_digest(path, st.st_mtime_ns, st.st_size)
+
+def synth_path(dex: Pokedex, head: int, body: int) -> Optional[Path]:
+    """Memo path for the pair, or None if either base sprite isn't local."""
+    head_sprite, body_sprite = dex.sprite(head), dex.sprite(body)
+    if not (head_sprite and body_sprite and os.path.isfile(head_sprite) and os.path.isfile(body_sprite)):
+        return None
+    h = hashlib.sha256(
+        f"{SYNTH_VERSION}:{_sprite_digest(head_sprite)}:{_sprite_digest(body_sprite)}".encode("ascii")
+    ).hexdigest()[:16]
+    return SYNTH_DIR / f"{int(head)}.{int(body)}.{h}.png"
+
+def _luma(c) -> float:
+    return 0.299 * c[0] + 0.587 * c[1] + 0.114 * c[2]
+
+def synthesize(head_bytes: bytes, body_bytes: bytes) -> bytes:
+    """Render an approximate ``head/body`` fusion and return it as PNG bytes."""
+    from PIL import Image
+
+    head = Image.open(io.BytesIO(head_bytes)).convert("RGBA")
+    body = Image.open(io.BytesIO(body_bytes)).convert("RGBA")
+    if head.size != body.size:
+        head = head.resize(body.size, Image.NEAREST)
+    out = body.copy()
+    head_box = head.getchannel("A").getbbox()
+    body_box = body.getchannel("A").getbbox()
+    if head_box and body_box:
+        hx0, hy0, hx1, hy1 = head_box
+        cut = hy0 + max(1, round((hy1 - hy0) * HEAD_FRACTION))
+        crop = head.crop((hx0, hy0, hx1, cut))
+
+        # Map head colours onto body colours of the same brightness rank
+        head_cols = sorted({p[:3] for p in crop.getdata() if p[3] >= 128}, key=_luma)
+        body_cols = sorted({p[:3] for p in body.getdata() if p[3] >= 128}, key=_luma)
+        if head_cols and body_cols:
+            scale = (len(body_cols) - 1) / max(1, len(head_cols) - 1)
+            remap = {c: body_cols[round(i * scale)] for i, c in enumerate(head_cols)}
+            crop.putdata([remap.get(p[:3], p[:3]) + (p[3],) if p[3] >= 128 else p for p in crop.getdata()])
+
+        # Fit the head to the body's width and seat it on the body's top edge
+        bx0, by0, bx1, by1 = body_box
+        width = max(1, min(crop.width, bx1 - bx0))
+        if width != crop.width:
+            crop = crop.resize((width, max(1, round(crop.height * width / crop.width))), Image.NEAREST)
+        x = bx0 + ((bx1 - bx0) - crop.width) // 2
+        y = max(0, by0 - crop.height // 3)
+        out.paste(crop, (x, y), crop)
+
+    buf = io.BytesIO()
+    out.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+def _render_job(head_sprite: str, body_sprite: str, target: str) -> str:
+    """Process-pool worker: render one pair to ``target``."""
+    with open(head_sprite, "rb") as f:
+        head_bytes = f.read()
+    with open(body_sprite, "rb") as f:
+        body_bytes = f.read()
+    data = synthesize(head_bytes, body_bytes)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+    return target
+
+def _jobs(dex: Pokedex, keys: Iterable[Key]) -> List[Tuple[str, str, str]]:
+    jobs, seen = [], set()
+    for head, body in keys:
+        key = (int(head), int(body))
+        if key in seen:
+            continue
+        seen.add(key)
+        target = synth_path(dex, *key)
+        if target is None or target.is_file():
+            continue
+        jobs.append((dex.sprite(key[0]), dex.sprite(key[1]), str(target)))
+    return jobs
+
+def rendered(dex: Pokedex, head: int, body: int) -> Optional[Path]:
+    """Synthesized sprite for the pair if it has been rendered. Otherwise
+    the pair is queued for the background renderer and this returns None."""
+    target = synth_path(dex, head, body)
+    if target is None:
+        return None
+    if target.is_file():
+        return target
+    prerender_in_background(dex, [(head, body)])
+    return None
+
+def prune(dex: Pokedex) -> int:
+    """Delete memo files that aren't their pair's current render (an older
+    ``SYNTH_VERSION`` or older base sprites). Returns how many were deleted."""
+    removed = 0
+    for path in SYNTH_DIR.glob("*.png"):
+        parts = path.name.split(".")
+        try:
+            current = synth_path(dex, int(parts[0]), int(parts[1]))
+        except (ValueError, IndexError):
+            continue
+        if current is None or current.name != path.name:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+def prerender(dex: Pokedex, keys: Iterable[Key], max_workers: Optional[int] = None) -> int:
+    """Render every missing pair across a process pool. Returns how many were rendered."""
+    jobs = _jobs(dex, keys)
+    if not jobs:
+        return 0
+    SYNTH_DIR.mkdir(parents=True, exist_ok=True)
+    if len(jobs) == 1:
+        _render_job(*jobs[0])
+        return 1
+    # spawn keeps workers clear of the server's threads and locks
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+        return sum(1 for _ in pool.map(_render_job, *zip(*jobs), chunksize=16))
+
+# Pairs waiting for the background renderer, in the order asked for
+_pending: Dict[Key, None] = {}
+_pending_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_pruned = False
+
+def _drain(dex: Pokedex) -> None:
+    global _worker, _pruned
+    if not _pruned:
+        _pruned = True
+        try:
+            prune(dex)
+        except OSError:
+            pass
+    while True:
+        with _pending_lock:
+            keys = list(_pending)
+            _pending.clear()
+            if not keys:
+                _worker = None
+                return
+        try:
+            prerender(dex, keys)
+        except Exception:
+            pass  # tiles keep showing the placeholder
+
+def prerender_in_background(dex: Pokedex, keys: Iterable[Key]) -> threading.Thread:
+    """Queue pairs for ``prerender`` on a daemon thread so page loads don't
+    wait for it. One thread drains the queue; returns it."""
+    global _worker
+    with _pending_lock:
+        for head, body in keys:
+            _pending[(int(head), int(body))] = None
+        if _worker is None:
+            _worker = threading.Thread(target=_drain, args=(dex,), name="fusion-synth", daemon=True)
+            _worker.start()
+        return _worker
+
+def synth_url(path: Path) -> str:
+    return f"{SYNTH_URL_PREFIX}/{path.name}"
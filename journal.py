@@ -0,0 +1,95 @@
+"""Append-only mutation journal for the run state.
+
+state.json stays the snapshot; every UI action appends one compact JSON
+line of change ops (see ``storage.op_put``) to state.journal and fsyncs it.
+Loading replays the journal over the snapshot. Once the journal passes
+``JOURNAL_COMPACT_BYTES`` it is folded into a new snapshot and truncated.
+
+A crash can leave at most one torn line at the end of the journal; it is
+dropped on load. Ops are idempotent, so a crash between writing the
+snapshot and truncating the journal replays harmlessly.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from storage import _default_state, _load_json_state, _save_json_state, apply_ops
+
+JOURNAL_COMPACT_BYTES = int(os.environ.get("SOULLINK_JOURNAL_COMPACT_BYTES", 1024 * 1024))
+
+class Journal:
+    def __init__(self, snapshot_path: Path, compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        self.snapshot_path = Path(snapshot_path)
+        self.path = self.snapshot_path.with_suffix(".journal")
+        self.compact_bytes = int(compact_bytes)
+        self._lock = threading.Lock()
+
+    def _read_batches(self) -> List[List[Dict[str, Any]]]:
+        """Complete batches in the journal; a torn tail is cut off the file."""
+        if not self.path.is_file():
+            return []
+        batches: List[List[Dict[str, Any]]] = []
+        good = 0
+        with self.path.open("rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    batches.append(json.loads(line)["ops"])
+                except Exception:
+                    break
+                good += len(line)
+        if good < self.path.stat().st_size:
+            with self.path.open("r+b") as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+        return batches
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            state = _load_json_state(self.snapshot_path) or _default_state()
+            return apply_ops(state, self._read_batches())
+
+    def append(self, ops: List[Dict[str, Any]], state: Optional[Dict[str, Any]] = None) -> None:
+        """Durably append one batch; compact into ``state`` if the journal is large."""
+        line = json.dumps({"t": time.time(), "ops": ops}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("ab") as f:
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            if state is not None and size >= self.compact_bytes:
+                self._compact(state)
+
+    def compact(self, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._compact(state)
+
+    def _compact(self, state: Dict[str, Any]) -> None:
+        _save_json_state(state, self.snapshot_path, fsync=True)
+        with self.path.open("wb") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+_journals: Dict[Path, Journal] = {}
+_journals_lock = threading.Lock()
+
+def journal_for(snapshot_path: Path) -> Journal:
+    """One Journal per snapshot path, so sessions share its lock."""
+    key = Path(snapshot_path)
+    with _journals_lock:
+        if key not in _journals:
+            _journals[key] = Journal(key)
+        return _journals[key]
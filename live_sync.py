@@ -0,0 +1,214 @@
+"""Change notifications between the sessions of a run.
+
+``SharedRun`` publishes a small ``Change`` (the new version and which
+collections it touched) to the hub for every commit. Each open session
+holds a ``Subscription`` with a bounded queue; a dispatcher thread drains
+the queues and hands each session one merged change, which the app turns
+into a rerun of just the views showing those collections. A session that
+falls more than ``QUEUE_SIZE`` changes behind is told to refresh
+everything instead.
+
+``StateFileWatcher`` picks up edits made to the state files from outside
+the app (a script, a restored backup) through the OS file notification
+API, so the run can be reloaded and every session refreshed. It needs the
+``watchdog`` package; without it external edits are only seen after a
+restart.
+"""
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional
+    FileSystemEventHandler = object
+    Observer = None
+
+QUEUE_SIZE = 32
+# Quiet time before an external edit is acted on (writers often touch a file twice)
+SETTLE_DELAY = 0.2
+
+class Change(NamedTuple):
+    version: int
+    collections: Optional[FrozenSet[str]]  # None: everything (the state was replaced)
+    origin: Optional[str] = None  # session that made the change; it isn't notified
+
+def merge(changes: Iterable[Change]) -> Optional[Change]:
+    """One change covering all of ``changes``."""
+    merged: Optional[Change] = None
+    for c in changes:
+        if merged is None:
+            merged = c
+            continue
+        colls = None if merged.collections is None or c.collections is None else merged.collections | c.collections
+        merged = Change(max(merged.version, c.version), colls, merged.origin if merged.origin == c.origin else None)
+    return merged
+
+class Subscription:
+    def __init__(self, topic: Any, deliver: Callable[[Change], bool], session_id: Optional[str] = None):
+        """``deliver`` is called on the dispatcher thread; returning False
+        ends the subscription (e.g. the session has closed)."""
+        self.topic = topic
+        self.deliver = deliver
+        self.session_id = session_id
+        self.queue: deque = deque(maxlen=QUEUE_SIZE)
+        self.overflowed = False
+        self.active = True
+
+    def _put(self, change: Change) -> None:
+        if len(self.queue) == self.queue.maxlen:
+            self.overflowed = True
+        self.queue.append(change)
+
+    def _take(self) -> Optional[Change]:
+        changes, overflowed = list(self.queue), self.overflowed
+        self.queue.clear()
+        self.overflowed = False
+        merged = merge(changes)
+        if merged is not None and overflowed:
+            merged = merged._replace(collections=None)
+        return merged
+
+class Hub:
+    """Publish/subscribe keyed by topic (the run's state path)."""
+
+    def __init__(self):
+        self._subs: Dict[Any, List[Subscription]] = {}
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"published": 0, "delivered": 0, "overflows": 0}
+
+    def subscribe(self, topic: Any, deliver: Callable[[Change], bool], session_id: Optional[str] = None) -> Subscription:
+        sub = Subscription(topic, deliver, session_id)
+        with self._cond:
+            self._subs.setdefault(topic, []).append(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="live-sync", daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._cond:
+            sub.active = False
+            subs = self._subs.get(sub.topic, [])
+            if sub in subs:
+                subs.remove(sub)
+
+    def subscribers(self, topic: Any) -> int:
+        with self._cond:
+            return len(self._subs.get(topic, []))
+
+    def publish(self, topic: Any, change: Change) -> None:
+        """Queue ``change`` for every subscriber of ``topic`` except its origin. Never blocks."""
+        with self._cond:
+            self.stats["published"] += 1
+            for sub in self._subs.get(topic, []):
+                if change.origin is not None and sub.session_id == change.origin:
+                    continue
+                was_idle = not sub.queue
+                sub._put(change)
+                if sub.overflowed:
+                    self.stats["overflows"] += 1
+                if was_idle:
+                    self._pending.append(sub)
+            self._cond.notify()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                sub = self._pending.popleft()
+                change = sub._take() if sub.active else None
+            if change is None:
+                continue
+            try:
+                keep = sub.deliver(change)
+            except Exception:
+                keep = True  # a failed refresh shouldn't silence the session
+            with self._cond:
+                self.stats["delivered"] += 1
+            if keep is False:
+                self.unsubscribe(sub)
+
+_hub = Hub()
+
+def get_hub() -> Hub:
+    return _hub
+
+# ---------- External edits ----------
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class StateFileWatcher(FileSystemEventHandler):
+    """Calls ``on_change`` when one of ``paths`` is changed by someone else.
+
+    The app's own saves also trigger file events, so the writer calls
+    ``acknowledge`` after each save; an event only counts once the files
+    no longer look the way they did after the app's last write.
+    """
+
+    def __init__(self, paths: Iterable[Path], on_change: Callable[[], None]):
+        self.paths = {Path(p).resolve() for p in paths}
+        self.on_change = on_change
+        self._known: Dict[Path, Optional[Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._observer = None
+        self.acknowledge()
+
+    @property
+    def available(self) -> bool:
+        return Observer is not None
+
+    def start(self) -> bool:
+        """Start watching; False if file notifications aren't available."""
+        if Observer is None or self._observer is not None:
+            return self._observer is not None
+        observer = Observer()
+        for folder in {p.parent for p in self.paths}:
+            folder.mkdir(parents=True, exist_ok=True)
+            observer.schedule(self, str(folder), recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        return True
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+
+    def acknowledge(self) -> None:
+        """Remember the files as they are now: the app wrote or read them."""
+        with self._lock:
+            self._known = {p: _signature(p) for p in self.paths}
+
+    def on_any_event(self, event) -> None:
+        touched = {getattr(event, "src_path", ""), getattr(event, "dest_path", "")}
+        if not any(t and Path(t).resolve() in self.paths for t in touched):
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(SETTLE_DELAY, self._settled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _settled(self) -> None:
+        with self._lock:
+            self._timer = None
+            changed = any(_signature(p) != sig for p, sig in self._known.items())
+        if changed:
+            self.on_change()
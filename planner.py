@@ -0,0 +1,267 @@
+"""Fusion planner: ranks every fusion the run could make next.
+
+A soul-link fusion takes two live, unfused pairings A and B and fuses both
+players' Pokémon the same way round: A's Pokémon are the heads and B's the
+bodies, for Player 1 and Player 2 alike. ``rank`` scores every ordered
+pair of candidates at once, so the swapped orientation is just another
+pair, with NumPy over the candidates' dex numbers.
+
+A scorer maps arrays of head and body dex numbers (any broadcastable
+shapes) to a score from 0 to 1 per fusion. Each player's score is the
+weighted mean of the scorers, and the two are combined with ``COMBINE``:
+``min`` (the default) ranks a pair by the weaker of its two fusions, since
+both players have to live with theirs. ``scorers_for`` builds the standard
+scorers the Pokédex supports:
+
+- ``evolution``: how far along their evolution lines the two species are
+  (the evolution columns; species that don't evolve count as final).
+- ``custom_sprite``: 1 if the fusion has a custom sprite (needs the
+  fusion_index manifest).
+- ``stats``: the fused base stat total, with the game's head/body split
+  (only if the Pokédex CSV has stat columns).
+
+Pairs are scored a block of head rows at a time with a running top-k, so
+memory stays bounded however many pairings there are.
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from fusion_index import FusionIndex
+from state_index import StateIndex
+from storage import POKEDEX_CSV, Pokedex, _coerce_int
+
+Scorer = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+COMBINE: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "min": np.minimum,
+    "mean": lambda s1, s2: (s1 + s2) / 2,
+}
+SCORER_LABELS = {"evolution": "Evolution stage", "custom_sprite": "Custom sprite", "stats": "Base stats"}
+# Scores computed per block of head rows (rows x candidates)
+BLOCK_CELLS = 1 << 18
+
+# ---------- Candidates ----------
+
+class Candidates(NamedTuple):
+    ids: Tuple[str, ...]
+    player1: np.ndarray  # dex numbers, aligned with ids
+    player2: np.ndarray
+    names1: Tuple[str, ...]
+    names2: Tuple[str, ...]
+
+def candidates(state: Dict[str, Any], index: StateIndex) -> Candidates:
+    """The live pairings neither player has fused yet, as arrays. Cheap, so
+    it can run under the run lock and ``rank`` outside it."""
+    pairs = [
+        p for p in state["pairings"]
+        if not p.get("dead") and not (p["player1"]["used"] or p["player2"]["used"])
+    ]
+    return Candidates(
+        tuple(p["id"] for p in pairs),
+        np.fromiter((int(p["player1"]["number"]) for p in pairs), dtype=np.int64, count=len(pairs)),
+        np.fromiter((int(p["player2"]["number"]) for p in pairs), dtype=np.int64, count=len(pairs)),
+        tuple(p["player1"]["name"] for p in pairs),
+        tuple(p["player2"]["name"] for p in pairs),
+    )
+
+# ---------- Scorers ----------
+
+def _table(values: Dict[int, float], size: int) -> np.ndarray:
+    table = np.zeros(size + 1, dtype=np.float64)
+    for n, v in values.items():
+        if 0 <= n <= size:
+            table[n] = v
+    return table
+
+def _lookup(table: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+    """``table[numbers]`` with numbers outside the table scoring 0."""
+    numbers = np.asarray(numbers)
+    ok = (numbers >= 0) & (numbers < len(table))
+    return np.where(ok, table[np.where(ok, numbers, 0)], 0.0)
+
+def evolution_scorer(dex: Pokedex) -> Scorer:
+    """Mean evolution progress of head and body: stage / stages in the line."""
+    evo = dex.evolutions
+    progress: Dict[int, float] = {}
+    for n in dex.numbers:
+        stage = evo.stage.get(n, 0)
+        finals = evo.final_forms(n)
+        last = max((evo.stage.get(f, 0) for f in finals), default=stage)
+        progress[n] = stage / last if last > 0 else 1.0
+    table = _table(progress, max(dex.numbers, default=0))
+
+    def score(heads: np.ndarray, bodies: np.ndarray) -> np.ndarray:
+        return (_lookup(table, heads) + _lookup(table, bodies)) / 2
+    return score
+
+def custom_sprite_scorer(index: FusionIndex) -> Scorer:
+    def score(heads: np.ndarray, bodies: np.ndarray) -> np.ndarray:
+        return index.has_custom_sprites(heads, bodies).astype(np.float64)
+    return score
+
+# Normalized CSV header -> stat; hp, special attack and special defense
+# follow the head, attack, defense and speed the body
+_STAT_COLUMNS = {
+    "hp": "hp", "attack": "atk", "atk": "atk", "defense": "def", "def": "def",
+    "spattack": "spa", "specialattack": "spa", "spatk": "spa", "spa": "spa",
+    "spdefense": "spd", "specialdefense": "spd", "spdef": "spd", "spd": "spd",
+    "speed": "spe", "spe": "spe", "total": "total", "bst": "total",
+}
+_HEAD_STATS = ("hp", "spa", "spd")
+_BODY_STATS = ("atk", "def", "spe")
+
+@lru_cache(maxsize=4)
+def _read_stats(path: str, mtime_ns: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return None
+    header = [re.sub(r"[^a-z]", "", c.lower()) for c in rows[0]]
+    cols = {_STAT_COLUMNS[h]: i for i, h in enumerate(header) if h in _STAT_COLUMNS}
+    num_col = header.index("number") if "number" in header else 0
+    six = all(s in cols for s in _HEAD_STATS + _BODY_STATS)
+    if not six and "total" not in cols:
+        return None
+
+    def stat(row: List[str], name: str) -> float:
+        i = cols[name]
+        v = _coerce_int(row[i]) if i < len(row) else None
+        return float(v or 0)
+
+    head_part: Dict[int, float] = {}
+    body_part: Dict[int, float] = {}
+    for row in rows[1:]:
+        n = _coerce_int(row[num_col]) if num_col < len(row) else None
+        if n is None or n in head_part:
+            continue
+        if six:
+            head_part[n] = sum(stat(row, s) for s in _HEAD_STATS)
+            body_part[n] = sum(stat(row, s) for s in _BODY_STATS)
+        else:
+            # Only a total: assume it's split evenly
+            head_part[n] = body_part[n] = stat(row, "total") / 2
+    size = max(head_part, default=0)
+    return _table(head_part, size), _table(body_part, size)
+
+def load_stats(csv_path: Path = POKEDEX_CSV) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Per-species sums of the head-side and body-side base stats, from
+    optional stat columns in the Pokédex CSV; None without them."""
+    try:
+        mtime = os.stat(csv_path).st_mtime_ns
+    except OSError:
+        return None
+    return _read_stats(str(csv_path), mtime)
+
+def stats_scorer(head_part: np.ndarray, body_part: np.ndarray) -> Scorer:
+    """Fused base stat total relative to the best single species. A fusion
+    takes two thirds of each stat from the side it follows."""
+    best = float((head_part + body_part).max()) or 1.0
+
+    def score(heads: np.ndarray, bodies: np.ndarray) -> np.ndarray:
+        total = (
+            2 * _lookup(head_part, heads) + _lookup(head_part, bodies)
+            + _lookup(body_part, heads) + 2 * _lookup(body_part, bodies)
+        ) / 3
+        return np.minimum(total / best, 1.0)
+    return score
+
+def scorers_for(dex: Pokedex, index: Optional[FusionIndex] = None, csv_path: Path = POKEDEX_CSV) -> Dict[str, Scorer]:
+    """The standard scorers this Pokédex (and sprite index) can support."""
+    scorers = {"evolution": evolution_scorer(dex)}
+    if index is not None:
+        scorers["custom_sprite"] = custom_sprite_scorer(index)
+    stats = load_stats(csv_path)
+    if stats is not None:
+        scorers["stats"] = stats_scorer(*stats)
+    return scorers
+
+# ---------- Ranking ----------
+
+def _player_score(
+    heads: np.ndarray, bodies: np.ndarray, scorers: Dict[str, Scorer], weights: Dict[str, float]
+) -> np.ndarray:
+    total = sum(weights.values())
+    out = np.zeros(np.broadcast_shapes(np.shape(heads), np.shape(bodies)), dtype=np.float64)
+    for name, fn in scorers.items():
+        if weights[name]:
+            out += weights[name] * fn(heads, bodies)
+    return out / total if total else out
+
+def _top(scores: np.ndarray, flat: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` best scores, ties going to the lowest ``flat``
+    index, so the result doesn't depend on how the pairs were blocked."""
+    if scores.size <= k:
+        return np.arange(scores.size)
+    kth = np.partition(scores, scores.size - k)[scores.size - k]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)
+    tied = tied[np.argsort(flat[tied], kind="stable")[: k - above.size]]
+    return np.concatenate([above, tied])
+
+def rank(
+    cands: Candidates,
+    scorers: Dict[str, Scorer],
+    k: int = 10,
+    weights: Optional[Dict[str, float]] = None,
+    combine: str = "min",
+) -> List[Dict[str, Any]]:
+    """The ``k`` best (head pairing, body pairing) fusions, best first;
+    equal scores go in candidate order (by head, then body).
+
+    Each result has the combined ``score``, ``reverse_score`` (the same two
+    pairings the other way round) and, per player, the head and body dex
+    numbers, the player's score and each scorer's score.
+    """
+    n = len(cands.ids)
+    if n < 2 or k <= 0 or not scorers:
+        return []
+    weights = {name: float((weights or {}).get(name, 1.0)) for name in scorers}
+    join = COMBINE[combine]
+    p1, p2 = cands.player1, cands.player2
+
+    def combined(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return join(
+            _player_score(p1[rows], p1[cols], scorers, weights),
+            _player_score(p2[rows], p2[cols], scorers, weights),
+        )
+
+    k = min(k, n * (n - 1))
+    best_scores = np.empty(0, dtype=np.float64)
+    best_flat = np.empty(0, dtype=np.int64)
+    step = max(1, BLOCK_CELLS // n)
+    cols = np.arange(n)
+    for start in range(0, n, step):
+        rows = np.arange(start, min(start + step, n))
+        block = combined(rows[:, None], cols[None, :])
+        block[rows - start, rows] = -np.inf  # a pairing can't fuse with itself
+        flat = block.ravel()
+        top = _top(flat, np.arange(flat.size), k)
+        best_scores = np.concatenate([best_scores, flat[top]])
+        best_flat = np.concatenate([best_flat, top + start * n])
+        keep = _top(best_scores, best_flat, k)
+        best_scores, best_flat = best_scores[keep], best_flat[keep]
+    order = np.lexsort((best_flat, -best_scores))
+    heads, bodies = np.divmod(best_flat[order], n)
+    reverse = combined(bodies, heads)
+
+    results = []
+    for i, j, score, rev in zip(heads, bodies, best_scores[order], reverse):
+        result: Dict[str, Any] = {
+            "head": cands.ids[i], "body": cands.ids[j],
+            "score": float(score), "reverse_score": float(rev),
+        }
+        for key, nums, names in (("player1", p1, cands.names1), ("player2", p2, cands.names2)):
+            h, b = nums[i], nums[j]
+            result[key] = {
+                "head": int(h), "body": int(b), "head_name": names[i], "body_name": names[j],
+                "score": float(_player_score(h, b, scorers, weights)),
+                "scores": {name: float(fn(h, b)) for name, fn in scorers.items()},
+            }
+        results.append(result)
+    return results
@@ -0,0 +1,285 @@
+"""Opt-in timers and counters for the hot paths.
+
+``enable()`` wraps the functions listed in ``TARGETS`` (Pokedex lookups,
+loading and saving, sprite encoding, the tile renderers) with a timer,
+in their own module and in every app module that imported them by name.
+Only modules already imported are instrumented.
+``disable()`` puts the originals back, so when profiling is off nothing is
+wrapped and the only cost is a flag check per rerun.
+
+Each call adds to a process-wide total and, if the calling thread is inside
+a rerun (``begin``/``finish``), to that rerun's breakdown: call count,
+cumulative time (including nested profiled calls) and, where it means
+something, bytes: the size of the files a save wrote or grew, and the size
+of the data URIs ``_path_to_data_uri`` returned. Cache hit rates are the
+change in the sprite caches' counters over the rerun; those counters are
+process-wide, so reruns of other sessions at the same time are included.
+
+With a trace path every finished rerun, and every save, is appended to it
+as one JSON line. ``SOULLINK_PROFILE=1`` turns profiling on at start-up and
+``SOULLINK_PROFILE_TRACE`` names the trace file.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import storage
+
+# module -> functions to time
+TARGETS: Dict[str, Tuple[str, ...]] = {
+    "storage": (
+        "load_pokedex", "load_state", "save_state", "save_changes",
+        "sprite_for", "name_for", "get_evolutions", "get_final_forms", "get_evolution_chain",
+        "search_options",
+    ),
+    "ui_components": (
+        "_path_to_data_uri", "_path_to_static_url", "_img_src", "mon_sprite", "fusion_sprite",
+        "pairing_card", "pairing_tile", "fusion_card", "fusion_tile", "graveyard_card",
+        "team_pokemon_card", "windowed_grid",
+    ),
+}
+SAVES = {"storage.save_state", "storage.save_changes"}
+# lru_cache'd functions whose hit rates are reported
+LRU_CACHES = (("ui_components", "_data_uri"),)
+
+class _Frame:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.calls: Dict[str, List[float]] = {}  # name -> [calls, seconds, bytes]
+        self.caches = cache_counters()
+
+def _add(table: Dict[str, List[float]], name: str, seconds: float, nbytes: int) -> None:
+    row = table.get(name)
+    if row is None:
+        table[name] = [1, seconds, nbytes]
+    else:
+        row[0] += 1
+        row[1] += seconds
+        row[2] += nbytes
+
+def _rows(table: Dict[str, List[float]]) -> List[Dict[str, Any]]:
+    rows = [
+        {"function": name, "calls": int(c), "ms": round(s * 1000, 3), "bytes": int(b)}
+        for name, (c, s, b) in table.items()
+    ]
+    return sorted(rows, key=lambda r: -r["ms"])
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_totals: Dict[str, List[float]] = {}
+_patches: List[Tuple[Any, str, Any, Any]] = []  # (module, attribute, original, wrapper)
+_originals: Dict[Tuple[str, str], Any] = {}
+_trace_path: Optional[Path] = None
+_trace_lock = threading.Lock()
+_from_env_done = False
+
+def enabled() -> bool:
+    return _enabled
+
+def trace_path() -> Optional[Path]:
+    return _trace_path
+
+def record(name: str, seconds: float, nbytes: int = 0) -> None:
+    with _lock:
+        _add(_totals, name, seconds, nbytes)
+    frame = getattr(_local, "frame", None)
+    if frame is not None:
+        _add(frame.calls, name, seconds, nbytes)
+
+def _file_sizes() -> Dict[Path, int]:
+    sizes = {}
+    for p in storage.state_files():
+        try:
+            sizes[p] = p.stat().st_size
+        except OSError:
+            sizes[p] = 0
+    return sizes
+
+def _written(before: Dict[Path, int], after: Dict[Path, int]) -> int:
+    """Bytes a save wrote: the whole file for a rewritten JSON state, the
+    growth of the files for the journal and SQLite backends."""
+    if storage.STATE_BACKEND == "json":
+        return after.get(storage.STATE_PATH, 0)
+    return sum(max(0, n - before.get(p, 0)) for p, n in after.items())
+
+def _wrap(name: str, fn: Callable) -> Callable:
+    if name in SAVES:
+        @functools.wraps(fn)
+        def timed_save(*args, **kwargs):
+            before = _file_sizes()
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - t
+                nbytes = _written(before, _file_sizes())
+                record(name, seconds, nbytes)
+                _trace({"event": "save", "function": name, "ms": round(seconds * 1000, 3),
+                        "bytes": nbytes, "backend": storage.STATE_BACKEND,
+                        "thread": threading.current_thread().name})
+        return timed_save
+
+    if name == "ui_components._path_to_data_uri":
+        @functools.wraps(fn)
+        def timed_uri(*args, **kwargs):
+            t = time.perf_counter()
+            uri = fn(*args, **kwargs)
+            record(name, time.perf_counter() - t, len(uri))
+            return uri
+        return timed_uri
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - t)
+    return timed
+
+def _app_modules() -> List[Any]:
+    base = str(storage.BASE_DIR)
+    return [
+        m for m in list(sys.modules.values())
+        if str(getattr(m, "__file__", "") or "").startswith(base)
+    ]
+
+def _install() -> None:
+    modules = _app_modules()
+    for modname, names in TARGETS.items():
+        # Only what's loaded: profiling a script mustn't import the UI (and Streamlit)
+        mod = sys.modules.get(modname)
+        if mod is None:
+            continue
+        for attr in names:
+            original = getattr(mod, attr, None)
+            if original is None:
+                continue
+            _originals[(modname, attr)] = original
+            wrapper = _wrap(f"{modname}.{attr}", original)
+            for m in modules:
+                for k, v in list(vars(m).items()):
+                    if v is original:
+                        setattr(m, k, wrapper)
+                        _patches.append((m, k, original, wrapper))
+
+def _uninstall() -> None:
+    while _patches:
+        m, k, original, wrapper = _patches.pop()
+        if getattr(m, k, None) is wrapper:
+            setattr(m, k, original)
+    _originals.clear()
+
+def enable(trace: Optional[os.PathLike] = None) -> None:
+    """Start profiling (process-wide); ``trace`` appends JSON lines there."""
+    global _enabled, _trace_path
+    with _lock:
+        _trace_path = Path(trace) if trace else _trace_path
+        if _enabled:
+            return
+        _install()
+        _enabled = True
+
+def disable() -> None:
+    global _enabled
+    with _lock:
+        if not _enabled:
+            return
+        _enabled = False
+        _uninstall()
+
+def set_trace(path: Optional[os.PathLike]) -> None:
+    global _trace_path
+    _trace_path = Path(path) if path else None
+
+def from_env() -> None:
+    """Apply ``SOULLINK_PROFILE`` / ``SOULLINK_PROFILE_TRACE`` once per process."""
+    global _from_env_done
+    if _from_env_done:
+        return
+    _from_env_done = True
+    if os.environ.get("SOULLINK_PROFILE", "").strip().lower() in ("1", "true", "yes", "on"):
+        enable(os.environ.get("SOULLINK_PROFILE_TRACE") or None)
+
+def reset() -> None:
+    with _lock:
+        _totals.clear()
+
+def totals() -> List[Dict[str, Any]]:
+    with _lock:
+        return _rows({k: list(v) for k, v in _totals.items()})
+
+# ---------- Caches ----------
+
+def cache_counters() -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of the sprite caches, process-wide."""
+    counters = {}
+    for modname, attr in LRU_CACHES:
+        mod = sys.modules.get(modname)
+        fn = _originals.get((modname, attr)) or getattr(mod, attr, None)
+        if fn is not None and hasattr(fn, "cache_info"):
+            info = fn.cache_info()
+            counters[attr] = (info.hits, info.misses)
+    fusion_sprites = sys.modules.get("fusion_sprites")
+    cache = getattr(fusion_sprites, "_cache", None)
+    if cache is not None:
+        counters["fusion_sprites"] = (cache.stats["hits"], cache.stats["misses"])
+    return counters
+
+def _cache_rows(before: Dict[str, Tuple[int, int]], after: Dict[str, Tuple[int, int]]) -> List[Dict[str, Any]]:
+    rows = []
+    for name, (hits, misses) in after.items():
+        h0, m0 = before.get(name, (0, 0))
+        h, m = hits - h0, misses - m0
+        rows.append({"cache": name, "hits": h, "misses": m, "hit_rate": round(h / (h + m), 3) if h + m else None})
+    return rows
+
+# ---------- Reruns ----------
+
+def begin(label: str, restart: bool = False) -> bool:
+    """Start collecting a rerun's breakdown on this thread. False (and
+    nothing started) when profiling is off or a rerun is already open, so
+    fragments running inside a full rerun are counted in it. ``restart``
+    drops a rerun left open (one that failed before it could finish)."""
+    if not _enabled or (getattr(_local, "frame", None) is not None and not restart):
+        return False
+    _local.frame = _Frame(label)
+    return True
+
+def finish(session: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """End the rerun started by ``begin``: its breakdown, also traced."""
+    frame = getattr(_local, "frame", None)
+    if frame is None:
+        return None
+    _local.frame = None
+    report = {
+        "event": "rerun",
+        "label": frame.label,
+        "session": session,
+        "ms": round((time.perf_counter() - frame.started) * 1000, 3),
+        "calls": _rows(frame.calls),
+        "caches": _cache_rows(frame.caches, cache_counters()),
+    }
+    _trace(report)
+    return report
+
+def _trace(event: Dict[str, Any]) -> None:
+    path = _trace_path
+    if path is None:
+        return
+    line = json.dumps(dict(event, ts=datetime.utcnow().isoformat()), ensure_ascii=False) + "\n"
+    with _trace_lock:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass  # tracing must never break the app
@@ -0,0 +1,76 @@
+"""Read-only queries the tabs are built from.
+
+Kept apart from the Streamlit code so they can be timed headless (see
+benchmarks/suite.py). They only read the state; searches go through the
+``StateIndex``, whose search indexes are built on first use, so callers
+sharing an index between threads should hold its lock.
+"""
+from typing import Any, Dict, List
+
+from state_index import StateIndex
+from storage import record_key
+
+def _player_key(player_idx: int) -> str:
+    return "player1" if player_idx == 0 else "player2"
+
+def available_player_pokemon(state: Dict[str, Any], player_idx: int) -> List[Dict[str, Any]]:
+    """The player's live, unfused Pokémon, for picking fusion partners."""
+    key = _player_key(player_idx)
+    return [
+        {"pairing_id": p["id"], "number": p[key]["number"], "name": p[key]["name"]}
+        for p in state["pairings"]
+        if not p.get("dead") and not p[key]["used"]
+    ]
+
+def player_pokemon(state: Dict[str, Any], player_idx: int) -> List[Dict[str, Any]]:
+    """Everything the player could put on their team: unfused pairings and fusions."""
+    player_key = _player_key(player_idx)
+    all_pokemon = []
+
+    # From pairings (unfused and available)
+    for p in state["pairings"]:
+        if not p.get("dead") and not p[player_key]["used"]:
+            mon = p[player_key].copy()
+            mon["pairing_id"] = p["id"]
+            mon["source"] = "Paired"
+            mon["uid"] = f'{p["id"]}_{player_key}'
+            all_pokemon.append(mon)
+
+    # From fusions
+    for f in state["fusions"]:
+        fused_mon_data = f[player_key]
+        mon = {
+            "source": "Fusion",
+            "fusion_id": f["id"],
+            "uid": f'{f["id"]}_{player_key}',
+            "name": f"{fused_mon_data['a']['name']} / {fused_mon_data['b']['name']}",
+            "number_a": fused_mon_data['a']['number'],
+            "number_b": fused_mon_data['b']['number'],
+        }
+        all_pokemon.append(mon)
+
+    return all_pokemon
+
+def filter_pairings(state: Dict[str, Any], index: StateIndex, query: str = "", only_unfused: bool = False) -> List[Dict[str, Any]]:
+    """Live pairings for the Pairings tab, optionally unfused only and/or matching ``query``."""
+    pairs = [p for p in list(state["pairings"]) if not p.get("dead")]
+    if only_unfused:
+        pairs = [p for p in pairs if not (p["player1"]["used"] or p["player2"]["used"])]
+    if query:
+        hits = index.search("pairings", query.strip())
+        pairs = [p for p in pairs if p["id"] in hits]
+    return pairs
+
+def filter_fusions(state: Dict[str, Any], index: StateIndex, query: str = "") -> List[Dict[str, Any]]:
+    items = list(state["fusions"])
+    if query:
+        hits = index.search("fusions", query.strip())
+        items = [f for f in items if f["id"] in hits]
+    return items
+
+def filter_graveyard(state: Dict[str, Any], index: StateIndex, query: str = "") -> List[Dict[str, Any]]:
+    items = list(state["graveyard"])
+    if query:
+        hits = index.search("graveyard", query.strip())
+        items = [g for g in items if record_key("graveyard", g) in hits]
+    return items
@@ -0,0 +1,88 @@
+"""Substring search over pairings, fusions and graveyard entries.
+
+Each record's searchable fields (id, species names, zero-padded numbers,
+encounter) are lowercased once and kept per record, and every trigram of
+them is posted in an inverted index. A query of three or more characters
+intersects the postings of its trigrams and only checks the candidates;
+shorter queries match most records anyway and just scan the prepared
+fields. Either way the result is exactly "the query is a substring of one
+of the fields", the same test the search boxes have always used.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+GRAM = 3
+
+Fields = Callable[[Dict[str, Any]], Iterable[Any]]
+
+def pairing_fields(p: Dict[str, Any]) -> Iterable[Any]:
+    return [
+        p.get("id", ""),
+        p["player1"].get("name", ""), p["player2"].get("name", ""),
+        f"{int(p['player1']['number']):03d}", f"{int(p['player2']['number']):03d}",
+        str(p["player1"].get("encounter", "")), str(p["player2"].get("encounter", "")),
+    ]
+
+def fusion_fields(f: Dict[str, Any]) -> Iterable[Any]:
+    return [
+        f["id"],
+        f["player1"]["a"]["name"], f["player1"]["b"]["name"],
+        f["player2"]["a"]["name"], f["player2"]["b"]["name"],
+        f"{int(f['player1']['a']['number']):03d}", f"{int(f['player1']['b']['number']):03d}",
+        f"{int(f['player2']['a']['number']):03d}", f"{int(f['player2']['b']['number']):03d}",
+    ]
+
+def graveyard_fields(g: Dict[str, Any], name_of: Optional[Callable[[int], str]] = None) -> Iterable[Any]:
+    """Only pairing entries are searchable; species names come from ``name_of``."""
+    if g.get("kind") != "pairing":
+        return []
+    n1, n2 = int(g["player1"]["number"]), int(g["player2"]["number"])
+    fields = [g.get("id", ""), f"{n1:03d}", f"{n2:03d}"]
+    if name_of is not None:
+        fields += [name_of(n1), name_of(n2)]
+    return fields
+
+def _grams(texts: Iterable[str]) -> Set[str]:
+    return {t[i:i + GRAM] for t in texts for i in range(len(t) - GRAM + 1)}
+
+class SearchIndex:
+    def __init__(self, fields: Fields):
+        self.fields = fields
+        # record key -> its lowercased field strings
+        self._docs: Dict[str, Tuple[str, ...]] = {}
+        # trigram -> keys of records with that trigram in some field
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, key: str, rec: Dict[str, Any]) -> None:
+        """Index ``rec`` under ``key``, replacing whatever was indexed there."""
+        self.remove(key)
+        texts = tuple({str(x).lower() for x in self.fields(rec)})
+        self._docs[key] = texts
+        for g in _grams(texts):
+            self._postings.setdefault(g, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        texts = self._docs.pop(key, None)
+        if texts is None:
+            return
+        for g in _grams(texts):
+            keys = self._postings.get(g)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[g]
+
+    def query(self, q: str) -> Set[str]:
+        """Keys of the records with ``q`` (lowercased) in one of their fields."""
+        q = q.lower()
+        if len(q) < GRAM:
+            return {k for k, texts in self._docs.items() if any(q in t for t in texts)}
+        postings = sorted((self._postings.get(g, set()) for g in _grams([q])), key=len)
+        if not postings[0]:
+            return set()
+        candidates = postings[0].intersection(*postings[1:])
+        if len(q) == GRAM:
+            return candidates
+        return {k for k in candidates if any(q in t for t in self._docs[k])}
@@ -0,0 +1,152 @@
+"""Run state shared by every browser session in the server process.
+
+Both players usually have the tracker open at once. Instead of each session
+holding its own copy of the state (and the last save winning), all sessions
+of a run work on one ``SharedRun``: one state dict, one ``StateIndex``, one
+lock and a version number that goes up with every committed change.
+
+Changes use optimistic concurrency. A session remembers the version its
+view was rendered from and runs an action inside ``transaction(base,
+reads)``, naming the records the action depends on. If another session
+changed one of those records after ``base``, the action is rejected with
+``Conflict``; changes to other records merge without fuss. Records last
+changed by the acting session itself never conflict: a session's own
+change may only have rerun the fragment it was made from, leaving its
+other views on an older version.
+
+Every commit is also published to ``live_sync`` so the other sessions can
+refresh, and the state files are watched so that edits made outside the
+app are loaded into the run.
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import storage
+from live_sync import Change, StateFileWatcher, get_hub
+from write_behind import get_writer
+
+RecordRef = Tuple[str, str]  # (collection, record key) or ("field", name)
+
+class Conflict(Exception):
+    def __init__(self, refs: List[RecordRef]):
+        super().__init__(f"changed by another session: {', '.join(k for _, k in refs)}")
+        self.refs = refs
+
+def _normalize(state: Dict[str, Any]) -> Dict[str, Any]:
+    for coll in storage.RECORD_COLLECTIONS:
+        state.setdefault(coll, [])
+    state.setdefault("next_pair_id", 1)
+    state.setdefault("next_fusion_id", 1)
+    return state
+
+class SharedRun:
+    def __init__(self, state: Dict[str, Any], key: Any = None):
+        self.key = key  # live_sync topic
+        self.lock = threading.RLock()
+        self.state = _normalize(state)
+        self.version = 1
+        # Built by the app on first use; reset whenever the state is replaced
+        self.index: Any = None
+        # record -> (version, origin session) of its last change
+        self._touched: Dict[RecordRef, Tuple[int, Optional[str]]] = {}
+        # (version, origin session) of the last time the whole state was replaced
+        self._replaced: Tuple[int, Optional[str]] = (0, None)
+        self.watcher: Optional[StateFileWatcher] = None
+
+    def changed_since(
+        self, version: int, refs: Iterable[RecordRef], origin: Optional[str] = None
+    ) -> List[RecordRef]:
+        """Which of ``refs`` were changed after ``version`` by a session other
+        than ``origin``."""
+
+        def stale(touched: Tuple[int, Optional[str]]) -> bool:
+            at, by = touched
+            return at > version and (origin is None or by != origin)
+
+        with self.lock:
+            if stale(self._replaced):
+                return list(refs)
+            return [r for r in refs if stale(self._touched.get(r, (0, None)))]
+
+    @contextmanager
+    def transaction(self, base_version: int, reads: Iterable[RecordRef] = (), origin: Optional[str] = None):
+        """Hold the run's lock for one action; raises ``Conflict`` if another
+        session than ``origin`` changed any of ``reads`` since ``base_version``."""
+        with self.lock:
+            stale = self.changed_since(base_version, reads, origin)
+            if stale:
+                raise Conflict(stale)
+            yield self.state
+
+    def commit(self, ops: Optional[List[Dict[str, Any]]] = None, origin: Optional[str] = None) -> int:
+        """Record a change, bump the version and tell the other sessions.
+        ``ops=None`` means the whole state changed; an empty list means
+        nothing did. ``origin`` is the session making the change."""
+        with self.lock:
+            if ops is not None and not ops:
+                return self.version
+            self.version += 1
+            if ops is None:
+                self._replaced = (self.version, origin)
+                self._touched.clear()
+            else:
+                for op in ops:
+                    if op.get("o") == "set":
+                        ref = ("field", op["f"])
+                    else:
+                        key = op["k"] if op.get("o") == "del" else storage.record_key(op["c"], op["v"])
+                        ref = (op["c"], key)
+                    self._touched[ref] = (self.version, origin)
+            colls = None if ops is None else frozenset(op["c"] for op in ops if op.get("o") != "set")
+            get_hub().publish(self.key, Change(self.version, colls, origin))
+            return self.version
+
+    def replace(self, state: Dict[str, Any], origin: Optional[str] = None) -> int:
+        """Swap in a whole new state (reset, reload); every session's view is stale."""
+        with self.lock:
+            self.state = _normalize(state)
+            self.index = None
+            return self.commit(None, origin)
+
+    def reload(self) -> bool:
+        """Replace the state with what is on disk. Called when the state
+        files were edited from outside the app; changes the app hasn't
+        saved yet are written first rather than lost."""
+        if _mid_write():
+            return False
+        # The writer's lock order: its flush lock, then the run lock
+        with get_writer().hold(self.lock):
+            state = storage.load_state()
+            if self.watcher is not None:
+                self.watcher.acknowledge()
+            self.replace(state)
+            return True
+
+def _mid_write() -> bool:
+    """A JSON state file that exists but doesn't parse is most likely still being written."""
+    path = storage.STATE_PATH
+    return storage.STATE_BACKEND != "sqlite" and path.is_file() and storage._load_json_state(path) is None
+
+_runs: Dict[Path, SharedRun] = {}
+_runs_lock = threading.Lock()
+
+def get_run() -> SharedRun:
+    """The shared run for ``storage.STATE_PATH``, loaded on first use."""
+    key = Path(storage.STATE_PATH)
+    with _runs_lock:
+        run = _runs.get(key)
+    if run is not None:
+        return run
+    # Don't load behind a pending write. Flushed outside _runs_lock: the
+    # flush takes the pending run's lock, whose holder may be in get_run
+    writer = get_writer()
+    writer.flush()
+    with _runs_lock:
+        if key not in _runs:
+            run = _runs[key] = SharedRun(storage.load_state(), key)
+            run.watcher = StateFileWatcher(storage.state_files(), run.reload)
+            writer.after_write.append(run.watcher.acknowledge)
+            run.watcher.start()
+        return _runs[key]
@@ -0,0 +1,167 @@
+"""Compressed, streamed run snapshots for backups and moving runs around.
+
+A snapshot is JSON lines, gzip- or zstd-compressed. The first line is a
+header with the schema version, the id counters, how many records of each
+collection follow and any other top-level state fields. Every following
+line is one record: ``{"c": <collection>, "v": <record>}``, with the
+collections in ``storage.RECORD_COLLECTIONS`` order.
+
+Both directions stream: writing serializes one record at a time into the
+compressor, and reading decompresses and parses line by line, so neither
+side builds the whole document in memory. zstd needs the ``zstandard``
+package; gzip is always available and is the default.
+"""
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Tuple, Union
+
+from storage import RECORD_COLLECTIONS
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+SCHEMA_VERSION = 1
+FORMAT = "soullink-snapshot"
+COUNTERS = ("next_pair_id", "next_fusion_id")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+Target = Union[str, Path, IO[bytes]]
+
+class SnapshotError(ValueError):
+    pass
+
+def compressions() -> Tuple[str, ...]:
+    return ("gzip", "zstd") if zstandard is not None else ("gzip",)
+
+def _line(obj: Any) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+def header_for(state: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {k: v for k, v in state.items() if k not in RECORD_COLLECTIONS and k not in COUNTERS}
+    return {
+        "format": FORMAT,
+        "schema": SCHEMA_VERSION,
+        "exported_at": datetime.utcnow().isoformat(),
+        "next_pair_id": state.get("next_pair_id", 1),
+        "next_fusion_id": state.get("next_fusion_id", 1),
+        "counts": {c: len(state.get(c) or []) for c in RECORD_COLLECTIONS},
+        "fields": fields,
+    }
+
+def _open_write(raw: IO[bytes], compression: str) -> IO[bytes]:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise SnapshotError("zstd snapshots need the zstandard package")
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    raise SnapshotError(f"Unknown compression {compression!r}")
+
+def write_snapshot(state: Dict[str, Any], dest: Target, compression: str = "gzip") -> int:
+    """Write ``state`` as a snapshot to a path or binary file; returns the
+    number of records written."""
+    own = isinstance(dest, (str, Path))
+    raw = open(dest, "wb") if own else dest
+    written = 0
+    try:
+        out = _open_write(raw, compression)
+        try:
+            out.write(_line(header_for(state)))
+            for coll in RECORD_COLLECTIONS:
+                for rec in state.get(coll) or []:
+                    out.write(_line({"c": coll, "v": rec}))
+                    written += 1
+        finally:
+            out.close()
+    finally:
+        if own:
+            raw.close()
+    return written
+
+def _magic(raw: IO[bytes]) -> bytes:
+    if raw.seekable():
+        pos = raw.tell()
+        magic = raw.read(4)
+        raw.seek(pos)
+        return magic
+    return raw.peek(4)[:4]
+
+def _open_read(raw: IO[bytes]) -> IO[bytes]:
+    if not raw.seekable() and not hasattr(raw, "peek"):
+        raw = io.BufferedReader(raw)
+    magic = _magic(raw)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise SnapshotError("This snapshot is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+    return raw  # uncompressed JSON lines
+
+def iter_snapshot(src: Target) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``("header", header)`` and then ``(collection, record)`` for
+    every record, reading ``src`` a line at a time."""
+    own = isinstance(src, (str, Path))
+    raw = open(src, "rb") if own else src
+    stream = _open_read(raw)
+    lines = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        try:
+            header = json.loads(lines.readline() or "null")
+        except (ValueError, EOFError, OSError, zlib.error):
+            header = None
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise SnapshotError("Not a run snapshot")
+        if header.get("schema", 0) > SCHEMA_VERSION:
+            raise SnapshotError(f"Snapshot schema {header['schema']} is newer than this app understands ({SCHEMA_VERSION})")
+        yield "header", header
+        n = 1
+        while True:
+            try:
+                line = lines.readline()
+            except (EOFError, OSError, zlib.error, UnicodeDecodeError):
+                raise SnapshotError("Snapshot is truncated or corrupt") from None
+            if not line:
+                break
+            n += 1
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                coll, rec = entry["c"], entry["v"]
+            except (ValueError, KeyError, TypeError):
+                raise SnapshotError(f"Line {n} is not a snapshot record") from None
+            if coll not in RECORD_COLLECTIONS:
+                raise SnapshotError(f"Line {n}: unknown collection {coll!r}")
+            yield coll, rec
+    finally:
+        lines.detach()  # closing the wrapper would close a caller's file too
+        if stream is not raw:
+            stream.close()
+        if own:
+            raw.close()
+
+def read_snapshot(src: Target) -> Dict[str, Any]:
+    """Load a snapshot into a state dict, checking the record counts."""
+    records = iter_snapshot(src)
+    _, header = next(records)
+    state: Dict[str, Any] = dict(header.get("fields") or {})
+    for coll in RECORD_COLLECTIONS:
+        state[coll] = []
+    for coll, rec in records:
+        state[coll].append(rec)
+    for counter in COUNTERS:
+        state[counter] = int(header.get(counter, 1))
+    expected = header.get("counts") or {}
+    short = {c: (len(state[c]), n) for c, n in expected.items() if c in state and len(state[c]) != n}
+    if short:
+        detail = ", ".join(f"{c}: {got} of {n}" for c, (got, n) in short.items())
+        raise SnapshotError(f"Snapshot is incomplete ({detail})")
+    return state
@@ -0,0 +1,190 @@
+"""Pack the base sprites in sprites/ into atlas sheets served from static/atlas/.
+
+The manifest maps each Pokedex number to ``[sheet, x, y, w, h]`` and records
+a content hash of sprites/ (plus the number -> file mapping), so the atlas is
+rebuilt whenever a sprite is added, removed or changed. Build it ahead of
+time with:
+
+    python sprite_atlas.py
+"""
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from storage import BASE_DIR, Pokedex, load_pokedex
+
+SPRITES_DIR = BASE_DIR / "sprites"
+ATLAS_DIR = BASE_DIR / "static" / "atlas"
+ATLAS_MANIFEST = ATLAS_DIR / "manifest.json"
+ATLAS_URL_PREFIX = "app/static/atlas"
+
+# Keep each sheet under this many pixels per side
+MAX_SHEET_SIZE = 2048
+
+class SpriteAtlas:
+    """Loaded atlas manifest: sheet URLs and per-number regions."""
+
+    __slots__ = ("hash", "sheets", "regions")
+
+    def __init__(self, hash: str, sheets: List[Dict], regions: Dict[int, Tuple[int, int, int, int, int]]):
+        self.hash = hash
+        self.sheets = sheets
+        self.regions = regions
+
+    def __contains__(self, number) -> bool:
+        try:
+            return int(number) in self.regions
+        except Exception:
+            return False
+
+    def stylesheet(self) -> str:
+        """CSS shared by every atlas sprite; emit once per page.
+
+        Elements carry their region (``--x``, ``--y``, ``--w``, ``--h``) and
+        scale (``--z``) as custom properties so per-tile markup stays short.
+        """
+        rules = [
+            ".sa{display:inline-block;background-repeat:no-repeat;image-rendering:pixelated;"
+            "width:calc(var(--w)*var(--z)*1px);height:calc(var(--h)*var(--z)*1px);"
+            "background-position:calc(var(--x)*var(--z)*-1px) calc(var(--y)*var(--z)*-1px)}"
+        ]
+        for i, sheet in enumerate(self.sheets):
+            rules.append(
+                f".sa{i}{{background-image:url('{ATLAS_URL_PREFIX}/{sheet['file']}');"
+                f"background-size:calc({sheet['width']}px*var(--z)) calc({sheet['height']}px*var(--z))}}"
+            )
+        return "".join(rules)
+
+    def html(self, number: int, width: int) -> str:
+        """Markup drawing ``number`` scaled to ``width`` px from its sheet."""
+        sheet_idx, x, y, w, h = self.regions[int(number)]
+        return (
+            f'<span role="img" aria-label="#{int(number):03d}" class="sa sa{sheet_idx}" '
+            f'style="--x:{x};--y:{y};--w:{w};--h:{h};--z:{width / w:g}"></span>'
+        )
+
+    @classmethod
+    def from_manifest(cls, manifest: Dict) -> "SpriteAtlas":
+        regions = {int(k): tuple(v) for k, v in manifest["sprites"].items()}
+        return cls(manifest["hash"], manifest["sheets"], regions)
+
+def _sprite_files(dex: Pokedex) -> Dict[int, Path]:
+    files: Dict[int, Path] = {}
+    for n, spr in zip(dex.numbers, dex.sprites):
+        if not spr or spr.startswith(("http://", "https://", "data:")):
+            continue
+        p = Path(spr)
+        if p.is_file() and n not in files:
+            files[n] = p
+    return files
+
+def sprites_hash(files: Dict[int, Path]) -> str:
+    h = hashlib.sha256()
+    for n in sorted(files):
+        p = files[n]
+        h.update(f"{n}:{p.name}:".encode("utf-8"))
+        h.update(p.read_bytes())
+    return h.hexdigest()
+
+def _read_manifest() -> Optional[Dict]:
+    try:
+        with ATLAS_MANIFEST.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def build_atlas(dex: Pokedex, digest: Optional[str] = None) -> Optional[Dict]:
+    """Pack every local base sprite into sheets and write the manifest.
+
+    Returns the manifest, or None when Pillow isn't installed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    files = _sprite_files(dex)
+    if not files:
+        return None
+    digest = digest or sprites_hash(files)
+
+    images: Dict[int, "Image.Image"] = {}
+    for n, p in files.items():
+        try:
+            with Image.open(p) as im:
+                images[n] = im.convert("RGBA")
+        except Exception:
+            continue
+    if not images:
+        return None
+    cell_w = max(im.width for im in images.values())
+    cell_h = max(im.height for im in images.values())
+    cols = max(1, MAX_SHEET_SIZE // cell_w)
+    rows = max(1, MAX_SHEET_SIZE // cell_h)
+    per_sheet = cols * rows
+
+    ATLAS_DIR.mkdir(parents=True, exist_ok=True)
+    numbers = sorted(images)
+    sheets: List[Dict] = []
+    regions: Dict[str, List[int]] = {}
+    for sheet_idx, start in enumerate(range(0, len(numbers), per_sheet)):
+        chunk = numbers[start:start + per_sheet]
+        sheet_cols = min(cols, len(chunk))
+        sheet_rows = math.ceil(len(chunk) / sheet_cols)
+        sheet = Image.new("RGBA", (sheet_cols * cell_w, sheet_rows * cell_h), (0, 0, 0, 0))
+        for i, n in enumerate(chunk):
+            im = images[n]
+            x, y = (i % sheet_cols) * cell_w, (i // sheet_cols) * cell_h
+            sheet.paste(im, (x, y))
+            regions[str(n)] = [sheet_idx, x, y, im.width, im.height]
+        name = f"atlas-{digest[:16]}-{sheet_idx}.png"
+        tmp = ATLAS_DIR / (name + ".tmp")
+        sheet.save(tmp, format="PNG", optimize=True)
+        os.replace(tmp, ATLAS_DIR / name)
+        sheets.append({"file": name, "width": sheet.width, "height": sheet.height})
+
+    manifest = {"hash": digest, "sheets": sheets, "sprites": regions}
+    tmp = ATLAS_MANIFEST.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, ATLAS_MANIFEST)
+
+    # Drop sheets from previous builds
+    keep = {s["file"] for s in sheets}
+    for old in ATLAS_DIR.glob("atlas-*.png"):
+        if old.name not in keep:
+            old.unlink(missing_ok=True)
+    return manifest
+
+_current: Optional[SpriteAtlas] = None
+
+def ensure_atlas(dex: Pokedex) -> Optional[SpriteAtlas]:
+    """Load the atlas, rebuilding it first if sprites/ no longer matches its hash."""
+    global _current
+    files = _sprite_files(dex)
+    if not files:
+        _current = None
+        return None
+    digest = sprites_hash(files)
+    manifest = _read_manifest()
+    if (
+        not manifest
+        or manifest.get("hash") != digest
+        or not all((ATLAS_DIR / s["file"]).is_file() for s in manifest.get("sheets", []))
+    ):
+        manifest = build_atlas(dex, digest)
+    _current = SpriteAtlas.from_manifest(manifest) if manifest else None
+    return _current
+
+def current_atlas() -> Optional[SpriteAtlas]:
+    return _current
+
+if __name__ == "__main__":
+    atlas = ensure_atlas(load_pokedex())
+    if atlas is None:
+        print("No atlas built (Pillow missing or no local sprites).")
+    else:
+        print(f"Atlas {atlas.hash[:16]}: {len(atlas.regions)} sprites in {len(atlas.sheets)} sheet(s)")
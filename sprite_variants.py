@@ -0,0 +1,254 @@
+"""Pre-rendered sprite variants for the widths the UI draws sprites at.
+
+Tiles and cards show sprites at a handful of fixed widths
+(``VARIANT_WIDTHS``). For every local sprite (the base sprites in sprites/
+and the custom fusion sprites cached under static/fusions/) the manifest
+records a content hash and the image size, and for each of those widths
+narrower than the sprite a downscaled copy is written to static/variants/,
+named after the content hash so browsers can cache it for good. A sprite
+that is already no wider than a display width is served as is for it
+(scaling it up here would only make the file bigger), and so is one whose
+downscaled copy doesn't come out smaller.
+
+Variants are rendered across a process pool and kept on disk: a rebuild
+only renders sprites whose hash changed. Variants nothing refers to any
+more are only deleted at the next start-up, because pages rendered before
+a rebuild still point at the previous manifest's files. Needs Pillow;
+without it ``ensure_variants`` does nothing and the UI keeps using the
+original files. Build ahead of time with:
+
+    python sprite_variants.py
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from storage import BASE_DIR, Pokedex, load_pokedex
+
+VARIANTS_DIR = BASE_DIR / "static" / "variants"
+VARIANTS_MANIFEST = VARIANTS_DIR / "manifest.json"
+VARIANTS_URL_PREFIX = "app/static/variants"
+FUSIONS_DIR = BASE_DIR / "static" / "fusions"
+# Every width a tile or card draws a sprite at (see ui_components)
+VARIANT_WIDTHS = (64, 72, 96, 112, 120, 144)
+MANIFEST_VERSION = 1
+
+def _key(path: Path) -> str:
+    """Manifest key: the path relative to the repo when it's inside it."""
+    try:
+        return Path(path).relative_to(BASE_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+def _digest(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+    except OSError:
+        return None
+
+class SpriteVariants:
+    """Loaded manifest: which variant to serve for a sprite at a width."""
+
+    __slots__ = ("widths", "entries", "_by_path")
+
+    def __init__(self, widths: Iterable[int], entries: Dict[str, Dict[str, Any]]):
+        self.widths = tuple(widths)
+        self.entries = entries
+        # sprite path as the app spells it -> {width: variant file name}
+        self._by_path: Dict[str, Dict[int, str]] = {}
+        for key, entry in entries.items():
+            variants = {int(w): name for w, name in entry.get("variants", {}).items()}
+            path = Path(key) if Path(key).is_absolute() else BASE_DIR / key
+            for spelling in {str(path), os.path.realpath(path)}:
+                self._by_path[spelling] = variants
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def variant(self, path: str, width: int) -> Optional[Path]:
+        """The variant file for drawing ``path`` ``width`` pixels wide: the
+        narrowest one at least that wide. None when the original is the
+        best choice (it's no wider) or the sprite isn't in the manifest."""
+        variants = self._by_path.get(str(path))
+        if not variants:
+            return None
+        fits = [w for w in variants if w >= width]
+        if not fits:
+            return None
+        return VARIANTS_DIR / variants[min(fits)]
+
+    @staticmethod
+    def url(variant: Path) -> str:
+        return f"{VARIANTS_URL_PREFIX}/{quote(variant.name)}"
+
+def _variant_name(source: Path, digest: str, width: int) -> str:
+    return f"{source.stem}.{digest}.w{width}.png"
+
+def _render_job(source: str, digest: str, widths: Tuple[int, ...], out_dir: str) -> Dict[str, Any]:
+    """Process-pool worker: measure one sprite and write its variants to ``out_dir``."""
+    from PIL import Image
+
+    src = Path(source)
+    src_bytes = src.stat().st_size
+    with Image.open(src) as im:
+        im = im.convert("RGBA")
+    entry: Dict[str, Any] = {"hash": digest, "width": im.width, "height": im.height, "variants": {}}
+    for w in widths:
+        if w >= im.width:
+            continue  # the original already fits
+        h = max(1, round(im.height * w / im.width))
+        name = _variant_name(src, digest, w)
+        target = Path(out_dir) / name
+        if not target.is_file():
+            tmp = target.with_name(f"{name}.{os.getpid()}.tmp")
+            # Nearest keeps the pixel art crisp and its palette small (custom
+            # sprites are 3x3 blocks, so 96 and 144 are exact)
+            im.resize((w, h), Image.NEAREST).save(tmp, format="PNG", optimize=True)
+            if tmp.stat().st_size >= src_bytes:
+                tmp.unlink()  # no smaller than the original: serve that
+                continue
+            os.replace(tmp, target)
+        entry["variants"][str(w)] = name
+    return entry
+
+def _read_manifest() -> Optional[Dict[str, Any]]:
+    try:
+        with VARIANTS_MANIFEST.open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception:
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def _current_entry(old: Optional[Dict[str, Any]], digest: str, widths: Tuple[int, ...]) -> bool:
+    if not old or old.get("hash") != digest or old.get("widths") != list(widths):
+        return False
+    return all((VARIANTS_DIR / name).is_file() for name in old.get("variants", {}).values())
+
+def build_variants(
+    paths: Iterable[Path], widths: Iterable[int] = VARIANT_WIDTHS, max_workers: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """Bring the manifest and variant files up to date for ``paths``.
+
+    Returns the manifest, or None when Pillow isn't installed.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return None
+    widths = tuple(sorted(set(int(w) for w in widths)))
+    old = (_read_manifest() or {}).get("sprites", {})
+    sprites: Dict[str, Dict[str, Any]] = {}
+    jobs: List[Tuple[str, str, str]] = []
+    for path in dict.fromkeys(Path(p) for p in paths):
+        key, digest = _key(path), _digest(path)
+        if digest is None:
+            continue
+        if _current_entry(old.get(key), digest, widths):
+            sprites[key] = old[key]
+        else:
+            jobs.append((key, str(path), digest))
+
+    VARIANTS_DIR.mkdir(parents=True, exist_ok=True)
+    if len(jobs) <= 4:
+        results = [_render_job(src, digest, widths, str(VARIANTS_DIR)) for _, src, digest in jobs]
+    else:
+        # spawn keeps workers clear of the server's threads and locks
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+            results = list(pool.map(
+                _render_job, [j[1] for j in jobs], [j[2] for j in jobs],
+                [widths] * len(jobs), [str(VARIANTS_DIR)] * len(jobs), chunksize=32,
+            ))
+    for (key, _, _), entry in zip(jobs, results):
+        entry["widths"] = list(widths)
+        sprites[key] = entry
+
+    manifest = {"version": MANIFEST_VERSION, "widths": list(widths), "sprites": sprites}
+    if not jobs and sprites.keys() == old.keys():
+        return manifest  # nothing changed
+    tmp = VARIANTS_MANIFEST.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, VARIANTS_MANIFEST)
+    return manifest
+
+def prune_variants(manifest: Dict[str, Any]) -> int:
+    """Delete the variants ``manifest`` doesn't refer to. Call only while
+    nothing serves an older manifest; ``ensure_variants`` does this once per
+    process, before its first rebuild."""
+    keep = {name for e in manifest["sprites"].values() for name in e["variants"].values()}
+    removed = 0
+    for stale in VARIANTS_DIR.glob("*.png"):
+        if stale.name not in keep:
+            stale.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+def sprite_sources(dex: Pokedex) -> List[Path]:
+    """Every local sprite the UI can show: base sprites and cached fusions."""
+    paths = [Path(s) for s in dex.sprites if s and not s.startswith(("http://", "https://", "data:"))]
+    paths = [p for p in paths if p.is_file()]
+    if FUSIONS_DIR.is_dir():
+        paths += sorted(FUSIONS_DIR.glob("*.png"))
+    return paths
+
+_current: Optional[SpriteVariants] = None
+_pruned = False
+_build_lock = threading.Lock()
+
+def ensure_variants(dex: Pokedex, max_workers: Optional[int] = None) -> Optional[SpriteVariants]:
+    """Update the variants for the current sprites and start serving them.
+
+    Files the replaced manifest used stay on disk for pages rendered before
+    the swap; the first call in a process prunes against the manifest it
+    started out serving instead.
+    """
+    global _current, _pruned
+    with _build_lock:
+        if not _pruned:
+            _pruned = True
+            served = {"sprites": _current.entries} if _current is not None else _read_manifest()
+            if served is not None and VARIANTS_DIR.is_dir():
+                prune_variants(served)
+        manifest = build_variants(sprite_sources(dex), max_workers=max_workers)
+        if manifest is not None:
+            _current = SpriteVariants(manifest["widths"], manifest["sprites"])
+    return _current
+
+def ensure_in_background(dex: Pokedex) -> threading.Thread:
+    """Run ``ensure_variants`` on a daemon thread so page loads don't wait;
+    until it finishes the UI serves the previous variants or the originals."""
+    global _current
+    if _current is None:
+        manifest = _read_manifest()
+        if manifest:
+            _current = SpriteVariants(manifest["widths"], manifest["sprites"])
+
+    def run():
+        if _build_lock.locked():
+            return  # a build is already running
+        try:
+            ensure_variants(dex)
+        except Exception:
+            pass  # the originals still work
+
+    t = threading.Thread(target=run, name="sprite-variants", daemon=True)
+    t.start()
+    return t
+
+def current_variants() -> Optional[SpriteVariants]:
+    return _current
+
+if __name__ == "__main__":
+    variants = ensure_variants(load_pokedex())
+    if variants is None:
+        print("No variants built (Pillow missing).")
+    else:
+        n = sum(len(e["variants"]) for e in variants.entries.values())
+        print(f"{len(variants)} sprites in the manifest, {n} variant(s) in {VARIANTS_DIR}")
@@ -0,0 +1,268 @@
+"""SQLite storage backend for the run state.
+
+Each collection gets its own table. The full record is kept as JSON in
+``data`` so the round trip to the state dict is lossless. The columns the
+app looks things up by are extracted and indexed: pairing id, encounter,
+fusion -> pairing references. ``seq`` preserves list order. Every
+``save_changes`` batch (one UI action) is applied in a single transaction.
+
+Migrate an existing save with:
+
+    python sqlite_store.py migrate [data/state.json] [data/state.sqlite3]
+"""
+import json
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from storage import RECORD_COLLECTIONS, _default_state, _load_json_state, record_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pairings (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    encounter TEXT,
+    p1_number INTEGER,
+    p2_number INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pairings_seq ON pairings(seq);
+CREATE INDEX IF NOT EXISTS pairings_encounter ON pairings(encounter);
+CREATE TABLE IF NOT EXISTS fusions (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fusions_seq ON fusions(seq);
+CREATE TABLE IF NOT EXISTS fusion_refs (
+    fusion_id TEXT NOT NULL,
+    side TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    pairing_id TEXT,
+    PRIMARY KEY (fusion_id, side, slot)
+);
+CREATE INDEX IF NOT EXISTS fusion_refs_pairing ON fusion_refs(pairing_id);
+CREATE TABLE IF NOT EXISTS graveyard (
+    key TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    kind TEXT,
+    id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS graveyard_seq ON graveyard(seq);
+CREATE INDEX IF NOT EXISTS graveyard_id ON graveyard(id);
+CREATE TABLE IF NOT EXISTS team_slots (
+    team TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (team, uid)
+);
+CREATE INDEX IF NOT EXISTS team_slots_seq ON team_slots(team, seq);
+"""
+
+TEAMS = ("player1_team", "player2_team")
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+
+class SQLiteStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Streamlit runs sessions on different threads; the lock serializes them
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ----- transactions -----
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ----- writes -----
+
+    @staticmethod
+    def _next_seq(conn, table: str, where: str = "", args: tuple = ()) -> int:
+        row = conn.execute(f"SELECT COALESCE(MAX(seq), 0) + 1 FROM {table} {where}", args).fetchone()
+        return int(row[0])
+
+    def _put(self, conn, coll: str, rec: Dict[str, Any]) -> None:
+        data = _dumps(rec)
+        if coll == "pairings":
+            enc = rec.get("player1", {}).get("encounter") or rec.get("player2", {}).get("encounter")
+            conn.execute(
+                "INSERT INTO pairings (id, seq, encounter, p1_number, p2_number, data) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET encounter=excluded.encounter, p1_number=excluded.p1_number, "
+                "p2_number=excluded.p2_number, data=excluded.data",
+                (rec["id"], self._next_seq(conn, "pairings"), enc,
+                 rec.get("player1", {}).get("number"), rec.get("player2", {}).get("number"), data),
+            )
+        elif coll == "fusions":
+            conn.execute(
+                "INSERT INTO fusions (id, seq, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data=excluded.data",
+                (rec["id"], self._next_seq(conn, "fusions"), data),
+            )
+            conn.execute("DELETE FROM fusion_refs WHERE fusion_id = ?", (rec["id"],))
+            conn.executemany(
+                "INSERT INTO fusion_refs (fusion_id, side, slot, pairing_id) VALUES (?, ?, ?, ?)",
+                [
+                    (rec["id"], side, slot, rec[side][slot].get("pairing_id"))
+                    for side in ("player1", "player2") if side in rec
+                    for slot in ("a", "b") if slot in rec[side]
+                ],
+            )
+        elif coll == "graveyard":
+            conn.execute(
+                "INSERT INTO graveyard (key, seq, kind, id, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data=excluded.data",
+                (record_key(coll, rec), self._next_seq(conn, "graveyard"), rec.get("kind"), rec.get("id"), data),
+            )
+        elif coll in TEAMS:
+            conn.execute(
+                "INSERT INTO team_slots (team, uid, seq, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(team, uid) DO UPDATE SET data=excluded.data",
+                (coll, record_key(coll, rec), self._next_seq(conn, "team_slots", "WHERE team = ?", (coll,)), data),
+            )
+
+    @staticmethod
+    def _del(conn, coll: str, key: str) -> None:
+        if coll == "pairings":
+            conn.execute("DELETE FROM pairings WHERE id = ?", (key,))
+        elif coll == "fusions":
+            conn.execute("DELETE FROM fusions WHERE id = ?", (key,))
+            conn.execute("DELETE FROM fusion_refs WHERE fusion_id = ?", (key,))
+        elif coll == "graveyard":
+            conn.execute("DELETE FROM graveyard WHERE key = ?", (key,))
+        elif coll in TEAMS:
+            conn.execute("DELETE FROM team_slots WHERE team = ? AND uid = ?", (coll, key))
+
+    @staticmethod
+    def _set(conn, field: str, value: Any) -> None:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (field, _dumps(value)),
+        )
+
+    def apply(self, ops: Iterable[Dict[str, Any]]) -> None:
+        """Apply one batch of change ops in a single transaction."""
+        with self._tx() as conn:
+            for op in ops:
+                kind = op.get("o")
+                if kind == "put":
+                    self._put(conn, op["c"], op["v"])
+                elif kind == "del":
+                    self._del(conn, op["c"], op["k"])
+                elif kind == "set":
+                    self._set(conn, op["f"], op["v"])
+
+    def replace(self, state: Dict[str, Any]) -> None:
+        """Overwrite everything with ``state`` in one transaction."""
+        with self._tx() as conn:
+            for table in ("meta", "pairings", "fusions", "fusion_refs", "graveyard", "team_slots"):
+                conn.execute(f"DELETE FROM {table}")
+            for field, value in state.items():
+                if field not in RECORD_COLLECTIONS:
+                    self._set(conn, field, value)
+            for coll in RECORD_COLLECTIONS:
+                for rec in state.get(coll) or []:
+                    self._put(conn, coll, rec)
+            self._set(conn, "_collections", [c for c in RECORD_COLLECTIONS if c in state])
+
+    # ----- reads -----
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._conn
+            meta = {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM meta")}
+            present = meta.pop("_collections", list(RECORD_COLLECTIONS))
+            state: Dict[str, Any] = dict(meta)
+            # Collections the saved state didn't have stay absent unless written since
+            for coll in ("pairings", "fusions", "graveyard"):
+                rows = [json.loads(d) for (d,) in conn.execute(f"SELECT data FROM {coll} ORDER BY seq")]
+                if rows or coll in present:
+                    state[coll] = rows
+            for team in TEAMS:
+                rows = [
+                    json.loads(d)
+                    for (d,) in conn.execute("SELECT data FROM team_slots WHERE team = ? ORDER BY seq", (team,))
+                ]
+                if rows or team in present:
+                    state[team] = rows
+            return state
+
+    def fusions_for_pairing(self, pairing_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT fusion_id FROM fusion_refs WHERE pairing_id = ? ORDER BY fusion_id", (pairing_id,)
+            )
+            return [r[0] for r in rows]
+
+    def pairings_by_encounter(self, encounter: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM pairings WHERE encounter = ? ORDER BY seq", (encounter,))
+            return [json.loads(d) for (d,) in rows]
+
+_stores: Dict[Path, SQLiteStore] = {}
+_stores_lock = threading.Lock()
+
+def store_for(db_path: Path, json_path: Optional[Path] = None) -> SQLiteStore:
+    """Shared store per database file; an empty database is seeded from ``json_path``."""
+    key = Path(db_path)
+    with _stores_lock:
+        if key not in _stores:
+            store = SQLiteStore(key)
+            if store.is_empty() and json_path is not None:
+                migrate(json_path, store)
+            _stores[key] = store
+        return _stores[key]
+
+def migrate(json_path: Path, store: SQLiteStore) -> bool:
+    """Copy a state.json into ``store``. Returns False if there was nothing to copy."""
+    state = _load_json_state(Path(json_path))
+    if state is None:
+        return False
+    store.replace(state)
+    return True
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+    import storage
+    src = Path(sys.argv[2]) if len(sys.argv) > 2 else storage.STATE_PATH
+    dst = Path(sys.argv[3]) if len(sys.argv) > 3 else storage.STATE_PATH.with_suffix(".sqlite3")
+    store = SQLiteStore(dst)
+    if not migrate(src, store):
+        print(f"Nothing to migrate: {src} is missing or unreadable.")
+        sys.exit(1)
+    original = _load_json_state(src) or _default_state()
+    ok = store.load() == original
+    print(f"Migrated {src} -> {dst} ({'lossless' if ok else 'MISMATCH'})")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,199 @@
+"""In-memory indexes over the run state.
+
+Built once when a session loads the state and kept up to date by each
+action, so an action only touches the records it affects instead of
+rescanning every pairing and fusion.
+
+Records are indexed by their ``storage.record_key`` (pairing and fusion id,
+team slot uid, graveyard ``kind:id``). Adding and removing records through
+the index keeps the state lists and the indexes in step. Search indexes
+for the Pairings, Fusions and Graveyard tabs are built on their first
+query and maintained from then on.
+"""
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from search_index import SearchIndex, fusion_fields, graveyard_fields, pairing_fields
+from storage import RECORD_COLLECTIONS, record_key
+
+SIDES = ("player1", "player2")
+SLOTS = ("a", "b")
+
+# Deletes tolerated before a collection's position hints are recomputed
+REINDEX_AFTER = 64
+
+def fusion_pairing_ids(fusion: Dict[str, Any]) -> Set[str]:
+    return {fusion[side][slot]["pairing_id"] for side in SIDES for slot in SLOTS}
+
+class StateIndex:
+    def __init__(self, state: Dict[str, Any] = None, name_of: Optional[Callable[[int], str]] = None):
+        """``name_of`` maps a species number to its name, for searching the
+        graveyard (whose entries only store numbers)."""
+        self.state: Dict[str, Any] = {}
+        self._search_fields = {
+            "pairings": pairing_fields,
+            "fusions": fusion_fields,
+            "graveyard": partial(graveyard_fields, name_of=name_of),
+        }
+        self._search: Dict[str, SearchIndex] = {}
+        # collection -> record key -> record
+        self.records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # collection -> record key -> list position. Deletes only move records
+        # towards the front, so a stale hint is an upper bound.
+        self._pos: Dict[str, Dict[str, int]] = {}
+        self._deletes: Dict[str, int] = {}
+        # (pairing_id, side) -> ids of fusions using that side of the pairing
+        self.fusion_refs: Dict[Tuple[str, str], Set[str]] = {}
+        if state is not None:
+            self.rebuild(state)
+
+    def rebuild(self, state: Dict[str, Any]) -> None:
+        self.state = state
+        self.records = {coll: {} for coll in RECORD_COLLECTIONS}
+        self._pos = {}
+        for coll in RECORD_COLLECTIONS:
+            for rec in state.get(coll) or []:
+                self.records[coll].setdefault(record_key(coll, rec), rec)
+            self._reindex(coll)
+        self.fusion_refs = {}
+        for f in state.get("fusions", []):
+            self._ref_fusion(f)
+        self._search = {}
+
+    def _reindex(self, coll: str) -> None:
+        pos: Dict[str, int] = {}
+        for i, rec in enumerate(self.state.get(coll) or []):
+            pos.setdefault(record_key(coll, rec), i)
+        self._pos[coll] = pos
+        self._deletes[coll] = 0
+
+    # ----- lookups -----
+
+    def get(self, coll: str, key: str) -> Optional[Dict[str, Any]]:
+        return self.records[coll].get(key)
+
+    def pairing(self, pairing_id: str) -> Optional[Dict[str, Any]]:
+        return self.records["pairings"].get(pairing_id)
+
+    def fusion(self, fusion_id: str) -> Optional[Dict[str, Any]]:
+        return self.records["fusions"].get(fusion_id)
+
+    def team_slot(self, team: str, uid: str) -> Optional[Dict[str, Any]]:
+        return self.records[team].get(uid)
+
+    def fusions_for_pairing(self, pairing_id: str, side: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fusions using the pairing (on ``side`` only, if given), in id order."""
+        fids: Set[str] = set()
+        for s in SIDES if side is None else (side,):
+            fids |= self.fusion_refs.get((pairing_id, s), set())
+        fusions = self.records["fusions"]
+        return [fusions[fid] for fid in sorted(fids) if fid in fusions]
+
+    def search(self, coll: str, q: str) -> Set[str]:
+        """Keys of the records in ``coll`` with ``q`` in a searchable field."""
+        index = self._search.get(coll)
+        if index is None:
+            index = self._search[coll] = SearchIndex(self._search_fields[coll])
+            for key, rec in self.records[coll].items():
+                index.add(key, rec)
+        return index.query(q)
+
+    # ----- mutations -----
+
+    def add(self, coll: str, rec: Dict[str, Any]) -> None:
+        """Append ``rec`` to its collection, replacing a record with the same key."""
+        key = record_key(coll, rec)
+        if key in self.records[coll]:
+            self.remove(coll, key)
+        lst = self.state.setdefault(coll, [])
+        self._pos[coll][key] = len(lst)
+        lst.append(rec)
+        self.records[coll][key] = rec
+        if coll == "fusions":
+            self._ref_fusion(rec)
+        if coll in self._search:
+            self._search[coll].add(key, rec)
+
+    def remove(self, coll: str, key: str) -> Optional[Dict[str, Any]]:
+        """Remove a record by key; returns it, or None if there was none."""
+        rec = self.records[coll].pop(key, None)
+        if rec is None:
+            return None
+        lst = self.state[coll]
+        i = min(self._pos[coll].pop(key, len(lst) - 1), len(lst) - 1)
+        while i >= 0 and lst[i] is not rec:
+            i -= 1
+        if i < 0:
+            # The list was changed behind the index's back; fall back to a scan
+            i = next((j for j, r in enumerate(lst) if r is rec), -1)
+        if i >= 0:
+            del lst[i]
+        self._deletes[coll] += 1
+        if self._deletes[coll] >= REINDEX_AFTER:
+            self._reindex(coll)
+        if coll == "fusions":
+            self._unref_fusion(rec)
+        if coll in self._search:
+            self._search[coll].remove(key)
+        return rec
+
+    def touch(self, coll: str, key: str) -> None:
+        """Re-index a record that was edited in place (e.g. evolved)."""
+        rec = self.records[coll].get(key)
+        if rec is not None and coll in self._search:
+            self._search[coll].add(key, rec)
+
+    # ----- fusion references -----
+
+    def _ref_fusion(self, fusion: Dict[str, Any]) -> None:
+        for side in SIDES:
+            for slot in SLOTS:
+                pid = fusion[side][slot]["pairing_id"]
+                self.fusion_refs.setdefault((pid, side), set()).add(fusion["id"])
+
+    def _unref_fusion(self, fusion: Dict[str, Any]) -> None:
+        for side in SIDES:
+            for slot in SLOTS:
+                pid = fusion[side][slot]["pairing_id"]
+                refs = self.fusion_refs.get((pid, side))
+                if refs is not None:
+                    refs.discard(fusion["id"])
+                    if not refs:
+                        del self.fusion_refs[(pid, side)]
+
+    def is_fused(self, pairing_id: str, side: str) -> bool:
+        return bool(self.fusion_refs.get((pairing_id, side)))
+
+    def refresh_used(self, pairing: Dict[str, Any]) -> bool:
+        """Set the pairing's used flags from the index; True if they changed."""
+        dead = bool(pairing.get("dead"))
+        changed = False
+        for side in SIDES:
+            used = dead or self.is_fused(pairing["id"], side)
+            if pairing[side].get("used") != used:
+                pairing[side]["used"] = used
+                changed = True
+        return changed
+
+def recompute_used_flags(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Full recompute of every pairing's used flags from the fusions list.
+
+    This is the integrity repair step; actions keep the flags current through
+    ``StateIndex``. Returns the pairings whose flags changed.
+    """
+    before = {p["id"]: (p["player1"].get("used"), p["player2"].get("used")) for p in state["pairings"]}
+    for p in state["pairings"]:
+        dead = bool(p.get("dead"))
+        p["player1"]["used"] = dead
+        p["player2"]["used"] = dead
+    pair_by_id = {p["id"]: p for p in state["pairings"]}
+    for f in state["fusions"]:
+        for side in SIDES:
+            for slot in SLOTS:
+                pid = f[side][slot]["pairing_id"]
+                if pid in pair_by_id:
+                    pair_by_id[pid][side]["used"] = True
+    return [
+        p for p in state["pairings"]
+        if before[p["id"]] != (p["player1"]["used"], p["player2"]["used"])
+    ]
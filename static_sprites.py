@@ -0,0 +1,114 @@
+"""Content-hashed copies of the local sprites under static/sprites/.
+
+Streamlit serves static/ with long-lived caching, so each sprite is
+published as ``<stem>.<hash>.png``: new content means a new URL and
+browsers keep their copy across reruns and sessions otherwise. Hashing and
+copying read every file, so it happens ahead of time on a background
+thread (``ensure_in_background``). Rendering only looks a sprite up by its
+path, modification time and size (``static_url``); a sprite that hasn't
+been published yet, or changed since, gets None and the caller inlines it
+instead. Copies of older content are deleted at the next start-up, not
+while pages rendered before might still point at them. Publish ahead of
+time with:
+
+    python static_sprites.py
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from storage import BASE_DIR, Pokedex, load_pokedex
+
+STATIC_SPRITES_DIR = BASE_DIR / "static" / "sprites"
+STATIC_SPRITES_URL_PREFIX = "app/static/sprites"
+
+Stamp = Tuple[int, int]  # (mtime_ns, size)
+
+def _stamp(path) -> Optional[Stamp]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def publish(path: Path) -> Optional[str]:
+    """Copy ``path`` to its content-hashed name under static/sprites/ (if it
+    isn't there already) and return that name; None if it can't be read."""
+    src = Path(path)
+    try:
+        data = src.read_bytes()
+    except OSError:
+        return None
+    name = f"{src.stem}.{hashlib.sha256(data).hexdigest()[:16]}{src.suffix}"
+    target = STATIC_SPRITES_DIR / name
+    if not target.is_file():
+        STATIC_SPRITES_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+    return name
+
+# sprite path as the app spells it -> (stamp when published, published name)
+_published: Dict[str, Tuple[Stamp, str]] = {}
+_pruned = False
+_publish_lock = threading.Lock()
+
+def publish_all(paths: Iterable[Path]) -> int:
+    """Publish the sprites that are new or changed since they were last
+    published; returns how many were. The first call in a process then
+    deletes copies nothing refers to."""
+    global _pruned
+    published = 0
+    with _publish_lock:
+        for path in paths:
+            key = str(path)
+            stamp = _stamp(key)
+            if stamp is None:
+                continue
+            old = _published.get(key)
+            if old is not None and old[0] == stamp:
+                continue
+            name = publish(Path(key))
+            if name is not None:
+                _published[key] = (stamp, name)
+                published += 1
+        if not _pruned:
+            _pruned = True
+            keep = {name for _, name in _published.values()}
+            for stale in STATIC_SPRITES_DIR.glob("*"):
+                if stale.name not in keep:
+                    stale.unlink(missing_ok=True)
+    return published
+
+def sprite_paths(dex: Pokedex) -> List[str]:
+    """The Pokédex's local sprite files, spelled as ``sprite_for`` returns them."""
+    return [s for s in dex.sprites if s and not s.startswith(("http://", "https://", "data:")) and os.path.isfile(s)]
+
+def ensure_in_background(dex: Pokedex) -> threading.Thread:
+    """Run ``publish_all`` on a daemon thread so page loads don't wait."""
+    def run():
+        if _publish_lock.locked():
+            return  # already publishing
+        try:
+            publish_all(sprite_paths(dex))
+        except OSError:
+            pass  # unpublished sprites are inlined instead
+
+    t = threading.Thread(target=run, name="static-sprites", daemon=True)
+    t.start()
+    return t
+
+def static_url(path: str) -> Optional[str]:
+    """URL of the published copy of ``path``, or None if it isn't published
+    or the file has changed since."""
+    entry = _published.get(str(path))
+    if entry is None or entry[0] != _stamp(path):
+        return None
+    return f"{STATIC_SPRITES_URL_PREFIX}/{quote(entry[1])}"
+
+if __name__ == "__main__":
+    n = publish_all(sprite_paths(load_pokedex()))
+    print(f"{n} sprite(s) published to {STATIC_SPRITES_DIR}")
@@ -1,9 +1,17 @@
+import csv
+import hashlib
 import json
+import marshal
 import os
+import sys
 import time
+import weakref
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-import pandas as pd
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Any, List, Mapping, Optional, Tuple, Union
+
+if TYPE_CHECKING:  # pandas is only imported when a DataFrame is asked for
+    import pandas as pd
 
 # Paths
 BASE_DIR = Path(__file__).parent
@@ -13,8 +21,17 @@ POKEDEX_CSV = DATA_DIR / "infinite_fusion_pokedex.csv"
 
 # ---------- Pokedex ----------
 
-def _coerce_int_series(s: pd.Series) -> pd.Series:
-    return pd.to_numeric(s, errors="coerce").astype("Int64")
+def _coerce_int(raw: str) -> Optional[int]:
+    s = raw.strip()
+    try:
+        return int(s)
+    except ValueError:
+        pass
+    try:
+        f = float(s)
+    except ValueError:
+        return None
+    return int(f) if f.is_integer() else None
 
 def _normalize_sprite_path(raw: Optional[str]) -> str:
     if raw is None:
@@ -37,68 +54,376 @@ def _normalize_sprite_path(raw: Optional[str]) -> str:
         return str(p2)
     return ""
 
-def load_pokedex(csv_path: Path = POKEDEX_CSV) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+def load_pokedex(csv_path: Path = POKEDEX_CSV, compiled: bool = True) -> "Pokedex":
+    """Load the Pokedex, from its compiled copy when that is current (see
+    ``read_compiled_pokedex``); otherwise parse the CSV and compile it."""
+    if not compiled:
+        return _parse_pokedex_csv(csv_path)
+    key = pokedex_key(csv_path)
+    dex = read_compiled_pokedex(csv_path, key)
+    if dex is None:
+        dex = _parse_pokedex_csv(csv_path)
+        write_compiled_pokedex(dex, csv_path, key)
+    return dex
+
+def _parse_pokedex_csv(csv_path: Path) -> "Pokedex":
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    header, rows = (rows[0], rows[1:]) if rows else ([], [])
 
     # Flexible column detection
-    lower_map = {c.lower(): c for c in df.columns}
-    num_col = lower_map.get("number") or lower_map.get("#") or list(df.columns)[0]
-    name_col = lower_map.get("name") or list(df.columns)[1]
-    sprite_col = (
-        lower_map.get("sprite")
-        or lower_map.get("sprite_path_or_url")
-        or lower_map.get("sprite_path")
-        or lower_map.get("image")
-        or lower_map.get("image_path")
-        or None
+    lower_map = {c.lower(): i for i, c in enumerate(header)}
+    num_col = lower_map.get("number", lower_map.get("#", 0))
+    name_col = lower_map.get("name", 1)
+    sprite_col = next(
+        (lower_map[c] for c in ("sprite", "sprite_path_or_url", "sprite_path", "image", "image_path") if c in lower_map),
+        None,
     )
     evo_nums_col = lower_map.get("evolves_to_numbers")
     evo_names_col = lower_map.get("evolves_to_names")
 
-    out = pd.DataFrame(
-        {
-            "number": _coerce_int_series(df[num_col]),
-            "name": df[name_col].astype(str),
-        }
-    )
-    out["sprite"] = df[sprite_col].map(_normalize_sprite_path) if sprite_col else ""
-
-    # Preserve evolution columns if present
-    if evo_nums_col in df.columns:
-        out["evolves_to_numbers"] = df[evo_nums_col].astype(str)
-    else:
-        out["evolves_to_numbers"] = ""
-    if evo_names_col in df.columns:
-        out["evolves_to_names"] = df[evo_names_col].astype(str)
-    else:
-        out["evolves_to_names"] = ""
+    def cell(row: List[str], col: Optional[int]) -> str:
+        return row[col] if col is not None and col < len(row) else ""
+
+    numbers, names, sprites, evo_nums, evo_names = [], [], [], [], []
+    for row in rows:
+        number = _coerce_int(cell(row, num_col))
+        if number is None:
+            continue
+        numbers.append(number)
+        names.append(cell(row, name_col))
+        sprites.append(_normalize_sprite_path(cell(row, sprite_col)))
+        # Preserve evolution columns if present
+        evo_nums.append(cell(row, evo_nums_col))
+        evo_names.append(cell(row, evo_names_col))
+    return Pokedex(tuple(numbers), tuple(names), tuple(sprites), tuple(evo_nums), tuple(evo_names))
+
+# ---------- Indexed Pokedex ----------
+
+class Pokedex:
+    """Immutable, number-indexed Pokedex.
+
+    Rows are stored as parallel tuples and ``_row`` maps a Pokedex number to
+    its row position, so every lookup is a single dict probe instead of a
+    boolean mask over the DataFrame. ``frame`` gives the normalized
+    DataFrame for callers that still want pandas; it is built (and pandas
+    imported) on first use.
+    """
+
+    __slots__ = ("numbers", "names", "sprites", "evo_numbers", "evo_names", "_frame", "evolutions", "_row")
+
+    def __init__(
+        self,
+        numbers: Tuple[int, ...],
+        names: Tuple[str, ...],
+        sprites: Tuple[str, ...],
+        evo_numbers: Tuple[str, ...],
+        evo_names: Tuple[str, ...],
+        frame: Optional["pd.DataFrame"] = None,
+        evolutions: Optional["EvolutionGraph"] = None,
+    ):
+        row: Dict[int, int] = {}
+        for i, n in enumerate(numbers):
+            # First row wins, matching the old ``iloc[0]`` behaviour
+            row.setdefault(n, i)
+        set_ = object.__setattr__
+        set_(self, "numbers", numbers)
+        set_(self, "names", names)
+        set_(self, "sprites", sprites)
+        set_(self, "evo_numbers", evo_numbers)
+        set_(self, "evo_names", evo_names)
+        set_(self, "_frame", frame)
+        set_(self, "_row", row)
+        set_(self, "evolutions", evolutions or EvolutionGraph.from_pokedex(self))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Pokedex is immutable")
+
+    def __reduce__(self):
+        return (
+            Pokedex,
+            (self.numbers, self.names, self.sprites, self.evo_numbers, self.evo_names, self._frame),
+        )
 
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, number) -> bool:
+        return self.row_of(number) is not None
+
+    @property
+    def frame(self) -> "pd.DataFrame":
+        if self._frame is None:
+            import pandas as pd
+            object.__setattr__(self, "_frame", pd.DataFrame({
+                "number": pd.array(self.numbers, dtype="Int64"),
+                "name": list(self.names),
+                "sprite": list(self.sprites),
+                "evolves_to_numbers": list(self.evo_numbers),
+                "evolves_to_names": list(self.evo_names),
+            }))
+        return self._frame
+
+    @classmethod
+    def from_frame(cls, df: "pd.DataFrame") -> "Pokedex":
+        """Build from a frame shaped like ``Pokedex.frame``."""
+        import pandas as pd
+
+        def _col(name: str) -> List[str]:
+            if name not in df.columns:
+                return [""] * len(df)
+            return ["" if pd.isna(v) else str(v) for v in df[name]]
+
+        numbers, names, sprites, evo_nums, evo_names = [], [], [], [], []
+        for num, nm, spr, en, enm in zip(
+            df["number"], _col("name"), _col("sprite"),
+            _col("evolves_to_numbers"), _col("evolves_to_names"),
+        ):
+            if pd.isna(num):
+                continue
+            numbers.append(int(num))
+            names.append(nm)
+            sprites.append(spr.strip())
+            evo_nums.append(en)
+            evo_names.append(enm)
+        return cls(tuple(numbers), tuple(names), tuple(sprites), tuple(evo_nums), tuple(evo_names), df)
+
+    def row_of(self, number) -> Optional[int]:
+        try:
+            return self._row.get(int(number))
+        except Exception:
+            return None
+
+    def sprite(self, number) -> str:
+        i = self.row_of(number)
+        return "" if i is None else self.sprites[i]
+
+    def name(self, number) -> str:
+        i = self.row_of(number)
+        return "" if i is None else self.names[i]
+
+def _parse_evolution_numbers(raw: str) -> List[int]:
+    out: List[int] = []
+    for p in raw.split("|"):
+        p = p.strip()
+        try:
+            out.append(int(p))
+        except ValueError:
+            try:
+                out.append(int(p.lstrip("0") or "0"))
+            except Exception:
+                pass
     return out
 
-# ---------- Lookups ----------
+class EvolutionGraph:
+    """Evolution edges parsed once from the Pokedex evolution columns.
+
+    ``forward`` maps a species to its direct ``(number, name)`` evolutions,
+    ``reverse`` to its direct pre-evolutions, ``stage`` to its depth from the
+    base form (0 for base forms) and ``finals`` to the fully evolved forms
+    reachable from it (empty for species that don't evolve). The graph is
+    shared by every session, so the tables are read-only views of private
+    copies.
+    """
+
+    __slots__ = ("forward", "reverse", "stage", "finals")
+
+    def __init__(
+        self,
+        forward: Mapping[int, Tuple[Tuple[int, str], ...]],
+        reverse: Mapping[int, Tuple[int, ...]],
+        stage: Mapping[int, int],
+        finals: Mapping[int, Tuple[int, ...]],
+    ):
+        set_ = object.__setattr__
+        set_(self, "forward", MappingProxyType({n: tuple(map(tuple, e)) for n, e in forward.items()}))
+        set_(self, "reverse", MappingProxyType({n: tuple(p) for n, p in reverse.items()}))
+        set_(self, "stage", MappingProxyType(dict(stage)))
+        set_(self, "finals", MappingProxyType({n: tuple(f) for n, f in finals.items()}))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("EvolutionGraph is immutable")
+
+    def tables(self) -> Tuple[Dict, Dict, Dict, Dict]:
+        """Plain-dict copies of the tables, e.g. for ``marshal``."""
+        return dict(self.forward), dict(self.reverse), dict(self.stage), dict(self.finals)
+
+    def __reduce__(self):
+        return (EvolutionGraph, self.tables())
+
+    @classmethod
+    def from_pokedex(cls, dex: "Pokedex") -> "EvolutionGraph":
+        forward: Dict[int, Tuple[Tuple[int, str], ...]] = {}
+        reverse_lists: Dict[int, List[int]] = {}
+        for n, i in dex._row.items():
+            raw = dex.evo_numbers[i]
+            if not raw.strip():
+                continue
+            nums = _parse_evolution_numbers(raw)
+            rawn = dex.evo_names[i]
+            partsn = [p.strip() for p in rawn.split("|")] if rawn else []
+            edges = []
+            for j, t in enumerate(nums):
+                if j < len(partsn) and partsn[j]:
+                    edges.append((t, partsn[j]))
+                else:
+                    edges.append((t, dex.name(t)))
+                if n not in reverse_lists.setdefault(t, []):
+                    reverse_lists[t].append(n)
+            if edges:
+                forward[n] = tuple(edges)
+        reverse = {t: tuple(srcs) for t, srcs in reverse_lists.items()}
+
+        stage: Dict[int, int] = {}
+        finals: Dict[int, Tuple[int, ...]] = {}
+
+        def _stage(n: int, seen: frozenset) -> int:
+            if n in stage:
+                return stage[n]
+            parents = [p for p in reverse.get(n, ()) if p not in seen]
+            d = 1 + max(_stage(p, seen | {n}) for p in parents) if parents else 0
+            stage[n] = d
+            return d
+
+        def _finals(n: int, seen: frozenset) -> Tuple[int, ...]:
+            if n in finals:
+                return finals[n]
+            out: List[int] = []
+            for t, _ in forward.get(n, ()):
+                if t in seen:
+                    continue
+                below = _finals(t, seen | {n})
+                for f in below or (t,):
+                    if f not in out:
+                        out.append(f)
+            finals[n] = tuple(out)
+            return finals[n]
+
+        for n in set(dex._row) | set(reverse):
+            _stage(n, frozenset())
+            _finals(n, frozenset())
+        return cls(forward, reverse, stage, finals)
+
+    def evolutions(self, number: int) -> Tuple[Tuple[int, str], ...]:
+        return self.forward.get(number, ())
 
-def sprite_for(df: pd.DataFrame, number: int) -> str:
+    def pre_evolutions(self, number: int) -> Tuple[int, ...]:
+        return self.reverse.get(number, ())
+
+    def final_forms(self, number: int) -> Tuple[int, ...]:
+        return self.finals.get(number, ())
+
+    def base_forms(self, number: int) -> List[int]:
+        out: List[int] = []
+        stack, seen = [number], {number}
+        while stack:
+            n = stack.pop()
+            parents = self.reverse.get(n, ())
+            if not parents and n not in out:
+                out.append(n)
+            for p in parents:
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+        return out
+
+    def chain(self, number: int) -> List[int]:
+        """Every species in ``number``'s family, ordered by stage then number."""
+        family, stack = set(), self.base_forms(number)
+        while stack:
+            n = stack.pop()
+            if n in family:
+                continue
+            family.add(n)
+            stack.extend(t for t, _ in self.forward.get(n, ()))
+        return sorted(family, key=lambda n: (self.stage.get(n, 0), n))
+
+# ---------- Compiled Pokedex ----------
+
+# The parsed Pokedex (columns, resolved sprite paths, evolution graph) in
+# one marshal blob next to the CSV, so a start-up is one read instead of a
+# CSV parse, two filesystem probes per sprite and the graph build.
+COMPILED_MAGIC = b"SLDEX\x01"
+COMPILED_SUFFIX = ".compiled"
+
+def _compiled_path(csv_path: Path) -> Path:
+    return Path(csv_path).with_suffix(COMPILED_SUFFIX)
+
+def pokedex_key(csv_path: Path = POKEDEX_CSV) -> bytes:
+    """What the compiled Pokedex depends on: the CSV's bytes, the names in
+    sprites/ (sprite paths resolve to whichever files exist there), where
+    the repo is (resolved paths are absolute) and the marshal format."""
+    h = hashlib.sha256()
+    h.update(Path(csv_path).read_bytes())
+    h.update(f"\0{BASE_DIR}\0{sys.version_info[:2]}\0{marshal.version}\0".encode())
     try:
-        n = int(number)
-    except Exception:
-        return ""
-    row = df.loc[df["number"] == n]
-    if row.empty:
-        return ""
-    return str(row.iloc[0].get("sprite", "")).strip()
+        with os.scandir(BASE_DIR / "sprites") as entries:
+            names = sorted(e.name for e in entries)
+    except OSError:
+        names = []
+    h.update("\0".join(names).encode("utf-8", "surrogateescape"))
+    return h.digest()
 
-def name_for(df: pd.DataFrame, number: int) -> str:
+def write_compiled_pokedex(dex: "Pokedex", csv_path: Path = POKEDEX_CSV, key: Optional[bytes] = None) -> Optional[Path]:
+    """Write the compiled copy of ``dex``; None if it couldn't be written."""
+    key = key or pokedex_key(csv_path)
+    payload = marshal.dumps((
+        dex.numbers, dex.names, dex.sprites, dex.evo_numbers, dex.evo_names,
+        *dex.evolutions.tables(),
+    ))
+    path = _compiled_path(csv_path)
+    tmp = path.with_name(path.name + ".tmp")
     try:
-        n = int(number)
-    except Exception:
-        return ""
-    row = df.loc[df["number"] == n]
-    if row.empty:
-        return ""
-    return str(row.iloc[0]["name"])
+        tmp.write_bytes(COMPILED_MAGIC + key + payload)
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return None
+    return path
+
+def read_compiled_pokedex(csv_path: Path = POKEDEX_CSV, key: Optional[bytes] = None) -> Optional["Pokedex"]:
+    """The compiled Pokedex if it exists and matches ``key``, else None."""
+    key = key or pokedex_key(csv_path)
+    try:
+        data = _compiled_path(csv_path).read_bytes()
+    except OSError:
+        return None
+    head = len(COMPILED_MAGIC)
+    if data[:head] != COMPILED_MAGIC or data[head:head + len(key)] != key:
+        return None
+    try:
+        numbers, names, sprites, evo_numbers, evo_names, forward, reverse, stage, finals = (
+            marshal.loads(data[head + len(key):])
+        )
+    except (EOFError, ValueError, TypeError):
+        return None
+    graph = EvolutionGraph(forward, reverse, stage, finals)
+    return Pokedex(numbers, names, sprites, evo_numbers, evo_names, evolutions=graph)
+
+# Last DataFrame passed to a lookup, so legacy callers only pay the index build once
+_frame_index: Optional[Tuple[weakref.ref, Pokedex]] = None
 
-def search_options(df: pd.DataFrame) -> List[str]:
-    return [f"{int(n):03d} - {nm}" for n, nm in zip(df["number"].fillna(0), df["name"])]
+def _as_pokedex(df: Union[Pokedex, "pd.DataFrame"]) -> Pokedex:
+    global _frame_index
+    if isinstance(df, Pokedex):
+        return df
+    if _frame_index is not None and _frame_index[0]() is df:
+        return _frame_index[1]
+    dex = Pokedex.from_frame(df)
+    _frame_index = (weakref.ref(df), dex)
+    return dex
+
+# ---------- Lookups ----------
+
+def sprite_for(df: Union[Pokedex, "pd.DataFrame"], number: int) -> str:
+    return _as_pokedex(df).sprite(number)
+
+def name_for(df: Union[Pokedex, "pd.DataFrame"], number: int) -> str:
+    return _as_pokedex(df).name(number)
+
+def search_options(df: Union[Pokedex, "pd.DataFrame"]) -> List[str]:
+    dex = _as_pokedex(df)
+    return [f"{n:03d} - {nm}" for n, nm in zip(dex.numbers, dex.names)]
 
 def parse_number_from_option(option: str) -> Optional[int]:
     if not option:
@@ -111,6 +436,11 @@ def parse_number_from_option(option: str) -> Optional[int]:
 
 # ---------- State ----------
 
+# "json" rewrites state.json on every save; "journal" appends each change to
+# state.journal and folds it into state.json once it grows past a threshold;
+# "sqlite" keeps the run in state.sqlite3, seeded from state.json on first use.
+STATE_BACKEND = os.environ.get("SOULLINK_STORAGE", "json").strip().lower()
+
 def _default_state() -> Dict[str, Any]:
     return {
         "pairings": [],
@@ -120,17 +450,16 @@ def _default_state() -> Dict[str, Any]:
         "updated_at": None,
     }
 
-def load_state() -> Dict[str, Any]:
+def _load_json_state(path: Path) -> Optional[Dict[str, Any]]:
     try:
-        if STATE_PATH.is_file():
-            with STATE_PATH.open("r", encoding="utf-8") as f:
+        if path.is_file():
+            with path.open("r", encoding="utf-8") as f:
                 return json.load(f)
     except Exception:
         pass
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    return _default_state()
+    return None
 
-def save_state(state: Dict[str, Any]) -> None:
+def _save_json_state(state: Dict[str, Any], path: Path, fsync: bool = False) -> None:
     """
     Cross-platform safe save.
     1) Write to temp file.
@@ -138,17 +467,20 @@ def save_state(state: Dict[str, Any]) -> None:
     3) Retry on PermissionError (Windows file locks).
     4) Fallback to direct write if needed.
     """
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    tmp = STATE_PATH.with_suffix(".json.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
 
     # Write temp
     with tmp.open("w", encoding="utf-8") as f:
         json.dump(state, f, ensure_ascii=False, indent=2)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
 
     # Atomic replace with retries
     for attempt in range(6):
         try:
-            os.replace(tmp, STATE_PATH)  # atomic on Linux and Windows
+            os.replace(tmp, path)  # atomic on Linux and Windows
             return
         except PermissionError:
             time.sleep(0.25 * (attempt + 1))
@@ -157,7 +489,7 @@ def save_state(state: Dict[str, Any]) -> None:
 
     # Fallback direct write
     try:
-        with STATE_PATH.open("w", encoding="utf-8") as f:
+        with path.open("w", encoding="utf-8") as f:
             json.dump(state, f, ensure_ascii=False, indent=2)
     finally:
         try:
@@ -165,6 +497,126 @@ def save_state(state: Dict[str, Any]) -> None:
         except Exception:
             pass
 
+def _journal():
+    from journal import journal_for
+    return journal_for(STATE_PATH)
+
+def _sqlite():
+    from sqlite_store import store_for
+    return store_for(STATE_PATH.with_suffix(".sqlite3"), STATE_PATH)
+
+def state_files() -> List[Path]:
+    """Files the current backend keeps the run in."""
+    if STATE_BACKEND == "journal":
+        return [STATE_PATH, STATE_PATH.with_suffix(".journal")]
+    if STATE_BACKEND == "sqlite":
+        db = STATE_PATH.with_suffix(".sqlite3")
+        return [db, db.with_name(db.name + "-wal")]
+    return [STATE_PATH]
+
+def load_state() -> Dict[str, Any]:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if STATE_BACKEND == "journal":
+        return _journal().load()
+    if STATE_BACKEND == "sqlite":
+        store = _sqlite()
+        return _default_state() if store.is_empty() else store.load()
+    return _load_json_state(STATE_PATH) or _default_state()
+
+def save_state(state: Dict[str, Any]) -> None:
+    """Write the whole state (in journal mode: a fresh snapshot, emptying the journal)."""
+    if STATE_BACKEND == "journal":
+        _journal().compact(state)
+        return
+    if STATE_BACKEND == "sqlite":
+        _sqlite().replace(state)
+        return
+    _save_json_state(state, STATE_PATH)
+
+def save_changes(state: Dict[str, Any], ops: List[Dict[str, Any]]) -> None:
+    """Persist one UI action described by change ops (see ``op_put`` and friends).
+
+    The JSON backend still rewrites the whole file; the journal backend only
+    appends ``ops`` and the SQLite backend applies them in one transaction.
+    """
+    if STATE_BACKEND == "journal":
+        if ops:
+            _journal().append(ops, state)
+        return
+    if STATE_BACKEND == "sqlite":
+        if ops:
+            _sqlite().apply(ops)
+        return
+    _save_json_state(state, STATE_PATH)
+
+# ---------- Snapshots ----------
+
+def export_snapshot(dest, compression: str = "gzip", state: Optional[Dict[str, Any]] = None) -> int:
+    """Write the run (by default the saved one) to ``dest`` as a compressed
+    JSON-lines snapshot (see ``snapshot``). Returns the number of records."""
+    from snapshot import write_snapshot
+    return write_snapshot(load_state() if state is None else state, dest, compression)
+
+def import_snapshot(src, save: bool = True) -> Dict[str, Any]:
+    """Read a snapshot written by ``export_snapshot``; with ``save``, it
+    replaces the saved run in the current backend."""
+    from snapshot import read_snapshot
+    state = read_snapshot(src)
+    if save:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        save_state(state)
+    return state
+
+# ---------- Change ops ----------
+
+# Collections of records in the state, and how each record is keyed
+RECORD_COLLECTIONS = ("pairings", "fusions", "graveyard", "player1_team", "player2_team")
+
+def record_key(coll: str, rec: Dict[str, Any]) -> str:
+    if coll == "graveyard":
+        return f'{rec.get("kind")}:{rec.get("id")}'
+    if coll in ("player1_team", "player2_team"):
+        return str(rec.get("uid"))
+    return str(rec.get("id"))
+
+def op_put(coll: str, rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert or replace a record (new records go to the end of the list)."""
+    return {"o": "put", "c": coll, "v": rec}
+
+def op_del(coll: str, key: str) -> Dict[str, Any]:
+    return {"o": "del", "c": coll, "k": key}
+
+def op_set(field: str, value: Any) -> Dict[str, Any]:
+    """Set a top-level scalar such as ``next_pair_id``."""
+    return {"o": "set", "f": field, "v": value}
+
+def apply_ops(state: Dict[str, Any], batches) -> Dict[str, Any]:
+    """Apply batches of ops to ``state`` in place and return it.
+
+    Ops are idempotent, so replaying a batch that is already reflected in
+    ``state`` leaves it unchanged.
+    """
+    keyed: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _coll(c: str) -> Dict[str, Dict[str, Any]]:
+        if c not in keyed:
+            keyed[c] = {record_key(c, r): r for r in state.get(c, [])}
+        return keyed[c]
+
+    for ops in batches:
+        for op in ops:
+            kind = op.get("o")
+            if kind == "put":
+                c = op["c"]
+                _coll(c)[record_key(c, op["v"])] = op["v"]
+            elif kind == "del":
+                _coll(op["c"]).pop(op["k"], None)
+            elif kind == "set":
+                state[op["f"]] = op["v"]
+    for c, recs in keyed.items():
+        state[c] = list(recs.values())
+    return state
+
 # ---------- External links ----------
 
 def _slugify_name(name: str) -> str:
@@ -184,43 +636,30 @@ def _slugify_name(name: str) -> str:
 def pokemondb_url(name: str) -> str:
     return f"https://pokemondb.net/pokedex/{_slugify_name(name)}"
 
-def _colmap(df):
-    return {c.lower(): c for c in df.columns}
-
-def get_evolutions(df: pd.DataFrame, number: int):
-    """Read evolutions from optional CSV columns:
-    'evolves_to_numbers' and 'evolves_to_names'."""
-    row = df.loc[df["number"] == number]
-    if row.empty:
+def get_evolutions(df: Union[Pokedex, "pd.DataFrame"], number: int) -> List[Tuple[int, str]]:
+    """Direct evolutions as ``(number, name)`` pairs, read from the evolution
+    graph precompiled from the 'evolves_to_numbers' and 'evolves_to_names'
+    CSV columns."""
+    try:
+        n = int(number)
+    except Exception:
         return []
-    cols = _colmap(df)
-    num_col = cols.get("evolves_to_numbers")
-    name_col = cols.get("evolves_to_names")
-    if not num_col or num_col not in df.columns:
+    return list(_as_pokedex(df).evolutions.evolutions(n))
+
+def get_final_forms(df: Union[Pokedex, "pd.DataFrame"], number: int) -> List[Tuple[int, str]]:
+    """Fully evolved forms reachable from ``number`` (empty if it doesn't evolve)."""
+    dex = _as_pokedex(df)
+    try:
+        n = int(number)
+    except Exception:
         return []
-    raw = row.iloc[0][num_col]
-    nums_raw = str(raw) if pd.notna(raw) else ""
-    if not nums_raw.strip():
+    return [(f, dex.name(f)) for f in dex.evolutions.final_forms(n)]
+
+def get_evolution_chain(df: Union[Pokedex, "pd.DataFrame"], number: int) -> List[Tuple[int, str]]:
+    """The whole evolution family of ``number``, base forms first."""
+    dex = _as_pokedex(df)
+    try:
+        n = int(number)
+    except Exception:
         return []
-    parts = [p.strip() for p in nums_raw.split("|")]
-    out_nums: List[int] = []
-    for p in parts:
-        try:
-            out_nums.append(int(p))
-        except ValueError:
-            try:
-                out_nums.append(int(p.lstrip("0") or "0"))
-            except Exception:
-                pass
-    names: List[str] = []
-    if name_col and name_col in df.columns:
-        rawn = row.iloc[0][name_col]
-        partsn = [p.strip() for p in str(rawn).split("|")] if pd.notna(rawn) else []
-        for i, n in enumerate(out_nums):
-            if i < len(partsn) and partsn[i]:
-                names.append(partsn[i])
-            else:
-                names.append(name_for(df, n))
-    else:
-        names = [name_for(df, n) for n in out_nums]
-    return list(zip(out_nums, names))
+    return [(m, dex.name(m)) for m in dex.evolutions.chain(n)]
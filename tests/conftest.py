@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+import storage  # noqa: E402
+import write_behind  # noqa: E402
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Point the state files at a temporary directory (JSON backend)."""
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(storage, "STATE_PATH", tmp_path / "state.json")
+    monkeypatch.setattr(storage, "STATE_BACKEND", "json")
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def dex():
+    return storage.load_pokedex()
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """A fresh process-wide write-behind writer that writes immediately."""
+    w = write_behind.WriteBehind(delay=0)
+    monkeypatch.setattr(write_behind, "_writer", w)
+    return w
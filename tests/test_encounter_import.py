@@ -0,0 +1,110 @@
+import pytest
+
+from encounter_import import RowError, apply_import, plan_import, read_encounters
+from state_index import StateIndex
+
+
+def empty_state():
+    return {"pairings": [], "fusions": [], "graveyard": [], "next_pair_id": 5, "next_fusion_id": 2}
+
+
+def plan(dex, text, filename="", state=None):
+    return plan_import(read_encounters(text, filename), dex, state or empty_state())
+
+
+@pytest.mark.parametrize("text,errors", [
+    ("p1,p2,encounter\nPikachu,Bulbasaur,Route 1\n", []),
+    ("p1,p2,encounter\nPikachu,Missingno,Route 1\n", [RowError(1, "Unknown Player 2 species 'Missingno'")]),
+    ("p1,p2,encounter\n999,1,Route 1\n", [RowError(1, "Unknown Player 1 species '999'")]),
+    ("p1,p2,encounter\n,1,Route 1\n", [RowError(1, "Player 1 species is empty")]),
+    ("p1,p2,encounter\n1,4,\n", [RowError(1, "Encounter is empty")]),
+    ("p1,p2,encounter,status\n1,4,Route 1,boxed\n", [RowError(1, "Unknown status 'boxed'")]),
+    ("p1,p2,encounter,status,fusion\n1,4,Route 1,dead,x\n7,10,Route 2,,x\n",
+     [RowError(1, "A pairing in the graveyard can't be fused")]),
+    ("p1,p2,encounter,fusion\n1,4,Route 1,x\n7,10,Route 2,y\n25,1,Route 3,y\n",
+     [RowError(1, "Fusion tag 'x' must be on exactly two rows, not 1")]),
+    ("p1,p2,encounter,fusion\n1,4,A,x\n7,10,B,x\n25,1,C,x\n",
+     [RowError(i, "Fusion tag 'x' must be on exactly two rows, not 3") for i in (1, 2, 3)]),
+    ("p1,p2,encounter\nBulbasaur,Mewthree,Route 1\n1,4,\nCharmander,#025,Route 3\n",
+     [RowError(1, "Unknown Player 2 species 'Mewthree'"), RowError(2, "Encounter is empty")]),
+    ("player,p2,route\n1,4,Route 1\n", [RowError(0, "Missing column(s): p1")]),
+])
+def test_row_errors(dex, text, errors):
+    result = plan(dex, text)
+    assert result.errors == errors
+    assert result.ok == (not errors)
+    if errors:
+        assert result.pairings == result.graveyard == result.fusions == []
+
+
+@pytest.mark.parametrize("text,filename", [
+    ("[]", "encounters.json"),
+    ('{"encounters": []}', "encounters.json"),
+    ("p1,p2,encounter\n", "encounters.csv"),
+    ("route,notes\n", "encounters.csv"),
+])
+def test_nothing_to_import(dex, text, filename):
+    result = plan(dex, text, filename)
+    assert result.rows == 0 and result.errors == [] and not result.ok
+
+
+def test_species_by_number_or_name(dex):
+    result = plan(dex, "P1 Species,player-2,Location\n#025,mr. mime,A\n025 - Pikachu,BULBASAUR,B\n")
+    assert [(p["player1"]["number"], p["player2"]["number"]) for p in result.pairings] == [(25, 122), (25, 1)]
+    assert result.pairings[0]["player2"]["name"] == "Mr. Mime"
+
+
+def test_plan_ids_graveyard_and_fusions(dex):
+    text = (
+        "p1,p2,encounter,status,fusion\n"
+        "1,4,Route 1,,pair\n"
+        "7,10,Route 2,dead,\n"
+        "25,1,Route 3,alive,\n"
+        "Pikachu,Charmander,Route 4,,pair\n"
+    )
+    result = plan(dex, text)
+    assert result.ok and result.rows == 4
+    assert [p["id"] for p in result.pairings] == ["P0005", "P0007", "P0008"]
+    assert [(p["player1"]["used"], p["player2"]["used"]) for p in result.pairings] == [(True, True), (False, False), (True, True)]
+    assert result.graveyard == [{
+        "kind": "pairing", "id": "P0006", "player1": {"number": 7}, "player2": {"number": 10},
+        "created_at": result.graveyard[0]["created_at"],
+    }]
+    (fusion,) = result.fusions
+    assert fusion["id"] == "F0002"
+    assert fusion["player1"]["a"] == {"pairing_id": "P0005", "number": 1, "name": "Bulbasaur"}
+    assert fusion["player1"]["b"] == {"pairing_id": "P0008", "number": 25, "name": "Pikachu"}
+    assert fusion["player2"]["b"] == {"pairing_id": "P0008", "number": 4, "name": "Charmander"}
+    assert (result.next_pair_id, result.next_fusion_id) == (9, 3)
+
+
+def test_json_rows(dex):
+    text = '[{"p1": 1, "p2": "Charmander", "encounter": "Route 1"}, {"p1": "7", "p2": null, "encounter": "Route 2"}]'
+    result = plan(dex, text, "run.json")
+    assert result.errors == [RowError(2, "Player 2 species is empty")]
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_apply(dex, use_index):
+    state = empty_state()
+    result = plan(dex, "p1,p2,encounter,status,fusion\n1,4,A,,f\n7,10,B,,f\n25,1,C,dead,\n", state=state)
+    index = StateIndex(state) if use_index else None
+    ops = apply_import(result, state, index)
+    assert [p["id"] for p in state["pairings"]] == ["P0005", "P0006"]
+    assert [g["id"] for g in state["graveyard"]] == ["P0007"]
+    assert [f["id"] for f in state["fusions"]] == ["F0002"]
+    assert (state["next_pair_id"], state["next_fusion_id"]) == (8, 3)
+    assert [(op["o"], op.get("c", op.get("f"))) for op in ops] == [
+        ("put", "pairings"), ("put", "pairings"), ("put", "graveyard"), ("put", "fusions"),
+        ("set", "next_pair_id"), ("set", "next_fusion_id"),
+    ]
+    if use_index:
+        assert index.get("pairings", "P0006")["player1"]["number"] == 7
+
+
+def test_apply_refuses_a_plan_with_errors(dex):
+    state = empty_state()
+    result = plan(dex, "p1,p2,encounter\n1,Missingno,A\n", state=state)
+    with pytest.raises(ValueError):
+        apply_import(result, state)
+    assert state == empty_state()
@@ -0,0 +1,108 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import fusion_index
+from fusion_index import MAGIC, FusionIndex, read_index, sprite_known_missing, write_index
+
+SIZE = 12
+
+
+@pytest.fixture
+def sprites(tmp_path):
+    """A small CustomBattlers-style folder and a list file of names."""
+    folder = tmp_path / "CustomBattlers"
+    (folder / "1").mkdir(parents=True)
+    for name in ("1/1.4.png", "1/1.7a.png", "4.1.png", "12.12.png"):
+        (folder / name).write_bytes(b"png")
+    for junk in ("1.2.3.png", "notes.png", "13.1.png"):  # triple fusion, not a fusion, out of range
+        (folder / junk).write_bytes(b"png")
+    (folder / "5.6.txt").write_text("not a sprite", encoding="utf-8")
+    listing = tmp_path / "names.txt"
+    listing.write_text("https://example.org/sprites/7.3.png\n\n10.2b\n", encoding="utf-8")
+    return folder, listing
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    """Point the process-wide index at a temporary manifest, reloaded fresh."""
+    path = tmp_path / "custom_sprites.bits"
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(fusion_index, "FUSION_INDEX_PATH", path)
+    monkeypatch.setattr(fusion_index, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(fusion_index, "_index", None)
+    monkeypatch.setattr(fusion_index, "_index_mtime", None)
+    monkeypatch.setattr(fusion_index, "_checked_at", float("-inf"))
+    return path, clock
+
+
+def test_build_from_local_sprites(sprites, manifest):
+    path, _ = manifest
+    assert fusion_index.main([str(s) for s in sprites] + ["--size", str(SIZE)]) == 0
+    index = read_index(path)
+    assert sorted(index.pairs()) == [(1, 4), (1, 7), (4, 1), (7, 3), (10, 2), (12, 12)]
+    assert not sprite_known_missing(1, 4)
+    assert not sprite_known_missing(10, 2)
+    assert sprite_known_missing(4, 4)
+    assert sprite_known_missing(1, 2)  # only the triple fusion 1.2.3 exists
+    assert sprite_known_missing(13, 1)  # beyond the manifest's species
+
+
+def test_array_queries_match_lookups():
+    pairs = {(1, 4), (1, 7), (4, 1), (12, 12), (9, 9)}
+    index = FusionIndex.from_pairs(SIZE, pairs)
+    heads, bodies = np.meshgrid(np.arange(0, SIZE + 2), np.arange(0, SIZE + 2), indexing="ij")
+    expected = np.vectorize(index.has_custom_sprite)(heads, bodies)
+    assert (index.has_custom_sprites(heads, bodies) == expected).all()
+    assert expected.sum() == len(index) == len(pairs)
+    assert list(index.bodies_for(1)) == [4, 7] and list(index.heads_for(1)) == [4]
+
+
+def test_merge_keeps_existing_fusions(sprites, manifest):
+    path, _ = manifest
+    write_index(FusionIndex.from_pairs(SIZE, [(2, 2)]), path)
+    assert fusion_index.main([str(sprites[1]), "--size", str(SIZE), "--merge"]) == 0
+    assert sorted(read_index(path).pairs()) == [(2, 2), (7, 3), (10, 2)]
+    assert fusion_index.main([str(sprites[1]), "--size", str(SIZE + 1), "--merge"]) == 1
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"PNG\x00not an index",
+    MAGIC,  # no size
+    MAGIC + b"\x00\x0c" + bytes(10),  # 12 species need 24 bytes of bits
+    MAGIC + b"\x00\x0c" + bytes(25),
+    b"SLFIX\x02" + b"\x00\x0c" + bytes(24),  # another format version
+])
+def test_rejects_foreign_or_wrong_size_files(tmp_path, data):
+    path = tmp_path / "custom_sprites.bits"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        FusionIndex.from_bytes(data)
+    assert read_index(path) is None
+
+
+def test_no_manifest_means_unknown(manifest):
+    assert fusion_index.get_fusion_index() is None
+    assert not sprite_known_missing(1, 2)  # ask the CDN
+
+
+def test_rebuilt_manifest_is_picked_up_after_the_interval(manifest):
+    path, clock = manifest
+    write_index(FusionIndex.from_pairs(SIZE, [(1, 2)]), path)
+    assert not sprite_known_missing(1, 2) and sprite_known_missing(3, 4)
+
+    write_index(FusionIndex.from_pairs(SIZE, [(3, 4)]), path)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    clock.now += fusion_index.RELOAD_INTERVAL - 1
+    assert not sprite_known_missing(1, 2)  # still the old one
+
+    clock.now += 1
+    assert sprite_known_missing(1, 2) and not sprite_known_missing(3, 4)
+
+    path.unlink()
+    clock.now += fusion_index.RELOAD_INTERVAL
+    assert fusion_index.get_fusion_index() is None
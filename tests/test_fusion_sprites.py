@@ -0,0 +1,126 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import fusion_index
+import fusion_sprites
+from fusion_index import FusionIndex, write_index
+from fusion_sprites import MISS_TTL, FusionSpriteCache
+
+
+class FakeFetcher:
+    """Serves ``size`` bytes per fusion, None for ``missing``; counts calls."""
+
+    def __init__(self, size=100, missing=()):
+        self.size = size
+        self.missing = set(missing)
+        self.calls = []
+
+    def __call__(self, head, body):
+        self.calls.append((head, body))
+        if (head, body) in self.missing:
+            return None
+        return bytes([head % 256]) * self.size
+
+
+@pytest.fixture
+def no_manifest(tmp_path, monkeypatch):
+    """No sprite index, so only fetches decide what's missing."""
+    monkeypatch.setattr(fusion_index, "FUSION_INDEX_PATH", tmp_path / "no-manifest.bits")
+    monkeypatch.setattr(fusion_index, "_index", None)
+    monkeypatch.setattr(fusion_index, "_index_mtime", None)
+    monkeypatch.setattr(fusion_index, "_checked_at", float("-inf"))
+
+
+@pytest.fixture
+def make_cache(tmp_path, no_manifest):
+    caches = []
+
+    def make(fetcher, max_bytes=1000):
+        cache = FusionSpriteCache(tmp_path / "fusions", fetcher=fetcher, max_bytes=max_bytes, workers=1)
+        caches.append(cache)
+        return cache
+    yield make
+    for cache in caches:
+        cache.shutdown()
+
+
+def test_fetches_once_and_serves_from_disk(make_cache):
+    fetcher = FakeFetcher()
+    cache = make_cache(fetcher)
+    path = cache.fetch_now(1, 2)
+    assert path.read_bytes() == b"\x01" * 100
+    assert cache.fetch_now(1, 2) == path and cache.get(1, 2) == path
+    assert fetcher.calls == [(1, 2)]
+    assert cache.prefetch([(1, 2)]) == {}
+
+
+def test_lru_eviction_by_byte_budget(make_cache):
+    cache = make_cache(FakeFetcher(size=100), max_bytes=250)
+    first, second = cache.fetch_now(1, 1), cache.fetch_now(2, 2)
+    assert cache.get(1, 1)  # (1, 1) is now the most recently used
+    cache.fetch_now(3, 3)
+    assert (1, 1) in cache and (3, 3) in cache and (2, 2) not in cache
+    assert first.exists() and not second.exists()
+    assert cache.total_bytes == 200 and cache.stats["evicted"] == 1
+
+
+def test_budget_applies_to_what_is_already_on_disk(make_cache, tmp_path):
+    folder = tmp_path / "fusions"
+    folder.mkdir()
+    for age, name in enumerate(("3.3.png", "2.2.png", "1.1.png", "notes.png")):
+        path = folder / name
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1_000_000 - age, 1_000_000 - age))  # 3.3 newest
+    cache = make_cache(FakeFetcher(), max_bytes=250)
+    assert [key for key in ((1, 1), (2, 2), (3, 3)) if key in cache] == [(2, 2), (3, 3)]
+    assert not (folder / "1.1.png").exists() and (folder / "notes.png").exists()
+
+
+def test_a_sprite_over_budget_is_still_kept(make_cache):
+    cache = make_cache(FakeFetcher(size=500), max_bytes=250)
+    assert cache.fetch_now(1, 1) is not None
+    cache.fetch_now(2, 2)
+    assert (1, 1) not in cache and (2, 2) in cache
+
+
+def test_failed_fetches_are_retried_after_the_miss_ttl(make_cache, monkeypatch):
+    clock = SimpleNamespace(now=5000.0)
+    monkeypatch.setattr(fusion_sprites, "time", SimpleNamespace(time=lambda: clock.now))
+    fetcher = FakeFetcher(missing={(4, 5)})
+    cache = make_cache(fetcher)
+    assert cache.fetch_now(4, 5) is None
+    assert cache.is_missing(4, 5) and cache.stats["failed"] == 1
+
+    clock.now += MISS_TTL - 1
+    assert cache.prefetch([(4, 5)]) == {} and cache.fetch_now(4, 5) is None
+    assert fetcher.calls == [(4, 5)]
+
+    clock.now += 1
+    fetcher.missing.clear()
+    assert not cache.is_missing(4, 5)
+    assert cache.fetch_now(4, 5) is not None and not cache.is_missing(4, 5)
+    assert fetcher.calls == [(4, 5), (4, 5)]
+
+
+def test_fetcher_errors_count_as_misses(make_cache):
+    def broken(head, body):
+        raise OSError("CDN unreachable")
+    cache = make_cache(broken)
+    assert cache.fetch_now(1, 2) is None and cache.is_missing(1, 2)
+
+
+def test_sprite_index_short_circuits_fetches(make_cache, tmp_path, monkeypatch):
+    manifest = tmp_path / "custom_sprites.bits"
+    write_index(FusionIndex.from_pairs(10, [(1, 2)]), manifest)
+    monkeypatch.setattr(fusion_index, "FUSION_INDEX_PATH", manifest)
+    fetcher = FakeFetcher()
+    cache = make_cache(fetcher)
+    assert cache.is_missing(2, 1) and not cache.is_missing(1, 2)
+    queued = cache.prefetch([(2, 1), (1, 2), (3, 3)])
+    assert set(queued) == {(1, 2)}
+    assert cache.fetch_now(3, 3) is None
+    for fut in queued.values():
+        fut.result()
+    assert fetcher.calls == [(1, 2)]
@@ -0,0 +1,71 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import fusion_synth
+from fusion_synth import rendered, synth_path
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def draw_sprite(path, colour):
+    im = Image.new("RGBA", (32, 32))
+    for x in range(8, 24):
+        for y in range(4, 30):
+            im.putpixel((x, y), colour + (255,))
+    im.save(path)
+
+
+@pytest.fixture
+def local_dex(tmp_path, monkeypatch):
+    """Two local base sprites, and a fresh renderer writing under tmp_path."""
+    monkeypatch.setattr(fusion_synth, "SYNTH_DIR", tmp_path / "fusion_synth")
+    monkeypatch.setattr(fusion_synth, "_pending", {})
+    monkeypatch.setattr(fusion_synth, "_worker", None)
+    monkeypatch.setattr(fusion_synth, "_pruned", False)
+    sprites = {1: tmp_path / "1.png", 4: tmp_path / "4.png"}
+    draw_sprite(sprites[1], (40, 160, 60))
+    draw_sprite(sprites[4], (230, 120, 40))
+    return SimpleNamespace(sprite=lambda n: str(sprites[n]) if n in sprites else "")
+
+
+def test_a_miss_is_rendered_in_the_background(local_dex, monkeypatch):
+    gate = threading.Event()
+    real = fusion_synth.prerender
+
+    def held(d, keys, **kwargs):
+        gate.wait(5)
+        return real(d, keys, **kwargs)
+    monkeypatch.setattr(fusion_synth, "prerender", held)
+
+    assert rendered(local_dex, 1, 4) is None  # the placeholder meanwhile
+    worker = fusion_synth._worker
+    assert rendered(local_dex, 1, 4) is None
+    assert not synth_path(local_dex, 1, 4).exists()
+    gate.set()
+    worker.join(30)
+    assert rendered(local_dex, 1, 4) == synth_path(local_dex, 1, 4)
+    assert synth_path(local_dex, 1, 4).is_file()
+    assert fusion_synth._worker is None
+
+
+def test_pairs_without_local_sprites_are_not_queued(local_dex):
+    assert rendered(local_dex, 1, 99) is None
+    assert fusion_synth._worker is None and fusion_synth._pending == {}
+
+
+def test_start_up_deletes_renders_of_an_older_version(local_dex, monkeypatch):
+    monkeypatch.setattr(fusion_synth, "SYNTH_VERSION", "0")
+    fusion_synth.prerender(local_dex, [(1, 4)])
+    old = synth_path(local_dex, 1, 4)
+    monkeypatch.setattr(fusion_synth, "SYNTH_VERSION", "1")
+    fusion_synth.prerender(local_dex, [(4, 1)])
+    current = synth_path(local_dex, 4, 1)
+    assert old.is_file() and old.name != synth_path(local_dex, 1, 4).name
+    unrelated = fusion_synth.SYNTH_DIR / "notes.png"
+    unrelated.write_bytes(b"")
+
+    fusion_synth.prerender_in_background(local_dex, []).join(30)
+    assert not old.exists()
+    assert current.is_file() and unrelated.is_file()
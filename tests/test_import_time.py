@@ -0,0 +1,31 @@
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from bench_import_time import BUDGETS_MS, HEAVY, ROOT, import_profile
+
+# Budgets are for a developer machine; CI and shared runners are slower, so
+# they're loosened by default. SOULLINK_IMPORT_BUDGET_SCALE tightens (1) or
+# loosens them further.
+BUDGET_SCALE = float(os.environ.get("SOULLINK_IMPORT_BUDGET_SCALE", 3.0))
+
+
+def heavy_after_import(module):
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return out.stdout.split()
+
+
+@pytest.mark.parametrize("module", list(BUDGETS_MS))
+def test_core_modules_skip_heavy_packages(module):
+    assert heavy_after_import(module) == []
+
+
+@pytest.mark.parametrize("module", list(BUDGETS_MS))
+def test_import_time_budget(module):
+    import_profile(module)  # warm-up: writes the bytecode cache
+    median = statistics.median(import_profile(module)[0] for _ in range(5))
+    assert median <= BUDGETS_MS[module] * BUDGET_SCALE
@@ -0,0 +1,71 @@
+import random
+import signal
+import subprocess
+import sys
+import time
+
+from conftest import ROOT
+from journal import Journal
+from storage import op_put, op_set
+
+KILLS = 8
+
+# Appends one pairing per batch forever, compacting every ~20 KB
+WRITER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from journal import Journal
+from storage import op_put, op_set
+j = Journal(sys.argv[2], compact_bytes=20000)
+state = j.load()
+state.setdefault("next_pair_id", 1)
+print("ready", flush=True)
+while True:
+    i = state["next_pair_id"]
+    rec = {"id": f"P{i:05d}", "player1": {"number": 1, "name": "x" * 200, "used": False},
+           "player2": {"number": 2, "name": "y", "used": False}}
+    state["pairings"].append(rec)
+    state["next_pair_id"] = i + 1
+    j.append([op_put("pairings", rec), op_set("next_pair_id", i + 1)], state)
+"""
+
+
+def assert_gap_free(state):
+    ids = [p["id"] for p in state["pairings"]]
+    assert ids == [f"P{i:05d}" for i in range(1, len(ids) + 1)]
+    assert state.get("next_pair_id", 1) == len(ids) + 1
+    return len(ids)
+
+
+def test_killed_writer_leaves_a_gap_free_prefix(tmp_path):
+    snapshot = tmp_path / "state.json"
+    rng = random.Random(0)
+    last = 0
+    for _ in range(KILLS):
+        child = subprocess.Popen([sys.executable, "-c", WRITER, str(ROOT), str(snapshot)],
+                                 stdout=subprocess.PIPE, text=True)
+        assert child.stdout.readline().strip() == "ready"
+        time.sleep(rng.uniform(0.05, 0.3))
+        assert child.poll() is None
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        child.stdout.close()
+        n = assert_gap_free(Journal(snapshot).load())
+        assert n >= last  # nothing fsynced before the kill is lost
+        last = n
+    assert last > 0
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    snapshot = tmp_path / "state.json"
+    j = Journal(snapshot)
+    for i in range(1, 4):
+        rec = {"id": f"P{i:05d}", "player1": {"number": 1, "name": "a", "used": False},
+               "player2": {"number": 2, "name": "b", "used": False}}
+        j.append([op_put("pairings", rec), op_set("next_pair_id", i + 1)])
+    whole = j.path.read_bytes()
+    with j.path.open("ab") as f:
+        f.write(b'{"t":1,"ops":[{"o":"put","c":"pai')
+
+    assert assert_gap_free(Journal(snapshot).load()) == 3
+    assert j.path.read_bytes() == whole
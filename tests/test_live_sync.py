@@ -0,0 +1,164 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import live_sync
+from live_sync import QUEUE_SIZE, Change, Hub, StateFileWatcher, merge
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+# ---------- merge ----------
+
+def test_merge_unions_collections_and_keeps_the_latest_version():
+    merged = merge([Change(2, frozenset({"pairings"}), "A"), Change(5, frozenset({"fusions"}), "A")])
+    assert merged == Change(5, frozenset({"pairings", "fusions"}), "A")
+
+
+def test_merge_of_a_replace_refreshes_everything():
+    assert merge([Change(3, frozenset({"pairings"})), Change(4, None)]).collections is None
+    assert merge([Change(4, None), Change(3, frozenset({"pairings"}))]).version == 4
+
+
+def test_merge_drops_a_mixed_origin():
+    assert merge([Change(1, frozenset(), "A"), Change(2, frozenset(), "B")]).origin is None
+    assert merge([]) is None
+
+
+# ---------- Hub ----------
+
+class Receiver:
+    """A subscriber whose first delivery blocks until ``release``."""
+
+    def __init__(self):
+        self.got = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, change):
+        self.entered.set()
+        self.release.wait(5)
+        self.got.append(change)
+        return True
+
+
+def test_hub_merges_what_piles_up_while_a_session_is_busy():
+    hub, rx = Hub(), Receiver()
+    hub.subscribe("run", rx)
+    hub.publish("run", Change(1, frozenset({"pairings"})))
+    assert rx.entered.wait(5)
+    for version, coll in ((2, "fusions"), (3, "graveyard")):
+        hub.publish("run", Change(version, frozenset({coll})))
+    rx.release.set()
+    assert wait_for(lambda: len(rx.got) == 2)
+    assert rx.got[1] == Change(3, frozenset({"fusions", "graveyard"}))
+    assert hub.stats["overflows"] == 0
+
+
+def test_hub_overflow_refreshes_everything():
+    hub, rx = Hub(), Receiver()
+    hub.subscribe("run", rx)
+    hub.publish("run", Change(1, frozenset({"pairings"})))
+    assert rx.entered.wait(5)
+    for version in range(2, QUEUE_SIZE + 5):
+        hub.publish("run", Change(version, frozenset({"pairings"})))
+    assert hub.stats["overflows"] > 0
+    rx.release.set()
+    assert wait_for(lambda: len(rx.got) == 2)
+    assert rx.got[1] == Change(QUEUE_SIZE + 4, None)
+
+
+def test_hub_skips_the_origin_and_other_topics():
+    hub = Hub()
+    got = {"A": [], "B": [], "other": []}
+    hub.subscribe("run", lambda c: got["A"].append(c) or True, "A")
+    hub.subscribe("run", lambda c: got["B"].append(c) or True, "B")
+    hub.subscribe("other run", lambda c: got["other"].append(c) or True, "C")
+    hub.publish("run", Change(2, frozenset({"pairings"}), "A"))
+    assert wait_for(lambda: got["B"])
+    time.sleep(0.1)
+    assert got["A"] == [] and got["other"] == []
+
+
+def test_hub_unsubscribes_a_closed_session_but_not_a_failing_one():
+    hub = Hub()
+    closed = hub.subscribe("run", lambda c: False, "A")
+
+    def fail(change):
+        raise RuntimeError("rerun failed")
+    failing = hub.subscribe("run", fail, "B")
+    hub.publish("run", Change(2, None))
+    assert wait_for(lambda: not closed.active)
+    assert failing.active and hub.subscribers("run") == 1
+
+
+# ---------- StateFileWatcher ----------
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    monkeypatch.setattr(live_sync, "SETTLE_DELAY", 0.1)
+    path = tmp_path / "state.json"
+    path.write_text("{}", encoding="utf-8")
+    calls = []
+    watcher = StateFileWatcher([path], lambda: calls.append(time.monotonic()))
+    yield path, watcher, calls
+    watcher.stop()
+
+
+def touch(watcher, path):
+    watcher.on_any_event(SimpleNamespace(src_path=str(path), dest_path=""))
+
+
+def edit(path, text):
+    path.write_text(text, encoding="utf-8")
+
+
+def test_watcher_waits_for_the_file_to_settle(watched):
+    path, watcher, calls = watched
+    start = time.monotonic()
+    for i in range(5):  # a writer touching the file several times
+        edit(path, '{"n": %d}' % i)
+        touch(watcher, path)
+        time.sleep(0.03)
+    assert calls == []
+    assert wait_for(lambda: calls)
+    time.sleep(0.3)
+    assert len(calls) == 1 and calls[0] - start >= 0.1 + 4 * 0.03
+
+
+def test_watcher_ignores_the_apps_own_writes(watched):
+    path, watcher, calls = watched
+    edit(path, '{"own": "write, longer than before"}')
+    watcher.acknowledge()  # what the writer does after saving
+    touch(watcher, path)
+    time.sleep(0.3)
+    assert calls == []
+
+    edit(path, '{"edited": "from outside, and longer again"}')
+    touch(watcher, path)
+    assert wait_for(lambda: calls)
+
+
+def test_watcher_ignores_other_files(watched, tmp_path):
+    path, watcher, calls = watched
+    edit(path, '{"changed": "but only the neighbour is reported"}')
+    touch(watcher, tmp_path / "notes.txt")
+    time.sleep(0.3)
+    assert calls == []
+
+
+@pytest.mark.skipif(live_sync.Observer is None, reason="needs watchdog")
+def test_watcher_sees_real_file_events(watched):
+    path, watcher, calls = watched
+    assert watcher.start()
+    edit(path, '{"edited": "from outside with notifications on"}')
+    assert wait_for(lambda: calls)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import planner
+from planner import Candidates, candidates, evolution_scorer, rank
+from state_index import StateIndex
+from synthetic import synthetic_state
+
+
+def coarse(heads, bodies):
+    """Three score levels, so most pairs tie with many others."""
+    return ((np.asarray(heads) + 2 * np.asarray(bodies)) % 3) / 2
+
+
+def random_candidates(n, seed):
+    rng = np.random.default_rng(seed)
+    p1, p2 = rng.integers(1, 40, n), rng.integers(1, 40, n)
+    ids = tuple(f"P{i:04d}" for i in range(n))
+    return Candidates(ids, p1, p2, tuple(map(str, p1)), tuple(map(str, p2)))
+
+
+def brute_force(cands, scorers, weights, combine):
+    """Every ordered pair scored one at a time, best first, ties by position."""
+    total = sum(weights.values())
+
+    def player(h, b):
+        return sum(weights[name] * float(fn(h, b)) for name, fn in scorers.items()) / total
+
+    def score(i, j):
+        s1 = player(cands.player1[i], cands.player1[j])
+        s2 = player(cands.player2[i], cands.player2[j])
+        return min(s1, s2) if combine == "min" else (s1 + s2) / 2
+
+    n = len(cands.ids)
+    pairs = [(-score(i, j), i, j) for i in range(n) for j in range(n) if i != j]
+    return [(cands.ids[i], cands.ids[j], -neg, score(j, i)) for neg, i, j in sorted(pairs)]
+
+
+@pytest.mark.parametrize("n,k", [(2, 1), (2, 5), (7, 10), (7, 42), (7, 100), (30, 25), (30, 1000)])
+@pytest.mark.parametrize("combine", ["min", "mean"])
+@pytest.mark.parametrize("block_cells", [planner.BLOCK_CELLS, 20])
+def test_blocked_top_k_matches_brute_force(monkeypatch, dex, n, k, combine, block_cells):
+    monkeypatch.setattr(planner, "BLOCK_CELLS", block_cells)  # 20: one or two head rows a block
+    cands = random_candidates(n, seed=n + k)
+    scorers = {"coarse": coarse, "evolution": evolution_scorer(dex)}
+    weights = {"coarse": 2.0, "evolution": 1.0}
+    got = rank(cands, scorers, k=k, weights=weights, combine=combine)
+    expected = brute_force(cands, scorers, weights, combine)[:k]
+    assert len(got) == min(k, n * (n - 1))
+    assert [(r["head"], r["body"], r["score"], r["reverse_score"]) for r in got] == expected
+
+
+def test_all_tied_goes_in_candidate_order(monkeypatch):
+    monkeypatch.setattr(planner, "BLOCK_CELLS", 8)
+    cands = random_candidates(6, seed=0)
+    got = rank(cands, {"flat": lambda h, b: np.zeros(np.broadcast(h, b).shape)}, k=7)
+    assert [(r["head"], r["body"]) for r in got] == [
+        ("P0000", "P0001"), ("P0000", "P0002"), ("P0000", "P0003"), ("P0000", "P0004"), ("P0000", "P0005"),
+        ("P0001", "P0000"), ("P0001", "P0002"),
+    ]
+
+
+def test_ranks_a_runs_live_unfused_pairings(dex):
+    state = synthetic_state(60, seed=3, dex=dex)
+    cands = candidates(state, StateIndex(state))
+    live = {
+        p["id"] for p in state["pairings"]
+        if not p.get("dead") and not (p["player1"]["used"] or p["player2"]["used"])
+    }
+    assert set(cands.ids) == live
+    scorers = {"evolution": evolution_scorer(dex)}
+    got = rank(cands, scorers, k=15)
+    assert [(r["head"], r["body"], r["score"]) for r in got] == [
+        e[:3] for e in brute_force(cands, scorers, {"evolution": 1.0}, "min")[:15]
+    ]
+    for r in got:
+        assert r["score"] == min(r["player1"]["score"], r["player2"]["score"])
+
+
+@pytest.mark.parametrize("n,k", [(0, 5), (1, 5), (5, 0)])
+def test_nothing_to_rank(n, k):
+    assert rank(random_candidates(n, seed=1), {"coarse": coarse}, k=k) == []
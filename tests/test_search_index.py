@@ -0,0 +1,151 @@
+import random
+
+import pytest
+
+import queries
+from state_index import StateIndex
+from storage import name_for
+from synthetic import synthetic_state
+
+ALPHABET = "abcdeilnorstu0123456789 -PF#é"
+
+
+# ---------- The linear filters the tabs used before the search index ----------
+
+def old_filter_pairings(state, dex, search_q, only_unfused=False):
+    pairs = [p for p in state["pairings"] if not p.get("dead")]
+    if only_unfused:
+        pairs = [p for p in pairs if not (p["player1"]["used"] or p["player2"]["used"])]
+    if search_q:
+        q = search_q.strip().lower()
+
+        def _pmatch(p):
+            fields = [
+                p.get("id", ""),
+                p["player1"].get("name", ""), p["player2"].get("name", ""),
+                f"{int(p['player1']['number']):03d}", f"{int(p['player2']['number']):03d}",
+                str(p["player1"].get("encounter", "")), str(p["player2"].get("encounter", "")),
+            ]
+            return any(q in str(x).lower() for x in fields)
+        pairs = [p for p in pairs if _pmatch(p)]
+    return pairs
+
+
+def old_filter_fusions(state, dex, search_f):
+    items = list(state["fusions"])
+    if search_f:
+        qf = search_f.strip().lower()
+
+        def _fmatch(f):
+            names = [
+                f["id"],
+                f["player1"]["a"]["name"], f["player1"]["b"]["name"],
+                f["player2"]["a"]["name"], f["player2"]["b"]["name"],
+                f"{int(f['player1']['a']['number']):03d}", f"{int(f['player1']['b']['number']):03d}",
+                f"{int(f['player2']['a']['number']):03d}", f"{int(f['player2']['b']['number']):03d}",
+            ]
+            return any(qf in str(x).lower() for x in names)
+        items = [f for f in items if _fmatch(f)]
+    return items
+
+
+def old_filter_graveyard(state, dex, search_g):
+    grave_items = list(state["graveyard"])
+    if search_g:
+        qg = search_g.strip().lower()
+
+        def _gmatch(g):
+            if g.get("kind") == "pairing":
+                n1 = int(g["player1"]["number"]); n2 = int(g["player2"]["number"])
+                fields = [g.get("id", ""), f"{n1:03d}", f"{n2:03d}"]
+                fields += [name_for(dex, n1), name_for(dex, n2)]
+                return any(qg in str(x).lower() for x in fields)
+            return False
+        grave_items = [g for g in grave_items if _gmatch(g)]
+    return grave_items
+
+
+# ---------- Random states, queries and edits ----------
+
+def random_queries(state, rng, n=40):
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.45:
+            p = rng.choice(state["pairings"])
+            text = str(rng.choice([p["id"], p["player1"]["name"], p["player2"]["encounter"],
+                                   f"{p['player1']['number']:03d}"]))
+            i = rng.randrange(len(text) + 1)
+            q = text[i:rng.randrange(i, len(text) + 1)]
+            yield q.upper() if rng.random() < 0.3 else q
+        elif r < 0.7:
+            yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 2)))  # scan path
+        elif r < 0.8:
+            yield " " * rng.randint(1, 3)
+        elif r < 0.9:
+            yield f" {rng.choice(state['pairings'])['player2']['name'][:4]} "
+        else:
+            yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 6)))
+
+
+def edit(state, index, dex, rng, step):
+    r = rng.random()
+    if r < 0.3:
+        n = rng.choice(dex.numbers)
+        pid = f"P{state['next_pair_id']:04d}"
+        state["next_pair_id"] += 1
+        index.add("pairings", {"id": pid, "player1": {"number": n, "name": dex.name(n), "encounter": f"Cave {step}", "used": False},
+                               "player2": {"number": n, "name": dex.name(n), "encounter": f"Cave {step}", "used": False}})
+    elif r < 0.55:
+        # Evolve in place, as evolve_pairing_mon does
+        p = rng.choice(state["pairings"])
+        n = rng.choice(dex.numbers)
+        p["player1"]["number"], p["player1"]["name"] = n, dex.name(n)
+        index.touch("pairings", p["id"])
+        for f in index.fusions_for_pairing(p["id"], "player1"):
+            for slot in "ab":
+                if f["player1"][slot]["pairing_id"] == p["id"]:
+                    f["player1"][slot]["number"], f["player1"][slot]["name"] = n, dex.name(n)
+            index.touch("fusions", f["id"])
+    elif r < 0.75:
+        a, b = rng.sample(state["pairings"], 2)
+        fusion = {"id": f"F{state['next_fusion_id']:04d}"}
+        state["next_fusion_id"] += 1
+        for side in ("player1", "player2"):
+            fusion[side] = {slot: {"pairing_id": p["id"], "number": p[side]["number"], "name": p[side]["name"]}
+                            for slot, p in (("a", a), ("b", b))}
+        index.add("fusions", fusion)
+    elif r < 0.9 and state["fusions"]:
+        f = index.remove("fusions", rng.choice(state["fusions"])["id"])
+        for pid in {f["player1"]["a"]["pairing_id"], f["player1"]["b"]["pairing_id"]}:
+            p = index.remove("pairings", pid)
+            if p:
+                index.add("graveyard", {"kind": "pairing", "id": pid, "player1": {"number": p["player1"]["number"]},
+                                        "player2": {"number": p["player2"]["number"]}})
+    else:
+        index.remove("pairings", rng.choice(state["pairings"])["id"])
+
+
+@pytest.mark.parametrize("seed,size", [(0, 50), (1, 300), (2, 1000)])
+def test_filters_match_the_linear_scan(dex, seed, size):
+    rng = random.Random(seed)
+    state = synthetic_state(size, seed=seed, dex=dex)
+    state["graveyard"].append({"kind": "fusion", "id": "F9999"})  # legacy entry, never searchable
+    index = StateIndex(state, name_of=lambda n: name_for(dex, n))
+    for step in range(25):
+        for q in random_queries(state, rng):
+            only_unfused = rng.random() < 0.3
+            assert queries.filter_pairings(state, index, q, only_unfused) == \
+                old_filter_pairings(state, dex, q, only_unfused), q
+            assert queries.filter_fusions(state, index, q) == old_filter_fusions(state, dex, q), q
+            assert queries.filter_graveyard(state, index, q) == old_filter_graveyard(state, dex, q), q
+        edit(state, index, dex, rng, step)
+
+
+@pytest.mark.parametrize("q", ["", " ", "   \t"])
+def test_blank_queries(dex, q):
+    state = synthetic_state(20, seed=3, dex=dex)
+    state["graveyard"].append({"kind": "fusion", "id": "F9999"})
+    index = StateIndex(state, name_of=lambda n: name_for(dex, n))
+    assert queries.filter_pairings(state, index, q) == old_filter_pairings(state, dex, q)
+    assert queries.filter_fusions(state, index, q) == old_filter_fusions(state, dex, q)
+    assert queries.filter_graveyard(state, index, q) == old_filter_graveyard(state, dex, q)
@@ -0,0 +1,252 @@
+import json
+import threading
+
+import pytest
+
+import fusion_sprites
+import shared_state
+import sprite_variants
+import storage
+import write_behind
+from conftest import ROOT
+from shared_state import Conflict, SharedRun
+from storage import op_del, op_put, op_set
+
+
+def make_state(dex, numbers):
+    pairings = []
+    for i, (a, b) in enumerate(numbers, start=1):
+        pairings.append({
+            "id": f"P{i:04d}", "created_at": "2024-01-01T00:00:00",
+            "player1": {"number": a, "name": dex.name(a), "encounter": f"Route {i}", "used": False},
+            "player2": {"number": b, "name": dex.name(b), "encounter": f"Route {i}", "used": False},
+        })
+    return {
+        "pairings": pairings, "fusions": [], "graveyard": [], "player1_team": [], "player2_team": [],
+        "next_pair_id": len(pairings) + 1, "next_fusion_id": 1,
+    }
+
+
+# ---------- SharedRun transactions ----------
+
+@pytest.fixture
+def run(dex):
+    return SharedRun(make_state(dex, [(1, 4), (7, 10), (16, 19)]))
+
+
+def add_pairing(run, base, session, encounter):
+    with run.transaction(base, origin=session) as state:
+        pid = f"P{state['next_pair_id']:04d}"
+        state["next_pair_id"] += 1
+        rec = {"id": pid, "player1": {"number": 1, "name": "Bulbasaur", "encounter": encounter, "used": False},
+               "player2": {"number": 4, "name": "Charmander", "encounter": encounter, "used": False}}
+        state["pairings"].append(rec)
+        run.commit([op_put("pairings", rec), op_set("next_pair_id", state["next_pair_id"])], origin=session)
+    return pid
+
+
+def evolve(run, base, session, pid, number=2):
+    with run.transaction(base, [("pairings", pid)], origin=session) as state:
+        rec = next(p for p in state["pairings"] if p["id"] == pid)
+        rec["player1"]["number"] = number
+        run.commit([op_put("pairings", rec)], origin=session)
+
+
+def delete(run, base, session, pid):
+    with run.transaction(base, [("pairings", pid)], origin=session) as state:
+        state["pairings"] = [p for p in state["pairings"] if p["id"] != pid]
+        run.commit([op_del("pairings", pid)], origin=session)
+
+
+def test_interleaved_adds_keep_both_with_unique_ids(run):
+    base = run.version  # both sessions rendered before either added
+    a = add_pairing(run, base, "A", "Route A")
+    b = add_pairing(run, base, "B", "Route B")
+    assert a != b
+    assert [p["player1"]["encounter"] for p in run.state["pairings"][-2:]] == ["Route A", "Route B"]
+    assert run.state["next_pair_id"] == 6
+
+
+def test_stale_action_on_changed_record_conflicts(run):
+    base = run.version
+    evolve(run, base, "B", "P0001")
+    with pytest.raises(Conflict) as e:
+        delete(run, base, "A", "P0001")
+    assert e.value.refs == [("pairings", "P0001")]
+    assert any(p["id"] == "P0001" for p in run.state["pairings"])
+
+
+def test_stale_action_on_untouched_record_merges(run):
+    base = run.version
+    evolve(run, base, "B", "P0001")
+    delete(run, base, "A", "P0002")
+    assert [p["id"] for p in run.state["pairings"]] == ["P0001", "P0003"]
+
+
+def test_retry_after_refresh_applies(run):
+    base = run.version
+    evolve(run, base, "B", "P0001")
+    with pytest.raises(Conflict):
+        delete(run, base, "A", "P0001")
+    delete(run, run.version, "A", "P0001")
+    assert "P0001" not in [p["id"] for p in run.state["pairings"]]
+
+
+def test_own_change_is_not_a_conflict(run):
+    # A evolves from a tile rendered later than the list it then acts from
+    list_base = run.version
+    evolve(run, run.version, "A", "P0001")
+    delete(run, list_base, "A", "P0001")
+    assert "P0001" not in [p["id"] for p in run.state["pairings"]]
+
+
+def test_other_session_after_own_change_conflicts(run):
+    base = run.version
+    evolve(run, base, "A", "P0001")
+    evolve(run, run.version, "B", "P0001", number=3)
+    with pytest.raises(Conflict):
+        delete(run, base, "A", "P0001")
+
+
+def test_replace_makes_other_sessions_stale(run, dex):
+    base = run.version
+    run.replace(make_state(dex, [(1, 4)]), origin="B")
+    with pytest.raises(Conflict):
+        delete(run, base, "A", "P0001")
+    run.replace(make_state(dex, [(1, 4)]), origin="A")
+    delete(run, base + 1, "A", "P0001")
+
+
+def test_outside_reload_is_stale_for_everyone(run, dex):
+    base = run.version
+    run.replace(make_state(dex, [(1, 4)]))  # origin None: the state file changed
+    for session in ("A", "B"):
+        with pytest.raises(Conflict):
+            delete(run, base, session, "P0001")
+
+
+def test_reload_during_flushes_keeps_every_change(state_dir, dex, monkeypatch):
+    # An outside edit reloads the run while saves are pending and being
+    # flushed: no deadlock, and no committed change is lost
+    writer = write_behind.WriteBehind(delay=60)
+    monkeypatch.setattr(write_behind, "_writer", writer)
+    storage.save_state(make_state(dex, [(1, 4)]))
+    run = SharedRun(storage.load_state())
+    done = threading.Event()
+    added = []
+
+    def act():
+        for _ in range(150):
+            with run.lock:
+                added.append(add_pairing(run, run.version, "A", "Route"))
+                writer.mark(run.state, [op_put("pairings", run.state["pairings"][-1])], lock=run.lock)
+        done.set()
+
+    def keep_calling(fn):
+        while not done.is_set():
+            fn()
+
+    threads = [threading.Thread(target=f, daemon=True) for f in (
+        act, lambda: keep_calling(writer.flush), lambda: keep_calling(run.reload),
+    )]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert not any(t.is_alive() for t in threads), "deadlock"
+    writer.flush()
+    assert [p["id"] for p in run.state["pairings"]][1:] == added
+    assert [p["id"] for p in storage.load_state()["pairings"]][1:] == added
+
+
+# ---------- Two app sessions ----------
+
+def as_session(at, session, tab="Pairings"):
+    """Run ``at`` as its own browser session: AppTest gives every app the
+    same session id and doesn't send the open tab back."""
+    original = at._run
+
+    def _run(*args, **kwargs):
+        _running[0] = session
+        at.session_state["active_tab"] = tab
+        return original(*args, **kwargs)
+    at._run = _run
+    return at
+
+
+_running = [None]
+
+
+@pytest.fixture
+def sessions(state_dir, writer, dex, monkeypatch, tmp_path):
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    # Bulbasaur, Charmander, Squirtle and Pidgey lines: every tile can evolve
+    storage.STATE_PATH.write_text(json.dumps(make_state(dex, [(1, 4), (7, 16), (4, 1), (16, 7)])), encoding="utf-8")
+    monkeypatch.setattr(shared_state, "_runs", {})
+    monkeypatch.setattr(sprite_variants, "ensure_in_background", lambda dex: None)
+    monkeypatch.setattr(
+        fusion_sprites, "_cache", fusion_sprites.FusionSpriteCache(tmp_path / "fusions", fetcher=lambda h, b: None)
+    )
+    init = LocalScriptRunner.__init__
+
+    def init_as_session(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._session_id = _running[0]
+    monkeypatch.setattr(LocalScriptRunner, "__init__", init_as_session)
+    apps = [as_session(AppTest.from_file(str(ROOT / "app.py"), default_timeout=60), s).run() for s in "AB"]
+    for at in apps:
+        assert not at.exception, [e.message for e in at.exception]
+    yield apps
+    for run in shared_state._runs.values():
+        if run.watcher is not None:
+            run.watcher.stop()
+
+
+def click(at, key):
+    next(b for b in at.button if b.key == key).click().run()
+    assert not at.exception, [e.message for e in at.exception]
+
+
+def pairing_ids():
+    return [p["id"] for p in shared_state.get_run().state["pairings"]]
+
+
+def test_sessions_reject_stale_action_and_merge_others(sessions):
+    a, b = sessions
+    click(b, "evolve_one_P0001_player1")
+    click(a, "grave_P0001")  # A still shows P0001 before B evolved it
+    assert "P0001" in pairing_ids()
+    assert any("other player" in t.value for t in a.toast)
+
+    click(a, "del_P0002")  # untouched by B: goes through from the same view
+    assert "P0002" not in pairing_ids()
+
+    a.run()
+    click(a, "grave_P0001")
+    assert "P0001" not in pairing_ids()
+
+
+def test_session_acts_after_its_own_evolve(sessions):
+    a, _ = sessions
+    # In the browser evolving reruns only the tile fragment, so the list
+    # around it keeps the version it was rendered at; AppTest reruns it all
+    seen = "seen_version:pairings_view:"
+    before = a.session_state[seen]
+    click(a, "evolve_one_P0003_player1")
+    a.session_state[seen] = before
+    assert shared_state.get_run().state["pairings"][2]["player1"]["number"] == 5
+    click(a, "grave_P0003")
+    assert "P0003" not in pairing_ids()
+    assert not any("other player" in t.value for t in a.toast)
+
+
+def test_saved_file_matches_shared_state(sessions, writer):
+    a, b = sessions
+    click(b, "evolve_one_P0001_player1")
+    click(a, "del_P0002")
+    writer.flush()
+    disk, shared = storage.load_state(), shared_state.get_run().state
+    for key in ("pairings", "graveyard", "next_pair_id"):
+        assert disk[key] == shared[key]
@@ -0,0 +1,132 @@
+import gzip
+import io
+import json
+import random
+
+import pytest
+
+import snapshot
+import storage
+from snapshot import SnapshotError
+from synthetic import synthetic_state
+
+BACKENDS = ("json", "journal", "sqlite")
+
+
+def canon(state):
+    return json.dumps(state, sort_keys=True, ensure_ascii=False)
+
+
+def run_state(dex, n=200):
+    state = synthetic_state(n, seed=n, dex=dex)
+    state.update(players=["Ásh", "Místy 🌊"], version=1)
+    state["pairings"][0]["player1"]["encounter"] = 'Route "1"\né☃'
+    return state
+
+
+def snapshot_bytes(state, **kwargs):
+    buf = io.BytesIO()
+    snapshot.write_snapshot(state, buf, **kwargs)
+    return buf.getvalue()
+
+
+def use_backend(monkeypatch, tmp_path, backend, name):
+    monkeypatch.setattr(storage, "STATE_BACKEND", backend)
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path / name)
+    monkeypatch.setattr(storage, "STATE_PATH", tmp_path / name / "state.json")
+
+
+# ---------- Round trips ----------
+
+@pytest.mark.parametrize("compression", snapshot.compressions())
+def test_round_trip_in_memory(dex, compression):
+    for state in (storage._default_state(), run_state(dex)):
+        buf = io.BytesIO(snapshot_bytes(state, compression=compression))
+        back = snapshot.read_snapshot(buf)
+        assert not buf.closed  # a caller's file stays open
+        state.setdefault("next_pair_id", 1)
+        state.setdefault("next_fusion_id", 1)
+        for coll in storage.RECORD_COLLECTIONS:
+            state.setdefault(coll, [])
+        assert canon(back) == canon(state)
+
+
+def test_reads_uncompressed_json_lines(dex):
+    state = run_state(dex, 20)
+    plain = gzip.decompress(snapshot_bytes(state))
+    assert canon(snapshot.read_snapshot(io.BytesIO(plain))) == canon(snapshot.read_snapshot(io.BytesIO(snapshot_bytes(state))))
+
+
+@pytest.mark.parametrize("source", BACKENDS)
+@pytest.mark.parametrize("dest", BACKENDS)
+def test_round_trip_between_backends(dex, tmp_path, monkeypatch, source, dest):
+    state = run_state(dex)
+    use_backend(monkeypatch, tmp_path, source, "source")
+    storage.save_state(state)
+    path = tmp_path / "run.jsonl.gz"
+    assert storage.export_snapshot(path) == sum(len(state[c]) for c in storage.RECORD_COLLECTIONS)
+
+    use_backend(monkeypatch, tmp_path, dest, "dest")
+    storage.import_snapshot(path)
+    loaded = storage.load_state()
+    for key in set(state) | set(loaded):
+        if key != "updated_at":  # stamped by save_state
+            assert canon(loaded.get(key)) == canon(state.get(key)), key
+
+
+# ---------- Rejected snapshots ----------
+
+def test_truncated(dex):
+    data = snapshot_bytes(run_state(dex))
+    with pytest.raises(SnapshotError, match="truncated or corrupt"):
+        snapshot.read_snapshot(io.BytesIO(data[: len(data) // 2]))
+
+
+def test_corrupt(dex):
+    data = snapshot_bytes(run_state(dex, 500))
+    rng = random.Random(0)
+    for _ in range(200):
+        bad = bytearray(data)
+        bad[rng.randrange(len(bad) // 4, len(bad))] ^= 1 << rng.randrange(8)
+        with pytest.raises(SnapshotError):
+            snapshot.read_snapshot(io.BytesIO(bytes(bad)))
+
+
+@pytest.mark.parametrize("payload", [
+    b'{"a": 1}\n',
+    b"",
+    b"\x1f\x8bxxxx",
+    b"\xff\xfe\xfd\n",
+    gzip.compress(b'{"format": "something-else", "schema": 1}\n'),
+])
+def test_foreign(payload):
+    with pytest.raises(SnapshotError, match="Not a run snapshot"):
+        snapshot.read_snapshot(io.BytesIO(payload))
+
+
+def test_newer_schema():
+    header = {"format": snapshot.FORMAT, "schema": snapshot.SCHEMA_VERSION + 1, "counts": {}}
+    with pytest.raises(SnapshotError, match="newer"):
+        snapshot.read_snapshot(io.BytesIO(gzip.compress(json.dumps(header).encode() + b"\n")))
+
+
+@pytest.mark.parametrize("line,message", [
+    (b"not json\n", "Line 3 is not a snapshot record"),
+    (b'{"c": "pairings"}\n', "Line 3 is not a snapshot record"),
+    (b'{"c": "bogus", "v": {}}\n', "unknown collection 'bogus'"),
+])
+def test_bad_record_line(dex, line, message):
+    lines = gzip.decompress(snapshot_bytes(run_state(dex, 5))).splitlines(keepends=True)
+    lines.insert(2, line)
+    with pytest.raises(SnapshotError, match=message):
+        snapshot.read_snapshot(io.BytesIO(b"".join(lines)))
+
+
+def test_short(dex):
+    # Complete lines, but fewer records than the header promises
+    state = run_state(dex, 10)
+    n = len(state["pairings"])
+    lines = gzip.decompress(snapshot_bytes(state)).splitlines(keepends=True)
+    del lines[1]  # the first pairing
+    with pytest.raises(SnapshotError, match=rf"incomplete \(pairings: {n - 1} of {n}\)"):
+        snapshot.read_snapshot(io.BytesIO(gzip.compress(b"".join(lines))))
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import sprite_variants
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def draw_sprite(path, seed):
+    rng = random.Random(seed)
+    im = Image.new("RGBA", (96, 96))
+    im.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256), 255) for _ in range(96 * 96)])
+    im.resize((288, 288), Image.NEAREST).save(path)
+
+
+@pytest.fixture
+def variants_dir(tmp_path, monkeypatch):
+    out = tmp_path / "variants"
+    monkeypatch.setattr(sprite_variants, "VARIANTS_DIR", out)
+    monkeypatch.setattr(sprite_variants, "VARIANTS_MANIFEST", out / "manifest.json")
+    monkeypatch.setattr(sprite_variants, "_current", None)
+    monkeypatch.setattr(sprite_variants, "_pruned", False)
+    sprites = [tmp_path / "a.png", tmp_path / "b.png"]
+    for seed, path in enumerate(sprites):
+        draw_sprite(path, seed)
+    monkeypatch.setattr(sprite_variants, "sprite_sources", lambda dex: sprites)
+    return out
+
+
+def files(variants):
+    """Variant file names of sprite a."""
+    entry = next(e for key, e in variants.entries.items() if key.endswith("a.png"))
+    return set(entry["variants"].values())
+
+
+def test_rebuild_keeps_the_served_files_until_restart(variants_dir, monkeypatch, tmp_path):
+    first = files(sprite_variants.ensure_variants(None))
+    assert first and all((variants_dir / name).is_file() for name in first)
+
+    draw_sprite(tmp_path / "a.png", 99)  # a changed sprite
+    second = files(sprite_variants.ensure_variants(None))
+    assert second.isdisjoint(first)
+    # Pages rendered before the rebuild still load their sprites
+    assert all((variants_dir / name).is_file() for name in first | second)
+
+    # Next start-up: nothing serves the first manifest any more
+    monkeypatch.setattr(sprite_variants, "_current", None)
+    monkeypatch.setattr(sprite_variants, "_pruned", False)
+    sprite_variants.ensure_in_background(None).join()
+    assert not any((variants_dir / name).exists() for name in first)
+    assert all((variants_dir / name).is_file() for name in second)
@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import sqlite_store
+import storage
+from synthetic import synthetic_state
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def migrate_cli(*args):
+    return subprocess.run(
+        [sys.executable, "sqlite_store.py", "migrate", *map(str, args)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+
+
+@pytest.fixture
+def sqlite_dir(state_dir, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_BACKEND", "sqlite")
+    monkeypatch.setattr(sqlite_store, "_stores", {})
+    return state_dir
+
+
+def test_migrated_save_loads_the_same(dex, sqlite_dir):
+    state = synthetic_state(120, seed=8, dex=dex)
+    state["pairings"][0]["player1"]["encounter"] = 'Route "1" é☃'
+    state.update(players=["Ásh", "Místy"], version=3)
+    src = sqlite_dir / "state.json"
+    src.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    out = migrate_cli(src, sqlite_dir / "state.sqlite3")
+    assert out.returncode == 0, out.stdout + out.stderr
+    assert "lossless" in out.stdout
+    src.unlink()  # the app must read the database, not re-seed from the JSON
+
+    loaded = storage.load_state()
+    assert loaded == state
+    assert loaded["next_pair_id"] == state["next_pair_id"] and loaded["next_fusion_id"] == state["next_fusion_id"]
+    for coll in ("graveyard", "player1_team", "player2_team"):
+        assert state[coll] and [storage.record_key(coll, r) for r in loaded[coll]] == [
+            storage.record_key(coll, r) for r in state[coll]
+        ]
+
+
+def test_migrate_without_a_save(sqlite_dir):
+    out = migrate_cli(sqlite_dir / "state.json", sqlite_dir / "state.sqlite3")
+    assert out.returncode == 1 and "Nothing to migrate" in out.stdout
@@ -0,0 +1,122 @@
+import copy
+import random
+
+import pytest
+
+import state_index
+from state_index import StateIndex, fusion_pairing_ids, recompute_used_flags
+from storage import RECORD_COLLECTIONS, record_key
+
+STEPS = 400
+
+
+def new_state(dex, rng, n):
+    state = {"pairings": [], "fusions": [], "graveyard": [], "player1_team": [], "player2_team": [],
+             "next_pair_id": 1, "next_fusion_id": 1}
+    for _ in range(n):
+        add_pairing(state, None, dex, rng)
+    return state
+
+
+# The actions below make the same index calls as their app.py namesakes
+
+def add_pairing(state, index, dex, rng):
+    a, b = rng.choice(dex.numbers), rng.choice(dex.numbers)
+    pairing = {"id": f"P{state['next_pair_id']:04d}",
+               "player1": {"number": a, "name": dex.name(a), "used": False},
+               "player2": {"number": b, "name": dex.name(b), "used": False}}
+    state["next_pair_id"] += 1
+    if index is None:
+        state["pairings"].append(pairing)
+    else:
+        index.add("pairings", pairing)
+
+
+def create_fusion(state, index, pa, pb):
+    if pa is pb or any(p[side]["used"] for p in (pa, pb) for side in ("player1", "player2")):
+        return
+    fusion = {"id": f"F{state['next_fusion_id']:04d}"}
+    for side in ("player1", "player2"):
+        fusion[side] = {slot: {"pairing_id": p["id"], "number": p[side]["number"], "name": p[side]["name"]}
+                        for slot, p in (("a", pa), ("b", pb))}
+    index.add("fusions", fusion)
+    state["next_fusion_id"] += 1
+    index.refresh_used(pa)
+    index.refresh_used(pb)
+
+
+def refresh(index, pids):
+    for pid in sorted(pids):
+        p = index.pairing(pid)
+        if p is not None:
+            index.refresh_used(p)
+
+
+def unfuse(index, fid):
+    refresh(index, fusion_pairing_ids(index.remove("fusions", fid)))
+
+
+def bury_fusion(index, fid):
+    f = index.fusion(fid)
+    for pid in dict.fromkeys(f["player1"][slot]["pairing_id"] for slot in ("a", "b")):
+        p = index.pairing(pid)
+        if p is not None:
+            index.add("graveyard", {"kind": "pairing", "id": pid, "player1": {"number": p["player1"]["number"]},
+                                    "player2": {"number": p["player2"]["number"]}})
+            index.remove("pairings", pid)
+    index.remove("fusions", fid)
+    refresh(index, fusion_pairing_ids(f))
+
+
+def bury_pairing(index, p):
+    if not (p["player1"]["used"] or p["player2"]["used"]):
+        index.add("graveyard", {"kind": "pairing", "id": p["id"], "player1": {"number": p["player1"]["number"]},
+                                "player2": {"number": p["player2"]["number"]}})
+        index.remove("pairings", p["id"])
+
+
+def delete_pairing(index, p):
+    if not (p["player1"]["used"] or p["player2"]["used"]):
+        index.remove("pairings", p["id"])
+
+
+def step(state, index, dex, rng):
+    pairings, fusions = state["pairings"], state["fusions"]
+    choice = rng.random()
+    if choice < 0.15 or len(pairings) < 2:
+        add_pairing(state, index, dex, rng)
+    elif choice < 0.5:
+        create_fusion(state, index, *rng.sample(pairings, 2))
+    elif choice < 0.65 and fusions:
+        unfuse(index, rng.choice(fusions)["id"])
+    elif choice < 0.75 and fusions:
+        bury_fusion(index, rng.choice(fusions)["id"])
+    elif choice < 0.85:
+        bury_pairing(index, rng.choice(pairings))
+    elif choice < 0.95:
+        delete_pairing(index, rng.choice(pairings))
+    elif state["graveyard"]:
+        index.remove("graveyard", record_key("graveyard", rng.choice(state["graveyard"])))
+
+
+def assert_consistent(state, index):
+    full = copy.deepcopy(state)
+    assert recompute_used_flags(full) == []
+    fresh = StateIndex(state)
+    assert index.fusion_refs == fresh.fusion_refs
+    for coll in RECORD_COLLECTIONS:
+        assert index.records[coll].keys() == fresh.records[coll].keys(), coll
+        assert all(index.records[coll][record_key(coll, r)] is r for r in state[coll])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_used_flags_match_full_recompute(dex, monkeypatch, seed):
+    # Reindex often so stale position hints get exercised too
+    monkeypatch.setattr(state_index, "REINDEX_AFTER", 5)
+    rng = random.Random(seed)
+    state = new_state(dex, rng, 30)
+    index = StateIndex(state)
+    for _ in range(STEPS):
+        step(state, index, dex, rng)
+        assert_consistent(state, index)
+    assert state["fusions"] or state["graveyard"]
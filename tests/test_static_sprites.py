@@ -0,0 +1,67 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import static_sprites
+import ui_components
+
+
+@pytest.fixture
+def published(tmp_path, monkeypatch):
+    out = tmp_path / "static" / "sprites"
+    monkeypatch.setattr(static_sprites, "STATIC_SPRITES_DIR", out)
+    monkeypatch.setattr(static_sprites, "_published", {})
+    monkeypatch.setattr(static_sprites, "_pruned", False)
+    sprites = [tmp_path / "1.png", tmp_path / "4.png"]
+    for n, path in enumerate(sprites):
+        path.write_bytes(b"sprite %d" % n)
+    return out, [str(p) for p in sprites]
+
+
+def edit(path, data):
+    """Rewrite a sprite; bump its mtime so the change is visible on any clock."""
+    before = os.stat(path).st_mtime_ns
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, ns=(before + 10**9, before + 10**9))
+
+
+def test_rendering_does_not_copy(published):
+    out, (one, _) = published
+    assert static_sprites.static_url(one) is None
+    assert ui_components._path_to_static_url(one).startswith("data:image/png;base64,")
+    assert not out.exists()
+
+
+def test_changed_content_gets_a_new_url(published):
+    out, (one, four) = published
+    assert static_sprites.publish_all([one, four]) == 2
+    first = static_sprites.static_url(one)
+    assert first.startswith("app/static/sprites/1.") and ui_components._path_to_static_url(one) == first
+    assert static_sprites.publish_all([one, four]) == 0  # nothing changed
+
+    edit(one, b"redrawn")
+    assert static_sprites.static_url(one) is None  # never the old URL for new content
+    assert ui_components._path_to_static_url(one) == "data:image/png;base64,cmVkcmF3bg=="
+    assert static_sprites.publish_all([one, four]) == 1
+    second = static_sprites.static_url(one)
+    assert second != first and (out / second.rsplit("/", 1)[1]).read_bytes() == b"redrawn"
+    # Pages rendered before still load the old copy until the next start-up
+    assert (out / first.rsplit("/", 1)[1]).is_file()
+
+
+def test_start_up_deletes_copies_nothing_refers_to(published, monkeypatch):
+    out, (one, four) = published
+    static_sprites.publish_all([one, four])
+    old = static_sprites.static_url(one).rsplit("/", 1)[1]
+    edit(one, b"redrawn")
+    static_sprites.publish_all([one, four])
+
+    monkeypatch.setattr(static_sprites, "_published", {})
+    monkeypatch.setattr(static_sprites, "_pruned", False)
+    static_sprites.ensure_in_background(SimpleNamespace(sprites=[one, four, "https://example.org/7.png", ""])).join()
+    assert sorted(p.name for p in out.iterdir()) == sorted(
+        static_sprites.static_url(p).rsplit("/", 1)[1] for p in (one, four)
+    )
+    assert not (out / old).exists()
@@ -0,0 +1,37 @@
+import pickle
+
+import pytest
+
+import storage
+
+
+def test_evolution_graph_is_read_only(dex):
+    graph = dex.evolutions
+    for table in (graph.forward, graph.reverse, graph.stage, graph.finals):
+        with pytest.raises(TypeError):
+            table[1] = ()
+        with pytest.raises(TypeError):
+            del table[next(iter(table))]
+    with pytest.raises(AttributeError):
+        graph.stage = {}
+    assert isinstance(graph.forward[1], tuple) and isinstance(graph.finals[1], tuple)
+
+
+def test_evolution_graph_copies_what_it_is_given():
+    forward = {1: [(2, "Ivysaur")]}
+    graph = storage.EvolutionGraph(forward, {2: [1]}, {1: 0, 2: 1}, {1: [2]})
+    forward[1].append((3, "Venusaur"))
+    forward[4] = [(5, "Charmeleon")]
+    assert graph.evolutions(1) == ((2, "Ivysaur"),) and graph.evolutions(4) == ()
+    assert graph.pre_evolutions(2) == (1,) and graph.final_forms(1) == (2,)
+
+
+def test_compiled_and_pickled_graphs_match(dex, tmp_path):
+    csv_path = tmp_path / "pokedex.csv"
+    csv_path.write_bytes(storage.POKEDEX_CSV.read_bytes())
+    key = b"k" * 32
+    assert storage.write_compiled_pokedex(dex, csv_path, key) is not None
+    compiled = storage.read_compiled_pokedex(csv_path, key)
+    assert compiled.evolutions.tables() == dex.evolutions.tables()
+    assert pickle.loads(pickle.dumps(dex.evolutions)).tables() == dex.evolutions.tables()
+    assert storage.get_evolution_chain(compiled, 1) == storage.get_evolution_chain(dex, 1)
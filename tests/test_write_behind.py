@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+import storage
+from storage import op_del, op_put, op_set
+from write_behind import WriteBehind
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_flush_writes_whole_actions_only(state_dir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STATE_BACKEND", backend)
+    p1 = {"id": "P0001", "player1": {"number": 1, "used": False}, "player2": {"number": 4, "used": False}}
+    p2 = {"id": "P0002", "player1": {"number": 7, "used": False}, "player2": {"number": 10, "used": False}}
+    state = {"pairings": [p1, p2], "fusions": [], "graveyard": [], "next_pair_id": 3, "next_fusion_id": 1}
+    storage.save_state(state)
+
+    lock = threading.RLock()
+    writer = WriteBehind(delay=60)
+    writer.mark(state, [op_put("pairings", p1)], lock=lock)
+    flusher = threading.Thread(target=writer.flush)
+    with lock:
+        flusher.start()
+        time.sleep(0.2)
+        assert flusher.is_alive()  # waiting for the action to finish
+        # One action in two steps: bury P0002
+        state["graveyard"].append({"kind": "pairing", "id": "P0002", "player1": {"number": 7}, "player2": {"number": 10}})
+        writer.mark(state, [op_put("graveyard", state["graveyard"][-1])], lock=lock)
+        state["pairings"].remove(p2)
+        writer.mark(state, [op_del("pairings", "P0002")], lock=lock)
+    flusher.join()
+    writer.flush()
+
+    saved = storage.load_state()
+    assert [p["id"] for p in saved["pairings"]] == ["P0001"]
+    assert [g["id"] for g in saved["graveyard"]] == ["P0002"]
+
+
+def test_flush_writes_a_copy(state_dir, monkeypatch):
+    state = {"pairings": [], "fusions": [], "graveyard": [], "next_pair_id": 1}
+    saved = []
+    monkeypatch.setattr(storage, "save_state", saved.append)
+    WriteBehind(delay=0).mark(state, None, lock=threading.RLock())
+    assert saved == [state] and saved[0] is not state
+
+
+def test_immediate_mark_under_the_run_lock_does_not_wait_for_a_flush(state_dir):
+    # Lock order is flush lock, then run lock: a flush waiting for the run
+    # lock must not block a session marking a change while holding it
+    state = {"pairings": [], "fusions": [], "graveyard": [], "next_pair_id": 1}
+    lock = threading.RLock()
+    writer = WriteBehind(delay=60)
+    writer.mark(state, None, lock=lock)
+
+    def session():
+        with lock:
+            flusher.start()
+            time.sleep(0.2)  # the flush now holds its lock and waits for ours
+            writer.delay = 0
+            state["next_pair_id"] = 2
+            writer.mark(state, [op_set("next_pair_id", 2)], lock=lock)
+
+    flusher = threading.Thread(target=writer.flush, daemon=True)
+    acting = threading.Thread(target=session, daemon=True)
+    acting.start()
+    acting.join(5)
+    assert not acting.is_alive(), "deadlock"
+    flusher.join(5)
+    writer.flush()
+    assert storage.load_state()["next_pair_id"] == 2
+
+
+def test_hold_writes_pending_changes_first(state_dir):
+    state = {"pairings": [], "fusions": [], "graveyard": [], "next_pair_id": 7}
+    lock = threading.RLock()
+    writer = WriteBehind(delay=60)
+    writer.mark(state, None, lock=lock)
+    with writer.hold(lock):
+        assert storage.load_state()["next_pair_id"] == 7
+        assert not writer.dirty
@@ -1,10 +1,22 @@
 import os
+import re
 import base64
 from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
 import streamlit as st
-from typing import Dict, Any
-import pandas as pd
-from storage import sprite_for, name_for
+from typing import Dict, Any, Callable, List
+from storage import BASE_DIR, Pokedex, sprite_for, name_for
+from sprite_atlas import current_atlas
+from sprite_variants import SpriteVariants, current_variants
+from static_sprites import static_url
+from fusion_index import get_fusion_index
+from fusion_sprites import FUSION_CACHE_URL_PREFIX, FUSION_CDN_URL, PLACEHOLDER_URI, get_fusion_cache
+from fusion_synth import rendered as rendered_synth_fusion, synth_url
+
+# Streamlit serves ./static next to app.py at app/static/ when
+# server.enableStaticServing is on
+STATIC_DIR = BASE_DIR / "static"
 
 # ---------- URLs ----------
 
@@ -16,12 +28,12 @@ def ifdex_fusion_url(a: int, b: int) -> str:
 
 def fusion_sprite_url(first_number: int, second_number: int) -> str:
     # Orientation matters: first.second
-    return f"https://ifd-spaces.sfo2.cdn.digitaloceanspaces.com/custom/{int(first_number)}.{int(second_number)}.png"
+    return FUSION_CDN_URL.format(head=int(first_number), body=int(second_number))
 
 # ---------- HTML image helpers ----------
 
 @lru_cache(maxsize=2048)
-def _path_to_data_uri(path: str) -> str:
+def _data_uri(path: str, mtime_ns: int, size: int) -> str:
     try:
         with open(path, "rb") as f:
             b64 = base64.b64encode(f.read()).decode("ascii")
@@ -29,18 +41,47 @@ def _path_to_data_uri(path: str) -> str:
     except Exception:
         return ""
 
-def _img_src(sprite: str) -> str:
+def _path_to_data_uri(path: str) -> str:
+    # Keyed on modification time and size too, so an edited file isn't served stale
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return ""
+    return _data_uri(path, st_.st_mtime_ns, st_.st_size)
+
+def _path_to_static_url(path: str) -> str:
+    """URL of the sprite's content-hashed copy under static/sprites/
+    (published ahead of time by static_sprites), or an inline data URI
+    until it's published or after the file changes."""
+    return static_url(path) or _path_to_data_uri(path)
+
+def static_sprites_enabled() -> bool:
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+def _variant(path: str, width: int | None) -> Path | None:
+    """Pre-rendered copy of a local sprite sized for ``width``, if there is one."""
+    variants = current_variants()
+    return variants.variant(path, width) if variants is not None and width else None
+
+def _img_src(sprite: str, width: int | None = None) -> str:
     if not sprite:
         return ""
     s = str(sprite)
     if s.startswith("http://") or s.startswith("https://") or s.startswith("data:"):
         return s
     if os.path.isfile(s):
-        return _path_to_data_uri(s)
+        variant = _variant(s, width)
+        # Inline data URIs are only a fallback for when static serving is off
+        if static_sprites_enabled():
+            return SpriteVariants.url(variant) if variant else _path_to_static_url(s)
+        return _path_to_data_uri(str(variant or s))
     return ""
 
 def clickable_sprite(sprite_path_or_url: str, link_url: str, width: int = 96, caption: str | None = None):
-    src = _img_src(sprite_path_or_url)
+    src = _img_src(sprite_path_or_url, width)
     if not src:
         return
     html = f'<a href="{link_url}" target="_blank"><img src="{src}" width="{width}"></a>'
@@ -48,21 +89,85 @@ def clickable_sprite(sprite_path_or_url: str, link_url: str, width: int = 96, ca
     if caption:
         st.caption(caption)
 
+def _mon_sprite_html(df: Pokedex, number: int, width: int) -> str:
+    # Prefer a region of the atlas sheet, which the browser fetches once per session
+    atlas = current_atlas() if static_sprites_enabled() else None
+    if atlas is not None and number in atlas:
+        return atlas.html(number, width)
+    src = _img_src(sprite_for(df, number), width)
+    return f'<img src="{src}" width="{width}">' if src else ""
+
+def sprite_atlas_style():
+    """Emit the atlas stylesheet; call once per run before rendering sprites."""
+    atlas = current_atlas() if static_sprites_enabled() else None
+    if atlas is not None:
+        st.markdown(f"<style>{atlas.stylesheet()}</style>", unsafe_allow_html=True)
+
+def mon_sprite(df: Pokedex, number: int, width: int = 96, link_url: str | None = None, caption: str | None = None):
+    """Base sprite for a Pokedex number, optionally linked."""
+    html = _mon_sprite_html(df, number, width)
+    if not html:
+        return
+    if link_url:
+        html = f'<a href="{link_url}" target="_blank">{html}</a>'
+    st.markdown(html, unsafe_allow_html=True)
+    if caption:
+        st.caption(caption)
+
+def _fusion_img_src(df: Pokedex, head: int, body: int, width: int | None = None) -> str:
+    cache = get_fusion_cache()
+    path = cache.get(head, body)
+    if path is not None:
+        # Custom sprites are much larger than any tile draws them
+        variant = _variant(str(path), width)
+        if static_sprites_enabled():
+            return SpriteVariants.url(variant) if variant else f"{FUSION_CACHE_URL_PREFIX}/{quote(path.name)}"
+        return _path_to_data_uri(str(variant or path))
+    if cache.is_missing(head, body):
+        # No custom sprite: use a locally synthesized one (memoized on disk,
+        # rendered in the background the first time it's asked for)
+        synth = rendered_synth_fusion(df, head, body)
+        if synth is None:
+            return PLACEHOLDER_URI
+        if static_sprites_enabled():
+            return synth_url(synth)
+        return _path_to_data_uri(str(synth))
+    # Not cached yet: warm the cache and let the browser use the CDN meanwhile
+    cache.prefetch([(head, body)])
+    return fusion_sprite_url(head, body)
+
+def custom_sprite_label(head: int, body: int) -> str | None:
+    """Whether the fusion has a custom sprite, per the sprite index; None
+    without an index."""
+    index = get_fusion_index()
+    if index is None:
+        return None
+    return "Custom sprite" if index.has_custom_sprite(head, body) else "No custom sprite"
+
+def fusion_sprite(df: Pokedex, head: int, body: int, width: int = 96, link_url: str | None = None, caption: str | None = None):
+    """Fused sprite served from the local cache, optionally linked."""
+    label = custom_sprite_label(int(head), int(body))
+    title = f' title="{label}"' if label else ""
+    html = f'<img src="{_fusion_img_src(df, int(head), int(body), width)}" width="{width}"{title}>'
+    if link_url:
+        html = f'<a href="{link_url}" target="_blank">{html}</a>'
+    st.markdown(html, unsafe_allow_html=True)
+    if caption:
+        st.caption(f"{caption} · {label.lower()}" if label else caption)
+
 # ---------- UI components ----------
 
-def pokemon_display(df: pd.DataFrame, number: int, caption: str = "", width: int = 96):
+def pokemon_display(df: Pokedex, number: int, caption: str = "", width: int = 96):
     cols = st.columns([1, 2])
     with cols[0]:
-        sprite = sprite_for(df, number)
-        if sprite:
-            clickable_sprite(sprite, ifdex_mon_url(number), width=width)
+        mon_sprite(df, number, width=width, link_url=ifdex_mon_url(number))
     with cols[1]:
         nm = name_for(df, number)
         st.markdown(f"**#{int(number):03d} {nm}** · [InfiniteFusionDex]({ifdex_mon_url(number)})")
         if caption:
             st.caption(caption)
 
-def pairing_card(df: pd.DataFrame, pairing: Dict[str, Any]):
+def pairing_card(df: Pokedex, pairing: Dict[str, Any]):
     with st.container(border=True):
         cols = st.columns(2)
         with cols[0]:
@@ -76,18 +181,14 @@ def pairing_card(df: pd.DataFrame, pairing: Dict[str, Any]):
             st.caption("Player 2")
             st.caption("Fused" if p2.get("used") else "Unfused")
 
-def pairing_tile(df: pd.DataFrame, pairing: Dict[str, Any]):
+def pairing_tile(df: Pokedex, pairing: Dict[str, Any]):
     with st.container(border=True):
         c = st.columns([1, 1])
         with c[0]:
-            s1 = sprite_for(df, pairing["player1"]["number"])
-            if s1:
-                clickable_sprite(s1, ifdex_mon_url(pairing["player1"]["number"]), width=64)
+            mon_sprite(df, pairing["player1"]["number"], width=64, link_url=ifdex_mon_url(pairing["player1"]["number"]))
             n1 = int(pairing['player1']['number']); st.caption(f"#{n1:03d} {name_for(df, n1)}")
         with c[1]:
-            s2 = sprite_for(df, pairing["player2"]["number"])
-            if s2:
-                clickable_sprite(s2, ifdex_mon_url(pairing["player2"]["number"]), width=64)
+            mon_sprite(df, pairing["player2"]["number"], width=64, link_url=ifdex_mon_url(pairing["player2"]["number"]))
             n2 = int(pairing['player2']['number']); st.caption(f"#{n2:03d} {name_for(df, n2)}")
         enc = pairing["player1"].get("encounter") or pairing["player2"].get("encounter") or ""
         if enc:
@@ -96,7 +197,7 @@ def pairing_tile(df: pd.DataFrame, pairing: Dict[str, Any]):
         p2u = "Fused" if pairing["player2"].get("used") else "Unfused"
         st.caption(f"P1: {p1u} · P2: {p2u}")
 
-def team_pokemon_card(df: pd.DataFrame, pokemon: Dict[str, Any]):
+def team_pokemon_card(df: Pokedex, pokemon: Dict[str, Any]):
     with st.container(border=True):
         source = pokemon.get("source", "Paired")
         
@@ -108,8 +209,7 @@ def team_pokemon_card(df: pd.DataFrame, pokemon: Dict[str, Any]):
             
             cols = st.columns([1, 2])
             with cols[0]:
-                sprite_url = fusion_sprite_url(num_a, num_b)
-                clickable_sprite(sprite_url, ifdex_fusion_url(num_a, num_b), width=120)
+                fusion_sprite(df, num_a, num_b, width=120, link_url=ifdex_fusion_url(num_a, num_b))
             with cols[1]:
                 st.markdown(f"**{name}**")
                 st.caption(f"Fusion: {fusion_id}")
@@ -117,9 +217,7 @@ def team_pokemon_card(df: pd.DataFrame, pokemon: Dict[str, Any]):
             number = pokemon["number"]
             cols = st.columns([1, 2])
             with cols[0]:
-                sprite = sprite_for(df, number)
-                if sprite:
-                    clickable_sprite(sprite, ifdex_mon_url(number), width=96)
+                mon_sprite(df, number, width=96, link_url=ifdex_mon_url(number))
             with cols[1]:
                 nm = name_for(df, number)
                 st.markdown(f"**#{int(number):03d} {nm}**")
@@ -128,7 +226,7 @@ def team_pokemon_card(df: pd.DataFrame, pokemon: Dict[str, Any]):
                 if pokemon.get("pairing_id"):
                     st.caption(f'Pairing: {pokemon.get("pairing_id")}')
 
-def fusion_card(df: pd.DataFrame, fusion: Dict[str, Any]):
+def fusion_card(df: Pokedex, fusion: Dict[str, Any]):
     with st.container(border=True):
         st.markdown(f"**Fusion {fusion['id']}**")
 
@@ -141,9 +239,7 @@ def fusion_card(df: pd.DataFrame, fusion: Dict[str, Any]):
         c_base = st.columns(4)
         for col, mon in zip(c_base, [a, b, a2, b2]):
             with col:
-                spr = sprite_for(df, mon["number"])
-                if spr:
-                    clickable_sprite(spr, ifdex_mon_url(mon["number"]), width=96)
+                mon_sprite(df, mon["number"], width=96, link_url=ifdex_mon_url(mon["number"]))
                 st.caption(f"#{int(mon['number']):03d} {mon['name']}")
 
         st.divider()
@@ -151,15 +247,13 @@ def fusion_card(df: pd.DataFrame, fusion: Dict[str, Any]):
         # Fused sprites: clickable to fusion details
         c_fused = st.columns(2)
         with c_fused[0]:
-            fused_src = fusion_sprite_url(a["number"], b["number"])
-            clickable_sprite(fused_src, ifdex_fusion_url(a["number"], b["number"]), width=144,
-                             caption=f"Fused: {a['name']} + {b['name']}")
+            fusion_sprite(df, a["number"], b["number"], width=144, link_url=ifdex_fusion_url(a["number"], b["number"]),
+                          caption=f"Fused: {a['name']} + {b['name']}")
         with c_fused[1]:
-            fused_src2 = fusion_sprite_url(a2["number"], b2["number"])
-            clickable_sprite(fused_src2, ifdex_fusion_url(a2["number"], b2["number"]), width=144,
-                             caption=f"Fused: {a2['name']} + {b2['name']}")
+            fusion_sprite(df, a2["number"], b2["number"], width=144, link_url=ifdex_fusion_url(a2["number"], b2["number"]),
+                          caption=f"Fused: {a2['name']} + {b2['name']}")
 
-def graveyard_card(df: pd.DataFrame, entry: Dict[str, Any]):
+def graveyard_card(df: Pokedex, entry: Dict[str, Any]):
     kind = entry.get("kind")
     with st.container(border=True):
         if kind == "fusion":
@@ -170,48 +264,40 @@ def graveyard_card(df: pd.DataFrame, entry: Dict[str, Any]):
                 b = int(entry["player1"]["b_num"])
                 row = st.columns([1, 1, 1.2])
                 with row[0]:
-                    s = sprite_for(df, a)
-                    if s: st.image(s, width=64)
+                    mon_sprite(df, a, width=64)
                     st.caption(f"#{a:03d}")
                 with row[1]:
-                    s = sprite_for(df, b)
-                    if s: st.image(s, width=64)
+                    mon_sprite(df, b, width=64)
                     st.caption(f"#{b:03d}")
                 with row[2]:
-                    url = fusion_sprite_url(a, b)
-                    st.image(url, width=112)
+                    fusion_sprite(df, a, b, width=112)
                     st.caption("fused")
             with cols[1]:
                 a2 = int(entry["player2"]["a_num"])
                 b2 = int(entry["player2"]["b_num"])
                 row2 = st.columns([1, 1, 1.2])
                 with row2[0]:
-                    s = sprite_for(df, a2)
-                    if s: st.image(s, width=64)
+                    mon_sprite(df, a2, width=64)
                     st.caption(f"#{a2:03d}")
                 with row2[1]:
-                    s = sprite_for(df, b2)
-                    if s: st.image(s, width=64)
+                    mon_sprite(df, b2, width=64)
                     st.caption(f"#{b2:03d}")
                 with row2[2]:
-                    url2 = fusion_sprite_url(a2, b2)
-                    st.image(url2, width=112)
+                    fusion_sprite(df, a2, b2, width=112)
                     st.caption("fused")
         elif kind == "pairing":
             st.markdown(f"**Grave: Pairing {entry.get('id','')}**")
             c = st.columns(2)
             with c[0]:
-                s1 = sprite_for(df, entry["player1"]["number"])
-                if s1: st.image(s1, width=72)
+                mon_sprite(df, entry["player1"]["number"], width=72)
                 n1 = int(entry['player1']['number']); st.caption(f"#{n1:03d} {name_for(df, n1)}")
             with c[1]:
-                s2 = sprite_for(df, entry["player2"]["number"])
-                if s2: st.image(s2, width=72)
+                mon_sprite(df, entry["player2"]["number"], width=72)
                 n2 = int(entry['player2']['number']); st.caption(f"#{n2:03d} {name_for(df, n2)}")
         else:
             st.write(entry)
 
-def fusion_tile(df: pd.DataFrame, fusion: Dict[str, Any]):
+def fusion_tile(df: Pokedex, fusion: Dict[str, Any]):
     with st.container(border=True):
         st.markdown(f"**{fusion['id']}**")
         a = fusion["player1"]["a"]; b = fusion["player1"]["b"]
@@ -219,11 +305,82 @@ def fusion_tile(df: pd.DataFrame, fusion: Dict[str, Any]):
 
         cols = st.columns(2)
         with cols[0]:
-            url = fusion_sprite_url(a["number"], b["number"])
-            clickable_sprite(url, ifdex_fusion_url(a["number"], b["number"]), width=96,
-                             caption=f"{a['name']} + {b['name']}")
+            fusion_sprite(df, a["number"], b["number"], width=96, link_url=ifdex_fusion_url(a["number"], b["number"]),
+                          caption=f"{a['name']} + {b['name']}")
         with cols[1]:
-            url2 = fusion_sprite_url(a2["number"], b2["number"])
-            clickable_sprite(url2, ifdex_fusion_url(a2["number"], b2["number"]), width=96,
-                             caption=f"{a2['name']} + {b2['name']}")
+            fusion_sprite(df, a2["number"], b2["number"], width=96, link_url=ifdex_fusion_url(a2["number"], b2["number"]),
+                          caption=f"{a2['name']} + {b2['name']}")
+
+
+# ---------- Windowed grid ----------
+
+GRID_PAGE_SIZES = (12, 24, 48, 96)
+GRID_SORTS = ("Newest", "ID", "Species")
+
+def _id_sort_key(record_id: str):
+    # "P10000" sorts after "P9999"
+    m = re.match(r"(\D*)(\d+)$", str(record_id))
+    return (m.group(1), int(m.group(2))) if m else (str(record_id), -1)
 
+def windowed_grid(
+    items: List[Dict[str, Any]],
+    render: Callable[[Dict[str, Any]], None],
+    key: str,
+    species: Callable[[Dict[str, Any]], str],
+    default_sort: str = "ID",
+    columns: int = 6,
+):
+    """Render ``items`` as a grid one page at a time.
+
+    Only the visible page's tiles are built; ``render`` is called inside each
+    tile's column. Items are expected in insertion order, which "Newest"
+    reverses. ``species`` gives the name used by the "Species" sort. The
+    jump-to-id box switches to the page holding that id.
+    """
+    page_key = f"{key}_page"
+
+    def _first_page():
+        st.session_state.pop(page_key, None)
+
+    ctrl = st.columns([2, 1, 2, 1])
+    with ctrl[0]:
+        order = st.selectbox(
+            "Sort by", GRID_SORTS, index=GRID_SORTS.index(default_sort), key=f"{key}_sort", on_change=_first_page
+        )
+    with ctrl[1]:
+        size = st.selectbox("Per page", GRID_PAGE_SIZES, index=1, key=f"{key}_size", on_change=_first_page)
+    with ctrl[2]:
+        jump = st.text_input("Jump to ID", key=f"{key}_jump", placeholder="e.g. P0042").strip().upper()
+
+    if order == "Newest":
+        items = items[::-1]
+    elif order == "ID":
+        items = sorted(items, key=lambda r: _id_sort_key(r.get("id", "")))
+    else:
+        items = sorted(items, key=lambda r: (species(r).lower(), _id_sort_key(r.get("id", ""))))
+
+    pages = max(1, -(-len(items) // size))
+    if not jump:
+        st.session_state.pop(f"{key}_jumped", None)
+    elif jump != st.session_state.get(f"{key}_jumped"):
+        st.session_state[f"{key}_jumped"] = jump
+        pos = next((i for i, r in enumerate(items) if str(r.get("id", "")).upper() == jump), None)
+        if pos is None:
+            st.caption(f"No {jump} in this list.")
+        else:
+            st.session_state[page_key] = pos // size + 1
+    if not 1 <= st.session_state.get(page_key, 1) <= pages:
+        st.session_state[page_key] = min(max(1, st.session_state.get(page_key, 1)), pages)
+    with ctrl[3]:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start = (int(page) - 1) * size
+    window = items[start:start + size]
+    if not window:
+        return
+    st.caption(f"Showing {start + 1}–{start + len(window)} of {len(items)}")
+    for i in range(0, len(window), columns):
+        cols = st.columns(columns)
+        for col, item in zip(cols, window[i:i + columns]):
+            with col:
+                render(item)
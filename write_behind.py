@@ -0,0 +1,170 @@
+"""Dirty tracking and debounced write-behind for state saves.
+
+``mark`` records that a session changed something. Actions that changed
+nothing are counted and dropped. Changes arriving within
+``SOULLINK_WRITE_DELAY`` seconds of each other are coalesced into one write
+(at most ``MAX_DELAY`` after the first), and anything pending is flushed at
+interpreter exit.
+
+The state handed to ``mark`` is live: sessions keep changing it. ``flush``
+copies it (and the pending ops) under the lock passed to ``mark`` before
+serializing, so every write holds whole actions only, never half of one.
+
+Lock order: the writer's flush lock first, then the run lock passed to
+``mark``. ``flush`` and ``hold`` take them in that order; ``mark`` runs
+with the run lock held, so it never waits for the flush lock. Pending
+changes are never dropped: replacing the state from disk goes through
+``hold``, which writes them first.
+"""
+import atexit
+import marshal
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+import storage
+
+WRITE_DELAY = float(os.environ.get("SOULLINK_WRITE_DELAY", 0.5))
+MAX_DELAY = 5.0
+
+class WriteBehind:
+    def __init__(self, delay: float = WRITE_DELAY, max_delay: float = MAX_DELAY):
+        self.delay = float(delay)
+        self.max_delay = float(max_delay)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._state: Optional[Dict[str, Any]] = None
+        self._guard: Optional[ContextManager] = None  # lock held while the state changes
+        self._ops: List[Dict[str, Any]] = []
+        self._full = False
+        self._first_dirty = 0.0
+        self._timer: Optional[threading.Timer] = None
+        # requested: saves asked for; clean: skipped, nothing changed;
+        # coalesced: folded into an already pending write; writes: actual writes
+        self.stats = {"requested": 0, "clean": 0, "coalesced": 0, "writes": 0, "errors": 0}
+        # Called after every successful write, on the writing thread
+        self.after_write: List[Callable[[], None]] = []
+
+    @property
+    def dirty(self) -> bool:
+        return self._state is not None
+
+    @property
+    def avoided(self) -> int:
+        return self.stats["clean"] + self.stats["coalesced"]
+
+    def mark(
+        self, state: Dict[str, Any], ops: Optional[List[Dict[str, Any]]] = None, lock: Optional[ContextManager] = None
+    ) -> None:
+        """Queue a save. ``ops=None`` asks for a full write; an empty list means
+        nothing changed. ``lock`` is the lock sessions hold while they change
+        ``state``; the write copies the state under it."""
+        with self._lock:
+            self.stats["requested"] += 1
+            if ops is not None and not ops:
+                self.stats["clean"] += 1
+                return
+            if self._state is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self._first_dirty = time.monotonic()
+            self._state, self._guard = state, lock
+            if ops is None:
+                self._full = True
+                self._ops = []
+            elif not self._full:
+                self._ops.extend(ops)
+            if self.delay <= 0 and self._flush_lock.acquire(blocking=False):
+                immediate = True
+            else:
+                # A running flush may be waiting for the run lock our caller
+                # holds: write right after it instead of waiting for it
+                immediate = False
+                self._schedule()
+        if immediate:
+            try:
+                self._write_pending()
+            finally:
+                self._flush_lock.release()
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        remaining = self.max_delay - (time.monotonic() - self._first_dirty)
+        timer = threading.Timer(max(0.0, min(self.delay, remaining)), self._flush_quietly)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def _flush_quietly(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            pass  # kept pending; retried on the next change or at exit
+
+    def flush(self) -> bool:
+        """Write whatever is pending now. Returns True if a write happened.
+        Don't call it holding the run lock (see the lock order above)."""
+        with self._flush_lock:
+            return self._write_pending()
+
+    @contextmanager
+    def hold(self, lock: ContextManager) -> Iterator[None]:
+        """Write what is pending, then keep writes out until the block ends,
+        with ``lock`` (the run lock) held: for replacing the state from disk
+        without a queued save landing on top of it or being lost."""
+        with self._flush_lock, lock:
+            self._write_pending()
+            yield
+
+    def _write_pending(self) -> bool:
+        """The body of ``flush``; the caller holds the flush lock."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            state, ops, full, guard = self._state, self._ops, self._full, self._guard
+            self._state, self._ops, self._full = None, [], False
+        if state is None:
+            return False
+        try:
+            with guard if guard is not None else nullcontext():
+                copy_state, copy_ops = _snapshot(state, ops, full)
+            if full:
+                storage.save_state(copy_state)
+            else:
+                storage.save_changes(copy_state, copy_ops)
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+                if self._state is None:
+                    self._state, self._guard, self._first_dirty = state, guard, time.monotonic()
+                self._full = self._full or full
+                self._ops = [] if self._full else ops + self._ops
+            raise
+        with self._lock:
+            self.stats["writes"] += 1
+        for hook in list(self.after_write):
+            hook()
+        return True
+
+def _snapshot(state: Dict[str, Any], ops: List[Dict[str, Any]], full: bool):
+    """Deep copies of what a write serializes (the state is plain JSON data,
+    which marshal copies fastest). The SQLite backend applies ops without
+    reading the state, so it's only copied when something will write it."""
+    keep_state = full or storage.STATE_BACKEND != "sqlite"
+    return marshal.loads(marshal.dumps((state if keep_state else {}, ops)))
+
+_writer: Optional[WriteBehind] = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> WriteBehind:
+    """Process-wide writer; flushed at interpreter exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind()
+            atexit.register(_writer._flush_quietly)
+        return _writer